@@ -0,0 +1,67 @@
+"""
+Compares two endpoint_bench reports and lists the endpoints whose p95 latency or throughput got
+worse by more than --threshold, exiting non-zero if there are any.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding='utf8') as fo:
+        report = json.load(fo)
+    return report['meta'], {result['endpoint']: result for result in report['results']}
+
+
+def change(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old
+
+
+def compare(baseline, candidate, threshold):
+    rows = []
+    for endpoint, new in candidate.items():
+        old = baseline.get(endpoint)
+        if old is None:
+            continue
+        p95 = change(old['p95_ms'], new['p95_ms'])
+        rps = change(old['rps'], new['rps'])
+        regressed = (p95 is not None and p95 > threshold) or (rps is not None and rps < -threshold) \
+            or new['errors'] > old['errors']
+        rows.append((endpoint, old, new, p95, rps, regressed))
+    return rows
+
+
+def _percent(value):
+    return '{:+.1%}'.format(value) if value is not None else 'n/a'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change counted as a regression')
+    args = parser.parse_args()
+
+    baseline_meta, baseline = load(args.baseline)
+    candidate_meta, candidate = load(args.candidate)
+    for key in ('mode', 'concurrency', 'workers', 'response_cache', 'dataset'):
+        if baseline_meta.get(key) != candidate_meta.get(key):
+            print('warning: {} differs ({!r} vs {!r})'.format(key, baseline_meta.get(key), candidate_meta.get(key)))
+
+    rows = compare(baseline, candidate, args.threshold)
+    print('{:<36} {:>10} {:>10} {:>9} {:>10} {:>10} {:>9}'.format(
+        'endpoint', 'p95 old', 'p95 new', 'p95', 'rps old', 'rps new', 'rps'))
+    for endpoint, old, new, p95, rps, regressed in rows:
+        print('{:<36} {:>10.2f} {:>10.2f} {:>9} {:>10.1f} {:>10.1f} {:>9}{}'.format(
+            endpoint, old['p95_ms'] or 0, new['p95_ms'] or 0, _percent(p95), old['rps'] or 0, new['rps'] or 0,
+            _percent(rps), '  REGRESSED' if regressed else ''))
+
+    sys.exit(1 if any(row[-1] for row in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
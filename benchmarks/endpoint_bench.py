@@ -0,0 +1,375 @@
+"""
+Latency percentiles, throughput and peak RSS of every route against a dataset built by
+benchmarks.dataset, either in-process through app.test_client() or over HTTP against gunicorn.
+The dataset is copied before the run, so write scenarios never change it between runs. Event
+stream scenarios time how long it takes to open a stream and get its first chunk, then close it.
+
+    python -m benchmarks.dataset --path /tmp/bench.sqlite3
+    python -m benchmarks.endpoint_bench --dataset /tmp/bench.sqlite3 --mode inprocess --output inprocess.json
+    python -m benchmarks.endpoint_bench --dataset /tmp/bench.sqlite3 --mode gunicorn --workers 4 --concurrency 16
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BATCH_SIZE = 20
+
+# method of the requests that open a server-sent event stream and close it after the first chunk
+STREAM = 'STREAM'
+
+# a stream closed by the client is only noticed by the server on its next write, so heartbeats
+# are sent often enough not to hold a sync worker long after each stream scenario request
+BENCH_ENVIRON = {'SSE_HEARTBEAT_SECONDS': '0.1'}
+
+
+class Dataset:
+    """Sizes and write targets of a seeded database, read once before the app is imported"""
+
+    def __init__(self, path):
+        connection = sqlite3.connect(path)
+        self.teachers = connection.execute('SELECT COUNT(*) FROM teachers').fetchone()[0]
+        self.students = connection.execute('SELECT COUNT(*) FROM students').fetchone()[0]
+        self.assignments = connection.execute('SELECT MAX(id) FROM assignments').fetchone()[0] or 0
+        self._connection = connection
+
+    def drafts(self, count):
+        return self._connection.execute(
+            "SELECT id, student_id FROM assignments WHERE state = 'DRAFT' ORDER BY id LIMIT ?", (count,)
+        ).fetchall()
+
+    def submitted(self, count, parity):
+        # even and odd ids go to different scenarios, so no assignment is graded twice
+        return self._connection.execute(
+            "SELECT id, teacher_id FROM assignments WHERE state = 'SUBMITTED' AND id % 2 = ? ORDER BY id LIMIT ?",
+            (parity, count)
+        ).fetchall()
+
+    def close(self):
+        self._connection.close()
+
+    def principal(self, role, _id):
+        user_id = {'teacher': _id, 'student': self.teachers + _id, 'principal': self.teachers + self.students + 1}[role]
+        return json.dumps({'user_id': user_id, '{}_id'.format(role): _id}, separators=(',', ':'))
+
+
+def scenarios(dataset, count, rng):
+    """name -> list of (method, path, X-Principal, json body) requests"""
+    def student():
+        return dataset.principal('student', rng.randint(1, dataset.students))
+
+    def teacher():
+        return dataset.principal('teacher', rng.randint(1, dataset.teachers))
+
+    principal = dataset.principal('principal', 1)
+    reads = {
+        'student.list_assignments': ('/student/assignments?limit=100', student),
+        'teacher.list_assignments': ('/teacher/assignments?limit=100', teacher),
+        'principal.list_assignments': ('/principal/assignments?limit=100', lambda: principal),
+        'principal.list_teachers': ('/principal/teachers', lambda: principal),
+        'reports.teacher_stats': ('/principal/reports/teachers', lambda: principal),
+        'reports.student_stats': ('/principal/reports/students', lambda: principal),
+        'reports.top_teacher': ('/principal/reports/teachers/top?grade=A', lambda: principal),
+        'reports.grade_histogram': ('/principal/reports/grades/histogram', lambda: principal),
+        'reports.teacher_leaderboard': ('/principal/reports/teachers/leaderboard?grade=A&limit=10', lambda: principal),
+        'reports.graded_per_student': ('/principal/reports/students/graded', lambda: principal),
+        'reports.teacher_turnaround': ('/principal/reports/teachers/turnaround', lambda: principal),
+        'reports.teacher_backlog': ('/principal/reports/teachers/backlog', lambda: principal),
+        'student.assignment_changes': ('/student/assignments/changes?limit=100', student),
+        'teacher.assignment_changes': ('/teacher/assignments/changes?limit=100', teacher),
+        'principal.assignment_changes': ('/principal/assignments/changes?limit=100', lambda: principal),
+        'metrics': ('/metrics', lambda: principal),
+    }
+    plan = {name: [('GET', path, make_principal(), None) for _ in range(count)]
+            for name, (path, make_principal) in reads.items()}
+    plan['student.open_event_stream'] = [
+        (STREAM, '/student/assignments/events', student(), None) for _ in range(count)
+    ]
+    plan['teacher.open_event_stream'] = [
+        (STREAM, '/teacher/assignments/events', teacher(), None) for _ in range(count)
+    ]
+
+    plan['student.upsert_assignment'] = [
+        ('POST', '/student/assignments', student(), {'content': 'bench draft'}) for _ in range(count)
+    ]
+    plan['student.bulk_upsert_assignments'] = [
+        ('POST', '/student/assignments/bulk', student(), [{'content': 'bench draft'}] * BATCH_SIZE)
+        for _ in range(count)
+    ]
+    plan['student.submit_assignment'] = [
+        ('POST', '/student/assignments/submit', dataset.principal('student', student_id),
+         {'id': _id, 'teacher_id': rng.randint(1, dataset.teachers)})
+        for _id, student_id in dataset.drafts(count)
+    ]
+
+    even = dataset.submitted(count * 2, 0)
+    plan['teacher.grade_assignment'] = [
+        ('POST', '/teacher/assignments/grade', dataset.principal('teacher', teacher_id), {'id': _id, 'grade': 'A'})
+        for _id, teacher_id in even[:count]
+    ]
+    plan['principal.grade_assignment'] = [
+        ('POST', '/principal/assignments/grade', principal, {'id': _id, 'grade': 'B'}) for _id, _ in even[count:]
+    ]
+
+    by_teacher = {}
+    for _id, teacher_id in dataset.submitted(count * BATCH_SIZE * 2, 1):
+        by_teacher.setdefault(teacher_id, []).append(_id)
+    batches = [(teacher_id, ids[i:i + BATCH_SIZE]) for teacher_id, ids in sorted(by_teacher.items())
+               for i in range(0, len(ids), BATCH_SIZE)]
+    plan['teacher.bulk_grade_assignments'] = [
+        ('POST', '/teacher/assignments/grade/bulk', dataset.principal('teacher', teacher_id),
+         [{'id': _id, 'grade': 'C'} for _id in ids])
+        for teacher_id, ids in batches[0:count * 2:2]
+    ]
+    plan['principal.bulk_grade_assignments'] = [
+        ('POST', '/principal/assignments/grade/bulk', principal, [{'id': _id, 'grade': 'D'} for _id in ids])
+        for _, ids in batches[1:count * 2:2]
+    ]
+    return plan
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def summarize(name, latencies, errors, seconds):
+    latencies = sorted(latencies)
+    return {
+        'endpoint': name,
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'rps': len(latencies) / seconds if seconds else None,
+    }
+
+
+def run_inprocess(plan, concurrency):
+    from core.server import app
+
+    client = app.test_client()
+
+    def send(spec):
+        method, path, principal, body = spec
+        started = time.perf_counter()
+        if method == STREAM:
+            response = client.get(path, headers={'X-Principal': principal}, buffered=False)
+            next(response.iter_encoded(), None)
+            response.close()
+        else:
+            response = client.open(path, method=method, headers={'X-Principal': principal}, json=body)
+            response.get_data()
+        return (time.perf_counter() - started) * 1000, response.status_code
+
+    results = [run_scenario(name, requests, send, concurrency) for name, requests in plan.items()]
+    return results, {'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def run_scenario(name, requests, send, concurrency):
+    started = time.perf_counter()
+    if concurrency == 1:
+        outcomes = [send(spec) for spec in requests]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(send, requests))
+    seconds = time.perf_counter() - started
+
+    errors = sum(1 for _, status in outcomes if status >= 400)
+    return summarize(name, [latency for latency, _ in outcomes], errors, seconds)
+
+
+def start_gunicorn(database_url, port, workers, environ):
+    env = dict(os.environ, **environ)
+    env.update({
+        'DATABASE_URL': database_url,
+        'GUNICORN_PORT': str(port),
+        'GUNICORN_NUMBER_WORKERS': str(workers),
+        'GUNICORN_RELOAD': 'false',
+        'GUNICORN_LOG_LEVEL': 'warning',
+    })
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', 'core.server:app'],
+        env=env, stdout=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited with status {}'.format(process.returncode))
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not become ready on port {}'.format(port))
+
+
+def peak_rss_kb(pid):
+    """VmHWM of a process, the most resident memory it ever had"""
+    try:
+        with open('/proc/{}/status'.format(pid)) as fo:
+            for line in fo:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(entry)) as fo:
+                # the parent pid is the second field after the parenthesised command name
+                if int(fo.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+
+def http_sender(port):
+    """send(spec) for run_scenario over one keep-alive connection per client thread"""
+    local = threading.local()
+
+    def send(spec):
+        method, path, principal, body = spec
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        headers = {'X-Principal': principal}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+
+        started = time.perf_counter()
+        try:
+            if method == STREAM:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.readline()
+                # the stream never ends: close it, the next request reconnects
+                connection.close()
+            else:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            status = 599
+        return (time.perf_counter() - started) * 1000, status
+
+    return send
+
+
+def gunicorn_memory(process):
+    workers_rss = [peak_rss_kb(pid) for pid in child_pids(process.pid)]
+    return {'peak_rss_kb': max(filter(None, workers_rss), default=None), 'workers_peak_rss_kb': workers_rss}
+
+
+def stop_gunicorn(process):
+    process.terminate()
+    process.wait(timeout=30)
+
+
+def run_gunicorn(plan, concurrency, database_url, port, workers, environ):
+    process = start_gunicorn(database_url, port, workers, environ)
+    send = http_sender(port)
+    try:
+        results = [run_scenario(name, requests, send, concurrency) for name, requests in plan.items()]
+        memory = gunicorn_memory(process)
+    finally:
+        stop_gunicorn(process)
+    return results, memory
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', required=True, help='sqlite file built by benchmarks.dataset')
+    parser.add_argument('--mode', choices=('inprocess', 'gunicorn'), default='inprocess')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--port', type=int, default=7760)
+    parser.add_argument('--endpoints', nargs='*', help='only the endpoints with these names or name prefixes')
+    parser.add_argument('--cache', action='store_true',
+                        help='enable the per-process response cache (in-process mode or a single gunicorn worker)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this file instead of stdout')
+    args = parser.parse_args()
+
+    dataset = Dataset(args.dataset)
+    plan = scenarios(dataset, args.requests, random.Random(args.seed))
+    if args.endpoints:
+        plan = {name: requests for name, requests in plan.items() if name.startswith(tuple(args.endpoints))}
+    dataset_meta = {'teachers': dataset.teachers, 'students': dataset.students, 'assignments': dataset.assignments}
+    dataset.close()
+
+    workdir = tempfile.mkdtemp(prefix='endpoint-bench-')
+    database_path = os.path.join(workdir, 'bench.sqlite3')
+    shutil.copyfile(args.dataset, database_path)
+    database_url = 'sqlite:///' + database_path
+    environ = dict(BENCH_ENVIRON, RESPONSE_CACHE_ENABLED='true' if args.cache else 'false')
+
+    try:
+        if args.mode == 'inprocess':
+            # the config is read when core is imported, so the environment has to be set first
+            os.environ.update(environ, DATABASE_URL=database_url)
+            results, memory = run_inprocess(plan, args.concurrency)
+        else:
+            results, memory = run_gunicorn(plan, args.concurrency, database_url, args.port, args.workers, environ)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'mode': args.mode,
+            'requests_per_endpoint': args.requests,
+            'concurrency': args.concurrency,
+            'workers': args.workers if args.mode == 'gunicorn' else None,
+            'response_cache': args.cache,
+            'seed': args.seed,
+            'dataset': dataset_meta,
+        },
+        'memory': memory,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as fo:
+            fo.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Rows per second of AssignmentSchema().dump(many=True) against the compiled assignment_serializer.
+
+    python -m benchmarks.serializer_bench --rows 100000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from core.apis.assignments.schema import AssignmentSchema, assignment_serializer
+from core.models.assignments import Assignment, AssignmentStateEnum, GradeEnum
+
+
+def make_assignments(count):
+    now = datetime(2026, 1, 1)
+    return [
+        Assignment(
+            id=_id,
+            student_id=_id % 50 + 1,
+            teacher_id=_id % 7 + 1,
+            content='content {}'.format(_id),
+            grade=list(GradeEnum)[_id % 4],
+            state=AssignmentStateEnum.GRADED,
+            created_at=now,
+            updated_at=now + timedelta(seconds=_id)
+        )
+        for _id in range(1, count + 1)
+    ]
+
+
+def measure(name, dump, assignments, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        dump(assignments)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {'serializer': name, 'rows': len(assignments), 'seconds': best, 'rows_per_sec': len(assignments) / best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    assignments = make_assignments(args.rows)
+    marshmallow_dump = lambda rows: AssignmentSchema().dump(rows, many=True)
+    compiled_dump = lambda rows: [assignment_serializer(row) for row in rows]
+
+    assert json.dumps(marshmallow_dump(assignments[:100]), sort_keys=True) == \
+        json.dumps(compiled_dump(assignments[:100]), sort_keys=True)
+
+    results = [
+        measure('marshmallow', marshmallow_dump, assignments, args.repeat),
+        measure('compiled', compiled_dump, assignments, args.repeat),
+    ]
+    results[1]['speedup'] = results[1]['rows_per_sec'] / results[0]['rows_per_sec']
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Mixed read/write throughput of concurrent worker processes on one sqlite file, comparing sqlite's
+defaults (rollback journal, synchronous=FULL) with the tuning profile from core.config.
+
+    python -m benchmarks.sqlite_tuning_bench --workers 4 --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+from core import apply_sqlite_pragmas, config, db
+from core.models import assignments, principals, users  # noqa: F401 registers the tables on db.metadata
+
+PROFILES = {
+    'default': {'foreign_keys': 'ON'},
+    'tuned': config.Config.SQLITE_PRAGMAS,
+}
+
+READ_SQL = 'SELECT * FROM assignments WHERE student_id = ? ORDER BY id LIMIT 100'
+WRITE_SQL = "INSERT INTO assignments (student_id, content, state, created_at, updated_at) " \
+            "VALUES (?, 'bench', 'DRAFT', datetime('now'), datetime('now'))"
+
+
+def create_database(path, students, assignments):
+    engine = create_engine('sqlite:///' + path)
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    connection = sqlite3.connect(path)
+    connection.executemany(
+        "INSERT INTO users (id, username, email, created_at, updated_at) VALUES (?, ?, ?, datetime('now'), datetime('now'))",
+        [(i, 'user{}'.format(i), 'user{}@bench'.format(i)) for i in range(1, students + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO students (id, user_id, created_at, updated_at) VALUES (?, ?, datetime('now'), datetime('now'))",
+        [(i, i) for i in range(1, students + 1)]
+    )
+    connection.executemany(WRITE_SQL, [(random.randint(1, students),) for _ in range(assignments)])
+    connection.commit()
+    connection.close()
+
+
+def worker(path, pragmas, seconds, write_ratio, students, results):
+    connection = sqlite3.connect(path, timeout=0)
+    apply_sqlite_pragmas(connection, pragmas)
+    rng = random.Random(os.getpid())
+    reads = writes = locked = 0
+
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if rng.random() < write_ratio:
+                connection.execute(WRITE_SQL, (rng.randint(1, students),))
+                connection.commit()
+                writes += 1
+            else:
+                connection.execute(READ_SQL, (rng.randint(1, students),)).fetchall()
+                reads += 1
+        except sqlite3.OperationalError:
+            connection.rollback()
+            locked += 1
+
+    connection.close()
+    results.put({'reads': reads, 'writes': writes, 'locked': locked})
+
+
+def run_profile(name, args):
+    directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+    path = os.path.join(directory, 'bench.sqlite3')
+    create_database(path, args.students, args.assignments)
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=worker,
+            args=(path, PROFILES[name], args.seconds, args.write_ratio, args.students, results)
+        )
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    totals = {'reads': 0, 'writes': 0, 'locked': 0}
+    for _ in processes:
+        for key, value in results.get().items():
+            totals[key] += value
+    for process in processes:
+        process.join()
+
+    totals['profile'] = name
+    totals['ops_per_sec'] = (totals['reads'] + totals['writes']) / args.seconds
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--assignments', type=int, default=100000)
+    args = parser.parse_args()
+
+    print(json.dumps([run_profile(name, args) for name in PROFILES], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Compares gunicorn worker profiles under concurrent clients: sync, gthread and gevent (skipped
+when gevent is not installed). Every profile serves the same interleaved mix of fast listings
+and slow report queries, so a profile that lets one slow request hold up the rest shows it in
+the p95/p99 of the fast endpoints.
+
+    python -m benchmarks.worker_bench --dataset /tmp/bench.sqlite3 --workers 2 --concurrency 32
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, zip_longest
+
+from benchmarks import endpoint_bench
+
+MIX = (
+    'student.list_assignments',
+    'teacher.list_assignments',
+    'principal.list_assignments',
+    'reports.teacher_stats',
+    'reports.teacher_turnaround',
+    'reports.teacher_backlog',
+)
+
+
+def profiles(slots):
+    """name -> gunicorn environment, each worker serving `slots` requests at once where it can"""
+    return {
+        'sync': {'GUNICORN_WORKER_CLASS': 'sync'},
+        'gthread': {'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_NUMBER_WORKER_THREADS': str(slots)},
+        'gevent': {'GUNICORN_WORKER_CLASS': 'gevent', 'GUNICORN_NUMBER_WORKER_CONNECTIONS': str(slots)},
+    }
+
+
+def mixed_requests(plan):
+    """The MIX endpoints' requests interleaved, tagged with their endpoint"""
+    tagged = [[(name, spec) for spec in plan[name]] for name in MIX]
+    return [request for request in chain.from_iterable(zip_longest(*tagged)) if request is not None]
+
+
+def run_profile(requests, concurrency, database_url, port, workers, environ):
+    process = endpoint_bench.start_gunicorn(database_url, port, workers, environ)
+    send = endpoint_bench.http_sender(port)
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(lambda request: send(request[1]), requests))
+        seconds = time.perf_counter() - started
+        memory = endpoint_bench.gunicorn_memory(process)
+    finally:
+        endpoint_bench.stop_gunicorn(process)
+
+    by_endpoint = {}
+    for (name, _), outcome in zip(requests, outcomes):
+        by_endpoint.setdefault(name, []).append(outcome)
+
+    def summary(name, endpoint_outcomes):
+        errors = sum(1 for _, status in endpoint_outcomes if status >= 400)
+        return endpoint_bench.summarize(name, [latency for latency, _ in endpoint_outcomes], errors, seconds)
+
+    return {
+        'overall': summary('all', outcomes),
+        'results': [summary(name, by_endpoint[name]) for name in MIX if name in by_endpoint],
+        'memory': memory,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', required=True, help='sqlite file built by benchmarks.dataset')
+    parser.add_argument('--requests', type=int, default=100, help='requests per endpoint in the mix')
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent client connections')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers in every profile')
+    parser.add_argument('--slots', type=int, default=16, help='threads or greenlets per worker')
+    parser.add_argument('--port', type=int, default=7761)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this file instead of stdout')
+    args = parser.parse_args()
+
+    dataset = endpoint_bench.Dataset(args.dataset)
+    requests = mixed_requests(endpoint_bench.scenarios(dataset, args.requests, random.Random(args.seed)))
+    dataset.close()
+
+    results = {}
+    for name, environ in profiles(args.slots).items():
+        if environ['GUNICORN_WORKER_CLASS'] == 'gevent' and importlib.util.find_spec('gevent') is None:
+            results[name] = {'skipped': 'gevent is not installed'}
+            continue
+
+        # each profile reads its own copy, so page cache and WAL state start out alike
+        workdir = tempfile.mkdtemp(prefix='worker-bench-')
+        database_path = os.path.join(workdir, 'bench.sqlite3')
+        shutil.copyfile(args.dataset, database_path)
+        try:
+            results[name] = run_profile(requests, args.concurrency, 'sqlite:///' + database_path, args.port,
+                                        args.workers, environ)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': endpoint_bench.git_commit(),
+            'requests_per_endpoint': args.requests,
+            'concurrency': args.concurrency,
+            'workers': args.workers,
+            'slots': args.slots,
+            'seed': args.seed,
+        },
+        'profiles': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as fo:
+            fo.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
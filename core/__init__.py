@@ -2,22 +2,35 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from sqlalchemy import event
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Engine, make_url
 from sqlite3 import Connection as SQLite3Connection
+from core import config
+from core.libs import cooperative
+from core.libs.cache import ResponseCache
+from core.libs.sampled_log import SampledLogger
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///./store.sqlite3'
-app.config['SQLALCHEMY_ECHO'] = False
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+app.config.from_object(config.get_config())
+# one session per greenlet, so requests served concurrently by a gevent worker never share one
+db = SQLAlchemy(app, session_options={'scopefunc': cooperative.session_scope})
+if cooperative.is_monkey_patched() and make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'postgresql':
+    cooperative.make_psycopg2_cooperative()
 migrate = Migrate(app, db)
+response_cache = ResponseCache.from_config(app.config)
+response_cache.track(db.session)
+debug_log = SampledLogger.from_config('core.debug', app.config)
 app.test_client()
 
 
-# this is to enforce fk (not done by default in sqlite3)
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute('PRAGMA {}={};'.format(name, value))
+    cursor.close()
+
+
+# foreign keys are not enforced by default in sqlite3, the rest is tuning for concurrent workers
 @event.listens_for(Engine, "connect")
 def _set_sqlite_pragma(dbapi_connection, connection_record):
     if isinstance(dbapi_connection, SQLite3Connection):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON;")
-        cursor.close()
+        apply_sqlite_pragmas(dbapi_connection, app.config['SQLITE_PRAGMAS'])
@@ -1,11 +1,12 @@
-from flask import Blueprint, request
+from flask import Blueprint, current_app, request
 from core.apis import decorators
 from core.apis.responses import APIResponse
-from core.models.assignments import Assignment, AssignmentStateEnum , GradeEnum
-from .schema import AssignmentSchema
-from core import db
+from core.models.assignment_events import AssignmentEvent
+from core.models.assignments import Assignment, GradeEnum
+from .schema import AssignmentGradeSchema, assignment_serializer
+from core import debug_log
 
-from core.libs import helpers, assertions
+from core.libs import assertions, cache, pagination
 
 principal_assignments_resources = Blueprint('principal_assignments_resources', __name__)
 
@@ -13,17 +14,34 @@ principal_assignments_resources = Blueprint('principal_assignments_resources', _
 @decorators.authenticate_principal
 def list_assignments(p):
     """Returns list of all submitted and graded assignments"""
-    assignments = Assignment.get_submitted_and_graded_assignments()
-    
-    all_assignments = Assignment.get_all_assignments()
-    print(f"Total assignments: {len(all_assignments)}")
-    for assignment in all_assignments:
-        print(f"ID: {assignment.id}, State: {assignment.state}, Grade: {assignment.grade}")
-    
-    assignments_dump = AssignmentSchema().dump(assignments, many=True)
-    return APIResponse.respond(data=assignments_dump)
+    page = pagination.Page.from_args(request.args)
+
+    def build():
+        assignments = Assignment.get_submitted_and_graded_assignment_rows(
+            after_id=page.after_id, limit=page.fetch_limit
+        )
+        debug_log.debug('principal.list_assignments', principal_id=p.principal_id,
+                        limit=page.limit, after_id=page.after_id)
+        return APIResponse.stream(assignments, serialize=assignment_serializer, page=page)
+
+    def get_watermark():
+        return Assignment.get_watermark(*Assignment.principal_scope())
+
+    return APIResponse.cached(cache.scope('principal'), get_watermark, build)
+
+
+@principal_assignments_resources.route('/assignments/changes', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def list_assignment_changes(p):
+    """Returns submitted and graded assignments changed since the `since` token, oldest change first"""
+    page = pagination.ChangesPage.from_args(request.args)
+    page.until = AssignmentEvent.get_settled_position(page.position, current_app.config['CHANGE_FEED_SETTLE_SECONDS'])
+    changes = Assignment.get_changes(Assignment.principal_scope(), since=page.since, until=page.until,
+                                     after_id=page.after_id, limit=page.fetch_limit)
+    return APIResponse.stream(changes, serialize=assignment_serializer, page=page)
 
 @principal_assignments_resources.route('/assignments/grade', methods=['POST'])
+@decorators.transactional
 @decorators.authenticate_principal
 def grade_assignment(p):
     """Grade or re-grade an assignment"""
@@ -35,13 +53,19 @@ def grade_assignment(p):
     assertions.assert_valid(grade, 'Grade is required')
     assertions.assert_valid(grade in GradeEnum.__members__, 'Invalid grade')
 
-    assignment = Assignment.get_by_id(assignment_id)
-    assertions.assert_found(assignment, 'No assignment with this id was found')
+    version = grade_request.get('version')
+    assertions.assert_valid(version is None or isinstance(version, int), 'Invalid version')
 
-    assignment.grade = GradeEnum[grade]
-    assignment.state = 'GRADED'  
-    assignment.updated_at = helpers.get_utc_now()
-    
-    db.session.commit()
+    graded_assignment = Assignment.regrade(assignment_id, GradeEnum[grade], version=version)
+    return APIResponse.respond(data=assignment_serializer(graded_assignment))
 
-    return APIResponse.respond(data=AssignmentSchema().dump(assignment))
\ No newline at end of file
+
+@principal_assignments_resources.route('/assignments/grade/bulk', methods=['POST'], strict_slashes=False)
+@decorators.transactional
+@decorators.accept_bulk_payload
+@decorators.authenticate_principal
+def bulk_grade_assignments(p, incoming_payload):
+    """Grade many assignments in one transaction"""
+    grades = AssignmentGradeSchema(many=True).load(incoming_payload)
+    results = Assignment.bulk_mark_grade(grades, auth_principal=p)
+    return APIResponse.respond(data=results)
@@ -3,6 +3,7 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema, auto_field
 from marshmallow_enum import EnumField
 from core.models.assignments import Assignment, GradeEnum
 from core.libs.helpers import GeneralObject
+from core.libs.serializers import compile_serializer
 
 
 class AssignmentSchema(SQLAlchemyAutoSchema):
@@ -18,6 +19,8 @@ class AssignmentSchema(SQLAlchemyAutoSchema):
     student_id = auto_field(dump_only=True)
     grade = auto_field(dump_only=True)
     state = auto_field(dump_only=True)
+    # optional on edits: a stale version is answered with 409 instead of overwriting
+    version = auto_field(required=False, allow_none=True)
 
     @post_load
     def initiate_class(self, data_dict, many, partial):
@@ -31,6 +34,7 @@ class AssignmentSubmitSchema(Schema):
 
     id = fields.Integer(required=True, allow_none=False)
     teacher_id = fields.Integer(required=True, allow_none=False)
+    version = fields.Integer(required=False, allow_none=True, missing=None)
 
     @post_load
     def initiate_class(self, data_dict, many, partial):
@@ -44,8 +48,13 @@ class AssignmentGradeSchema(Schema):
 
     id = fields.Integer(required=True, allow_none=False)
     grade = EnumField(GradeEnum, required=True, allow_none=False)
+    version = fields.Integer(required=False, allow_none=True, missing=None)
 
     @post_load
     def initiate_class(self, data_dict, many, partial):
 
         return GeneralObject(**data_dict)
+
+
+# marshmallow-free dump of the same fields, for list endpoints that serialize many rows
+assignment_serializer = compile_serializer(Assignment, list(AssignmentSchema().dump_fields))
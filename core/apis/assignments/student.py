@@ -1,10 +1,12 @@
-from flask import Blueprint
-from core import db
+from flask import Blueprint, current_app, request
+from core import notifications
 from core.apis import decorators
 from core.apis.responses import APIResponse
+from core.libs import cache, metrics, pagination
+from core.models.assignment_events import AssignmentEvent
 from core.models.assignments import Assignment
 
-from .schema import AssignmentSchema, AssignmentSubmitSchema
+from .schema import AssignmentSchema, AssignmentSubmitSchema, assignment_serializer
 student_assignments_resources = Blueprint('student_assignments_resources', __name__)
 
 
@@ -12,12 +14,42 @@ student_assignments_resources = Blueprint('student_assignments_resources', __nam
 @decorators.authenticate_principal
 def list_assignments(p):
     """Returns list of assignments"""
-    students_assignments = Assignment.get_assignments_by_student(p.student_id)
-    students_assignments_dump = AssignmentSchema().dump(students_assignments, many=True)
-    return APIResponse.respond(data=students_assignments_dump)
+    page = pagination.Page.from_args(request.args)
+
+    def build():
+        students_assignments = page.take(Assignment.get_assignment_rows_by_student(
+            p.student_id, after_id=page.after_id, limit=page.fetch_limit
+        ))
+        with metrics.serializing():
+            students_assignments_dump = [assignment_serializer(assignment) for assignment in students_assignments]
+        return APIResponse.respond(data=students_assignments_dump, next_cursor=page.next_cursor)
+
+    def get_watermark():
+        return Assignment.get_watermark(*Assignment.student_scope(p.student_id))
+
+    return APIResponse.cached(cache.scope('student', p.student_id), get_watermark, build)
+
+
+@student_assignments_resources.route('/assignments/changes', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def list_assignment_changes(p):
+    """Returns the student's assignments changed since the `since` token, oldest change first"""
+    page = pagination.ChangesPage.from_args(request.args)
+    page.until = AssignmentEvent.get_settled_position(page.position, current_app.config['CHANGE_FEED_SETTLE_SECONDS'])
+    changes = Assignment.get_changes(Assignment.student_scope(p.student_id), since=page.since, until=page.until,
+                                     after_id=page.after_id, limit=page.fetch_limit)
+    return APIResponse.stream(changes, serialize=assignment_serializer, page=page)
+
+
+@student_assignments_resources.route('/assignments/events', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def stream_assignment_events(p):
+    """Server-sent events for the student's submissions and grades, from Last-Event-ID on when it is sent"""
+    return notifications.stream('student', p.student_id, request.headers.get('Last-Event-ID'))
 
 
 @student_assignments_resources.route('/assignments', methods=['POST'], strict_slashes=False)
+@decorators.transactional
 @decorators.accept_payload
 @decorators.authenticate_principal
 def upsert_assignment(p, incoming_payload):
@@ -26,12 +58,23 @@ def upsert_assignment(p, incoming_payload):
     assignment.student_id = p.student_id
 
     upserted_assignment = Assignment.upsert(assignment)
-    db.session.commit()
     upserted_assignment_dump = AssignmentSchema().dump(upserted_assignment)
     return APIResponse.respond(data=upserted_assignment_dump)
 
 
+@student_assignments_resources.route('/assignments/bulk', methods=['POST'], strict_slashes=False)
+@decorators.transactional
+@decorators.accept_bulk_payload
+@decorators.authenticate_principal
+def bulk_upsert_assignments(p, incoming_payload):
+    """Create or Edit many draft assignments in one transaction"""
+    assignments = AssignmentSchema(many=True).load(incoming_payload)
+    results = Assignment.bulk_upsert(assignments, student_id=p.student_id)
+    return APIResponse.respond(data=results)
+
+
 @student_assignments_resources.route('/assignments/submit', methods=['POST'], strict_slashes=False)
+@decorators.transactional
 @decorators.accept_payload
 @decorators.authenticate_principal
 def submit_assignment(p, incoming_payload):
@@ -41,8 +84,8 @@ def submit_assignment(p, incoming_payload):
     submitted_assignment = Assignment.submit(
         _id=submit_assignment_payload.id,
         teacher_id=submit_assignment_payload.teacher_id,
-        auth_principal=p
+        auth_principal=p,
+        version=submit_assignment_payload.version
     )
-    db.session.commit()
-    submitted_assignment_dump = AssignmentSchema().dump(submitted_assignment)
+    submitted_assignment_dump = assignment_serializer(submitted_assignment)
     return APIResponse.respond(data=submitted_assignment_dump)
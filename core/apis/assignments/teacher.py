@@ -1,10 +1,12 @@
-from flask import Blueprint
-from core import db
+from flask import Blueprint, current_app, request
+from core import notifications
 from core.apis import decorators
 from core.apis.responses import APIResponse
+from core.libs import cache, pagination
+from core.models.assignment_events import AssignmentEvent
 from core.models.assignments import Assignment
 
-from .schema import AssignmentSchema, AssignmentGradeSchema
+from .schema import AssignmentGradeSchema, assignment_serializer
 teacher_assignments_resources = Blueprint('teacher_assignments_resources', __name__)
 
 
@@ -13,12 +15,40 @@ teacher_assignments_resources = Blueprint('teacher_assignments_resources', __nam
 @decorators.authenticate_principal
 def list_assignments(p):
     """Returns list of assignments"""
-    teachers_assignments = Assignment.get_assignments_by_teacher(p.teacher_id)
-    teachers_assignments_dump = AssignmentSchema().dump(teachers_assignments, many=True)
-    return APIResponse.respond(data=teachers_assignments_dump)
+    page = pagination.Page.from_args(request.args)
+
+    def build():
+        teachers_assignments = Assignment.get_assignment_rows_by_teacher(
+            p.teacher_id, after_id=page.after_id, limit=page.fetch_limit
+        )
+        return APIResponse.stream(teachers_assignments, serialize=assignment_serializer, page=page)
+
+    def get_watermark():
+        return Assignment.get_watermark(*Assignment.teacher_scope(p.teacher_id))
+
+    return APIResponse.cached(cache.scope('teacher', p.teacher_id), get_watermark, build)
+
+
+@teacher_assignments_resources.route('/assignments/changes', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def list_assignment_changes(p):
+    """Returns the teacher's assignments changed since the `since` token, oldest change first"""
+    page = pagination.ChangesPage.from_args(request.args)
+    page.until = AssignmentEvent.get_settled_position(page.position, current_app.config['CHANGE_FEED_SETTLE_SECONDS'])
+    changes = Assignment.get_changes(Assignment.teacher_scope(p.teacher_id), since=page.since, until=page.until,
+                                     after_id=page.after_id, limit=page.fetch_limit)
+    return APIResponse.stream(changes, serialize=assignment_serializer, page=page)
+
+
+@teacher_assignments_resources.route('/assignments/events', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def stream_assignment_events(p):
+    """Server-sent events for the teacher's submissions and grades, from Last-Event-ID on when it is sent"""
+    return notifications.stream('teacher', p.teacher_id, request.headers.get('Last-Event-ID'))
 
 
 @teacher_assignments_resources.route('/assignments/grade', methods=['POST'], strict_slashes=False)
+@decorators.transactional
 @decorators.accept_payload
 @decorators.authenticate_principal
 def grade_assignment(p, incoming_payload):
@@ -28,8 +58,19 @@ def grade_assignment(p, incoming_payload):
     graded_assignment = Assignment.mark_grade(
         _id=grade_assignment_payload.id,
         grade=grade_assignment_payload.grade,
-        auth_principal=p
+        auth_principal=p,
+        version=grade_assignment_payload.version
     )
-    db.session.commit()
-    graded_assignment_dump = AssignmentSchema().dump(graded_assignment)
+    graded_assignment_dump = assignment_serializer(graded_assignment)
     return APIResponse.respond(data=graded_assignment_dump)
+
+
+@teacher_assignments_resources.route('/assignments/grade/bulk', methods=['POST'], strict_slashes=False)
+@decorators.transactional
+@decorators.accept_bulk_payload
+@decorators.authenticate_principal
+def bulk_grade_assignments(p, incoming_payload):
+    """Grade many assignments in one transaction"""
+    grades = AssignmentGradeSchema(many=True).load(incoming_payload)
+    results = Assignment.bulk_mark_grade(grades, auth_principal=p)
+    return APIResponse.respond(data=results)
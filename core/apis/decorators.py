@@ -1,15 +1,88 @@
 import json
-from flask import request
+from flask import current_app, request
+from core import config, db
 from core.libs import assertions
-from functools import wraps
+from functools import lru_cache, wraps
+
+
+# (role attribute, error message) a principal must satisfy for each role
+ROLE_REQUIREMENTS = {
+    'student': ('student_id', 'requester should be a student'),
+    'teacher': ('teacher_id', 'requester should be a teacher'),
+    'principal': ('principal_id', 'requester should be a principal'),
+}
+
+# url rule -> role, resolved once per rule instead of matching the path on every request
+_rule_roles = {}
 
 
 class AuthPrincipal:
+    """Immutable, so a single instance can be shared by every request sending the same header"""
+    __slots__ = ('user_id', 'student_id', 'teacher_id', 'principal_id')
+
     def __init__(self, user_id, student_id=None, teacher_id=None, principal_id=None):
-        self.user_id = user_id
-        self.student_id = student_id
-        self.teacher_id = teacher_id
-        self.principal_id = principal_id
+        object.__setattr__(self, 'user_id', user_id)
+        object.__setattr__(self, 'student_id', student_id)
+        object.__setattr__(self, 'teacher_id', teacher_id)
+        object.__setattr__(self, 'principal_id', principal_id)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('AuthPrincipal is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('AuthPrincipal is immutable')
+
+
+def _role_for_rule(rule):
+    for role in ROLE_REQUIREMENTS:
+        if rule.startswith('/' + role):
+            return role
+    return None
+
+
+def register_roles(app):
+    """Resolves the role of every route registered so far; call after registering blueprints"""
+    for rule in app.url_map.iter_rules():
+        _rule_roles[rule.rule] = _role_for_rule(rule.rule)
+
+
+@lru_cache(maxsize=config.Config.PRINCIPAL_CACHE_SIZE)
+def load_principal(p_str, role):
+    """Parses and role-checks an X-Principal header; failures raise and are never cached"""
+    assertions.assert_found(role, 'No such api')
+    p_dict = json.loads(p_str)
+    p = AuthPrincipal(
+        user_id=p_dict['user_id'],
+        student_id=p_dict.get('student_id'),
+        teacher_id=p_dict.get('teacher_id'),
+        principal_id=p_dict.get('principal_id')
+    )
+
+    attribute, message = ROLE_REQUIREMENTS[role]
+    assertions.assert_true(getattr(p, attribute) is not None, message)
+    return p
+
+
+def principal_cache_info():
+    """hits, misses, maxsize and currsize of the parsed principal cache"""
+    return load_principal.cache_info()
+
+
+def transactional(func):
+    """
+    One transaction per request: the models only flush, this commits once after the view
+    returns, and rolls everything back if the view or the commit raised
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            response = func(*args, **kwargs)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return response
+    return wrapper
 
 
 def accept_payload(func):
@@ -20,27 +93,27 @@ def accept_payload(func):
     return wrapper
 
 
+def accept_bulk_payload(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        incoming_payload = request.json
+        assertions.assert_valid(isinstance(incoming_payload, list), 'Expected a list of items')
+        max_items = current_app.config['BULK_MAX_ITEMS']
+        assertions.assert_valid(len(incoming_payload) <= max_items, 'At most {} items per request'.format(max_items))
+        return func(incoming_payload, *args, **kwargs)
+    return wrapper
+
+
 def authenticate_principal(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
         p_str = request.headers.get('X-Principal')
         assertions.assert_auth(p_str is not None, 'principal not found')
-        p_dict = json.loads(p_str)
-        p = AuthPrincipal(
-            user_id=p_dict['user_id'],
-            student_id=p_dict.get('student_id'),
-            teacher_id=p_dict.get('teacher_id'),
-            principal_id=p_dict.get('principal_id')
-        )
-
-        if request.path.startswith('/student'):
-            assertions.assert_true(p.student_id is not None, 'requester should be a student')
-        elif request.path.startswith('/teacher'):
-            assertions.assert_true(p.teacher_id is not None, 'requester should be a teacher')
-        elif request.path.startswith('/principal'):
-            assertions.assert_true(p.principal_id is not None, 'requester should be a principal')
-        else:
-            assertions.assert_found(None, 'No such api')
 
+        rule = request.url_rule.rule
+        if rule not in _rule_roles:
+            _rule_roles[rule] = _role_for_rule(rule)
+
+        p = load_principal(p_str, _rule_roles[rule])
         return func(p, *args, **kwargs)
     return wrapper
@@ -0,0 +1,5 @@
+from .principal import principal_reports_resources
+
+__all__ = [
+    'principal_reports_resources'
+]
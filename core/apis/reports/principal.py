@@ -0,0 +1,99 @@
+from flask import Blueprint, request
+from core.apis import decorators
+from core.apis.responses import APIResponse
+from core.libs import assertions, helpers, pagination
+from core.models.assignment_reports import AssignmentReport
+from core.models.assignment_stats import AssignmentStats
+from core.models.assignments import GradeEnum
+
+from .schema import stats_serializer
+principal_reports_resources = Blueprint('principal_reports_resources', __name__)
+
+
+def _date_range(args):
+    """Optional `from` (inclusive) and `to` (exclusive) ISO 8601 bounds on updated_at"""
+    bounds = []
+    for name in ('from', 'to'):
+        value = args.get(name)
+        parsed = helpers.parse_utc_datetime(value) if value else None
+        assertions.assert_valid(not value or parsed is not None, '{} should be an ISO 8601 date or datetime'.format(name))
+        bounds.append(parsed)
+    assertions.assert_valid(None in bounds or bounds[0] < bounds[1], 'from should be before to')
+    return bounds
+
+
+def _grade(args):
+    grade = args.get('grade', GradeEnum.A.value)
+    assertions.assert_valid(grade in GradeEnum.__members__, 'Invalid grade')
+    return GradeEnum[grade]
+
+
+@principal_reports_resources.route('/teachers', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def teacher_stats(p):
+    """Assignment counts by state and grade for every teacher"""
+    return APIResponse.respond(data=[stats_serializer(row) for row in AssignmentStats.get_teacher_stats()])
+
+
+@principal_reports_resources.route('/students', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def student_stats(p):
+    """Assignment counts by state and grade for every student"""
+    return APIResponse.respond(data=[stats_serializer(row) for row in AssignmentStats.get_student_stats()])
+
+
+@principal_reports_resources.route('/teachers/top', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def top_teacher(p):
+    """Teacher who graded the most assignments with the given grade (default A)"""
+    row = AssignmentStats.get_top_teacher_by_grade(_grade(request.args))
+    return APIResponse.respond(data=stats_serializer(row) if row else None)
+
+
+@principal_reports_resources.route('/grades/histogram', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def grade_histogram(p):
+    """Graded assignments per grade, optionally for one teacher"""
+    start, end = _date_range(request.args)
+    teacher_id = request.args.get('teacher_id')
+    assertions.assert_valid(teacher_id is None or teacher_id.isdigit(), 'teacher_id should be an integer')
+
+    result = AssignmentReport.grade_histogram(start, end, teacher_id=int(teacher_id) if teacher_id else None)
+    return APIResponse.columnar(result)
+
+
+@principal_reports_resources.route('/teachers/leaderboard', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def teacher_leaderboard(p):
+    """Teachers ranked by the number of assignments graded with `grade` (default A)"""
+    start, end = _date_range(request.args)
+    limit = request.args.get('limit', str(pagination.DEFAULT_PAGE_SIZE))
+    assertions.assert_valid(limit.isdigit() and 0 < int(limit) <= pagination.MAX_PAGE_SIZE,
+                            'limit should be between 1 and {}'.format(pagination.MAX_PAGE_SIZE))
+
+    result = AssignmentReport.teacher_leaderboard(_grade(request.args), start, end, limit=int(limit))
+    return APIResponse.columnar(result)
+
+
+@principal_reports_resources.route('/students/graded', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def graded_per_student(p):
+    """Number of graded assignments of every student"""
+    start, end = _date_range(request.args)
+    return APIResponse.columnar(AssignmentReport.graded_per_student(start, end))
+
+
+@principal_reports_resources.route('/teachers/turnaround', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def teacher_turnaround(p):
+    """Average and longest time from creation to grading per teacher, in seconds"""
+    start, end = _date_range(request.args)
+    return APIResponse.columnar(AssignmentReport.teacher_turnaround(start, end))
+
+
+@principal_reports_resources.route('/teachers/backlog', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def teacher_backlog(p):
+    """Submitted assignments still waiting to be graded, per teacher"""
+    start, end = _date_range(request.args)
+    return APIResponse.columnar(AssignmentReport.teacher_backlog(start, end))
@@ -0,0 +1,5 @@
+from core.libs.serializers import compile_serializer
+from core.models.assignment_stats import AssignmentStats, COUNT_COLUMNS
+
+# one summary row per teacher or student; the scope is implied by the endpoint
+stats_serializer = compile_serializer(AssignmentStats, ['scope_id'] + COUNT_COLUMNS)
@@ -1,7 +1,201 @@
-from flask import Response, jsonify, make_response
+import hashlib
+import tempfile
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from enum import Enum
+
+from flask import Response, json, jsonify, make_response, request, stream_with_context
+
+from core import response_cache
+from core.libs import metrics
+
+# rows are buffered into chunks of roughly this many bytes before being written out
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# rows fetched at a time by columnar(); the columns spill to disk past COLUMN_SPOOL_BYTES each
+COLUMNAR_FETCH_SIZE = 500
+COLUMN_SPOOL_BYTES = 256 * 1024
+
+
+# revalidate on every use, but let the client keep its copy between requests
+CONDITIONAL_CACHE_CONTROL = 'private, no-cache'
+
+
+def _dumps(value):
+    # same compact separators as jsonify, so streamed and buffered bodies are byte-identical
+    return json.dumps(value, separators=(',', ':'))
 
 
 class APIResponse(Response):
     @classmethod
-    def respond(cls, data):
-        return make_response(jsonify(data=data))
+    def respond(cls, data, **envelope):
+        with metrics.serializing():
+            return make_response(jsonify(data=data, **envelope))
+
+    @classmethod
+    def stream(cls, rows, serialize, page=None):
+        """Writes the {"data": [...]} envelope while iterating rows, one serialized row at a time"""
+        def generate():
+            chunk = ['{"data":[']
+            size = 0
+            separator = ''
+            serialization_seconds = 0.0
+            for row in (page.iterate(rows) if page else rows):
+                # rows are fetched lazily, so only the serializing part of each step is timed
+                started_at = time.perf_counter()
+                item = separator + _dumps(serialize(row))
+                serialization_seconds += time.perf_counter() - started_at
+                separator = ','
+                chunk.append(item)
+                size += len(item)
+                if size >= STREAM_CHUNK_SIZE:
+                    yield ''.join(chunk)
+                    chunk = []
+                    size = 0
+
+            chunk.append(']')
+            if page:
+                chunk.extend(',{}:{}'.format(_dumps(key), _dumps(value)) for key, value in page.envelope().items())
+            chunk.append('}\n')
+            metrics.add_serialization(serialization_seconds)
+            yield ''.join(chunk)
+
+        return cls(stream_with_context(generate()), mimetype='application/json')
+
+    @classmethod
+    def columnar(cls, result):
+        """
+        Writes a result set as {"data": {"<column>": [values...], ...}}, one array per column.
+        The first array needs every row, so rows are fetched COLUMNAR_FETCH_SIZE at a time and
+        each column is serialized into its own spooled file, then the files are written out in
+        STREAM_CHUNK_SIZE pieces. Memory stays bounded however many rows the report has.
+        """
+        def generate():
+            names = list(result.keys())
+            columns = [tempfile.SpooledTemporaryFile(max_size=COLUMN_SPOOL_BYTES, mode='w+') for _ in names]
+            try:
+                separator = ''
+                serialization_seconds = 0.0
+                for rows in result.partitions(COLUMNAR_FETCH_SIZE):
+                    started_at = time.perf_counter()
+                    for column, values in zip(columns, zip(*rows)):
+                        column.write(separator + ','.join(_dumps(_plain(value)) for value in values))
+                    serialization_seconds += time.perf_counter() - started_at
+                    separator = ','
+                metrics.add_serialization(serialization_seconds)
+
+                yield '{"data":{'
+                for index, (name, column) in enumerate(zip(names, columns)):
+                    yield '{}{}:['.format(',' if index else '', _dumps(name))
+                    column.seek(0)
+                    yield from iter(lambda: column.read(STREAM_CHUNK_SIZE), '')
+                    yield ']'
+                yield '}}\n'
+            finally:
+                for column in columns:
+                    column.close()
+
+        return cls(stream_with_context(generate()), mimetype='application/json')
+
+    @classmethod
+    def conditional(cls, watermark, build):
+        """
+        Answers a GET with 304 when the client already holds this version of the listing.
+        `watermark` is the (max updated_at, count) of the rows in scope; `build` renders the
+        full response and only runs when the client has to get a new body.
+        """
+        last_updated_at, count = watermark
+        etag = _watermark_etag(last_updated_at, count)
+        last_modified = last_updated_at.replace(tzinfo=timezone.utc) if last_updated_at else None
+
+        if _is_fresh(etag, last_modified):
+            response = cls(status=304)
+        else:
+            response = build()
+
+        return _with_validators(response, etag, last_modified)
+
+    @classmethod
+    def cached(cls, scope_name, get_watermark, build):
+        """
+        conditional() behind the response cache: a hit answers from memory without touching the
+        database. The scope version is read before anything else, so a body rendered while a
+        write commits lands under the old version and is never served after the commit.
+        """
+        if not response_cache.enabled:
+            return cls.conditional(get_watermark(), build)
+
+        key = response_cache.key(request.path, scope_name, response_cache.version(scope_name), request.args)
+        entry = response_cache.get(key)
+        if entry is not None:
+            if _is_fresh(entry['etag'], entry['last_modified']):
+                response = cls(status=304)
+            else:
+                response = cls(entry['body'], mimetype=entry['mimetype'])
+            return _with_validators(response, entry['etag'], entry['last_modified'])
+
+        response = cls.conditional(get_watermark(), build)
+        if response.status_code == 200:
+            entry = {'etag': response.get_etag()[0], 'last_modified': response.last_modified, 'mimetype': response.mimetype}
+            response.response = _store_when_sent(response.iter_encoded(), key, entry)
+        return response
+
+
+def _plain(value):
+    # the json encoder would render datetimes as http dates and decimals not at all
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _store_when_sent(chunks, key, entry):
+    # tees a (possibly streamed) body into the cache once it has been written out completely
+    body = []
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size <= response_cache.max_entry_bytes:
+            body.append(chunk)
+        yield chunk
+
+    if size <= response_cache.max_entry_bytes:
+        entry['body'] = b''.join(body)
+        response_cache.set(key, entry)
+
+
+def _with_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = CONDITIONAL_CACHE_CONTROL
+    return response
+
+
+def _watermark_etag(last_updated_at, count):
+    # the url and principal are part of the tag, so one page never validates another page or caller
+    digest = hashlib.sha1()
+    for part in (request.full_path, request.headers.get('X-Principal', ''),
+                 last_updated_at.isoformat() if last_updated_at else '', str(count)):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _is_fresh(etag, last_modified):
+    if request.if_none_match:
+        # If-None-Match wins over If-Modified-Since when both are sent (RFC 7232, 6)
+        return request.if_none_match.contains_weak(etag)
+
+    if_modified_since = request.if_modified_since
+    if not if_modified_since or not last_modified:
+        return False
+    # http dates have one second resolution, so only a second that is already over can be validated:
+    # a write later in the same second would otherwise be hidden behind an unchanged Last-Modified
+    last_modified_second = last_modified.replace(microsecond=0)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    return last_modified_second <= if_modified_since and last_modified_second < now
@@ -0,0 +1,107 @@
+import time
+
+import click
+from flask.cli import AppGroup
+
+from core import db, seed
+from core.models import projections
+from core.models.assignment_stats import AssignmentStats
+
+stats_cli = AppGroup('stats', help='Maintain the assignment_stats summary table.')
+projections_cli = AppGroup('projections', help='Fold assignment_events into their projections.')
+
+
+def _report_mismatches(mismatches):
+    for scope, scope_id, stored, expected in mismatches:
+        click.echo('{}:{} stored={} expected={}'.format(scope, scope_id, stored, expected), err=True)
+
+
+@stats_cli.command('verify')
+def verify_stats():
+    """Compares the summary with a full recount of assignments; exits 1 on any difference"""
+    mismatches = AssignmentStats.verify()
+    _report_mismatches(mismatches)
+    if mismatches:
+        raise click.ClickException('{} summary rows differ from a recount'.format(len(mismatches)))
+    click.echo('assignment_stats matches a full recount')
+
+
+@stats_cli.command('rebuild')
+def rebuild_stats():
+    """Recounts the summary from assignments, then verifies the result"""
+    drift = AssignmentStats.verify()
+    _report_mismatches(drift)
+
+    rows = AssignmentStats.rebuild()
+    mismatches = AssignmentStats.verify()
+    if mismatches:
+        db.session.rollback()
+        _report_mismatches(mismatches)
+        raise click.ClickException('rebuilt summary does not match a recount, rolled back')
+
+    db.session.commit()
+    click.echo('rebuilt {} rows, fixed {} that had drifted'.format(rows, len(drift)))
+
+
+def _run_projections(names, replay, batch_size, settle_seconds):
+    for name in names or sorted(projections.PROJECTIONS):
+        started = time.perf_counter()
+        try:
+            applied = replay(projections.PROJECTIONS[name], batch_size=batch_size, settle_seconds=settle_seconds)
+        except Exception:
+            db.session.rollback()
+            raise
+        seconds = time.perf_counter() - started
+        click.echo('{}: applied {} events in {:.1f}s, {:.0f} events/s'.format(
+            name, applied, seconds, applied / seconds if seconds else 0
+        ))
+
+
+_projection_names = click.option('--name', 'names', multiple=True, type=click.Choice(sorted(projections.PROJECTIONS)),
+                                 help='projection to run, default all')
+_batch_size = click.option('--batch-size', default=projections.BATCH_SIZE, show_default=True,
+                           help='events per committed batch')
+_settle_seconds = click.option('--settle-seconds', default=projections.SETTLE_SECONDS, show_default=True,
+                               help='leave events younger than this for the next run')
+
+
+@projections_cli.command('run')
+@_projection_names
+@_batch_size
+@_settle_seconds
+def run_projections(names, batch_size, settle_seconds):
+    """Applies the events written since each projection's stored offset"""
+    _run_projections(names, projections.catch_up, batch_size, settle_seconds)
+
+
+@projections_cli.command('rebuild')
+@_projection_names
+@_batch_size
+@_settle_seconds
+def rebuild_projections(names, batch_size, settle_seconds):
+    """Empties each projection and replays the whole event log into it"""
+    _run_projections(names, projections.rebuild, batch_size, settle_seconds)
+
+
+@click.command('seed')
+@click.option('--teachers', default=100, show_default=True)
+@click.option('--students', default=1000, show_default=True)
+@click.option('--principals', default=1, show_default=True)
+@click.option('--assignments', default=100000, show_default=True)
+@click.option('--seed', 'seed_value', default=0, show_default=True, help='same seed, same rows')
+@click.option('--chunk-size', default=seed.CHUNK_SIZE, show_default=True, help='rows per executemany')
+def seed_command(teachers, students, principals, assignments, seed_value, chunk_size):
+    """Adds generated users, teachers, students, principals and assignments in one transaction"""
+    started = time.perf_counter()
+    try:
+        counts = seed.seed(teachers=teachers, students=students, principals=principals, assignments=assignments,
+                           seed_value=seed_value, chunk_size=chunk_size)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    seconds = time.perf_counter() - started
+    click.echo('seeded {teachers} teachers, {students} students, {principals} principals and '
+               '{assignments} assignments'.format(**counts))
+    click.echo('{:.1f}s, {:.0f} assignments/s'.format(seconds, counts['assignments'] / seconds if seconds else 0))
@@ -0,0 +1,206 @@
+import os
+import tempfile
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from core.libs import cooperative
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+class Config:
+    """
+    Settings shared by every environment. Every value can be overridden from the environment,
+    so the same image runs against the bundled sqlite file or a pooled server database.
+    """
+    ENV_NAME = None
+    TESTING = False
+
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///./store.sqlite3')
+    SQLALCHEMY_ECHO = env_bool('SQLALCHEMY_ECHO', False)
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # server databases only (postgresql, mysql): sqlite keeps one small pool per worker below
+    DB_POOL_SIZE = env_int('DB_POOL_SIZE', 5)
+    DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 10)
+    DB_POOL_PRE_PING = env_bool('DB_POOL_PRE_PING', False)
+    DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', -1)
+    DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 30)
+    # 0 disables it; on sqlite, lock waits are bounded by busy_timeout instead
+    DB_STATEMENT_TIMEOUT_MS = env_int('DB_STATEMENT_TIMEOUT_MS', 0)
+
+    # distinct X-Principal headers kept parsed and role-checked in each worker
+    PRINCIPAL_CACHE_SIZE = env_int('PRINCIPAL_CACHE_SIZE', 4096)
+
+    # largest array accepted by the bulk write endpoints in one request
+    BULK_MAX_ITEMS = env_int('BULK_MAX_ITEMS', 10000)
+
+    # added to the statement timeout for the change feed settle window below
+    CHANGE_FEED_SETTLE_MARGIN_SECONDS = env_float('CHANGE_FEED_SETTLE_MARGIN_SECONDS', 1.0)
+
+    # server-sent events (core.notifications): each worker polls assignment_events every
+    # SSE_POLL_INTERVAL seconds; a listener keeps at most SSE_QUEUE_SIZE undelivered messages
+    # and a reconnecting one is replayed at most SSE_REPLAY_LIMIT of those it missed
+    SSE_POLL_INTERVAL = env_float('SSE_POLL_INTERVAL', 1.0)
+    SSE_HEARTBEAT_SECONDS = env_float('SSE_HEARTBEAT_SECONDS', 15.0)
+    SSE_QUEUE_SIZE = env_int('SSE_QUEUE_SIZE', 100)
+    SSE_REPLAY_LIMIT = env_int('SSE_REPLAY_LIMIT', 1000)
+
+    # rendered list responses, invalidated per scope on commit; off by default, because
+    # LRUBackend is per process and is refused when GUNICORN_NUMBER_WORKERS is above 1:
+    # several workers need a shared core.libs.cache.CacheBackend to never serve a stale page
+    RESPONSE_CACHE_ENABLED = env_bool('RESPONSE_CACHE_ENABLED', False)
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'core.libs.cache.LRUBackend')
+    RESPONSE_CACHE_SIZE = env_int('RESPONSE_CACHE_SIZE', 1024)
+    RESPONSE_CACHE_MAX_ENTRY_BYTES = env_int('RESPONSE_CACHE_MAX_ENTRY_BYTES', 1024 * 1024)
+
+    # structured debug records (core.libs.sampled_log): off by default, kept for a random
+    # DEBUG_LOG_SAMPLE_RATE share of requests and at most DEBUG_LOG_MAX_PER_SECOND per worker
+    DEBUG_LOG_ENABLED = env_bool('DEBUG_LOG_ENABLED', False)
+    DEBUG_LOG_SAMPLE_RATE = env_float('DEBUG_LOG_SAMPLE_RATE', 0.01)
+    DEBUG_LOG_MAX_PER_SECOND = env_int('DEBUG_LOG_MAX_PER_SECOND', 10)
+
+    # per-route request histograms served at /metrics; with several gunicorn workers point
+    # METRICS_DIR at a directory shared by all of them so every scrape sees the whole server
+    METRICS_ENABLED = env_bool('METRICS_ENABLED', True)
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = env_float('METRICS_FLUSH_INTERVAL', 1.0)
+
+    # per-request statement counts: shapes repeated this often in one request are logged as a
+    # likely N+1, statements slower than QUERY_AUDIT_SLOW_MS with their parameters and plan
+    QUERY_AUDIT_ENABLED = env_bool('QUERY_AUDIT_ENABLED', True)
+    QUERY_AUDIT_SLOW_MS = env_int('QUERY_AUDIT_SLOW_MS', 100)
+    QUERY_AUDIT_REPEAT_THRESHOLD = env_int('QUERY_AUDIT_REPEAT_THRESHOLD', 5)
+
+    # the gunicorn worker settings (same variables as gunicorn_config.py), so connection pools
+    # can hold one connection for every request a worker serves at once
+    WORKERS = env_int('GUNICORN_NUMBER_WORKERS', 1)
+    WORKER_CLASS = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+    WORKER_THREADS = env_int('GUNICORN_NUMBER_WORKER_THREADS', 1)
+    WORKER_CONNECTIONS = env_int('GUNICORN_NUMBER_WORKER_CONNECTIONS', 20)
+
+    # https://www.sqlite.org/pragma.html
+    # applied in order on every new sqlite connection; busy_timeout goes first so switching
+    # journal_mode waits for other workers instead of failing with "database is locked"
+    SQLITE_PRAGMAS = {
+        'busy_timeout': env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'cache_size': env_int('SQLITE_CACHE_SIZE', -64 * 1024),
+        'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+        'foreign_keys': 'ON',
+    }
+
+    # connections are kept per worker process and reused across requests, so the pragmas above
+    # run once per connection rather than once per request; size it to the worker's threads
+    SQLITE_POOL_SIZE = env_int('SQLITE_POOL_SIZE', 5)
+    SQLITE_MAX_OVERFLOW = env_int('SQLITE_MAX_OVERFLOW', 5)
+
+    @property
+    def CHANGE_FEED_SETTLE_SECONDS(self):
+        """
+        Age at which change feeds take an assignment event as final. Sqlite commits event ids in
+        order, so none is needed. Server databases can commit a lower id after a higher one, at
+        most the event INSERT's statement timeout (lock waits included) after it was stamped.
+        """
+        if 'CHANGE_FEED_SETTLE_SECONDS' in os.environ:
+            return env_float('CHANGE_FEED_SETTLE_SECONDS', 0)
+        if make_url(self.SQLALCHEMY_DATABASE_URI).get_backend_name() == 'sqlite':
+            return 0.0
+        # without a statement timeout nothing bounds a write; a minute covers ordinary ones
+        timeout_seconds = self.DB_STATEMENT_TIMEOUT_MS / 1000 if self.DB_STATEMENT_TIMEOUT_MS else 60.0
+        return timeout_seconds + self.CHANGE_FEED_SETTLE_MARGIN_SECONDS
+
+    @property
+    def WORKER_CONCURRENCY(self):
+        return cooperative.worker_concurrency(self.WORKER_CLASS, self.WORKER_THREADS, self.WORKER_CONNECTIONS)
+
+    def _max_overflow(self, pool_size, max_overflow):
+        # a request waiting on the pool while its worker is idle otherwise is wasted concurrency
+        return max(max_overflow, self.WORKER_CONCURRENCY - pool_size)
+
+    @property
+    def SQLALCHEMY_ENGINE_OPTIONS(self):
+        url = make_url(self.SQLALCHEMY_DATABASE_URI)
+
+        if url.get_backend_name() == 'sqlite':
+            if url.database in (None, '', ':memory:'):
+                # flask-sqlalchemy pins in-memory databases to a single StaticPool connection
+                return {}
+            if self.WORKER_CLASS in cooperative.COOPERATIVE_WORKERS:
+                # sqlite calls, busy_timeout waits included, block the whole worker: a greenlet
+                # waiting on a lock held by another greenlet of the same worker would stall it,
+                # so greenlets take turns on one connection and wait on the pool cooperatively
+                return {
+                    'poolclass': QueuePool,
+                    'pool_size': 1,
+                    'max_overflow': 0,
+                    'connect_args': {'check_same_thread': False},
+                }
+            return {
+                'poolclass': QueuePool,
+                'pool_size': self.SQLITE_POOL_SIZE,
+                'max_overflow': self._max_overflow(self.SQLITE_POOL_SIZE, self.SQLITE_MAX_OVERFLOW),
+                'connect_args': {'check_same_thread': False},
+            }
+
+        options = {
+            'pool_size': self.DB_POOL_SIZE,
+            'max_overflow': self._max_overflow(self.DB_POOL_SIZE, self.DB_MAX_OVERFLOW),
+            'pool_pre_ping': self.DB_POOL_PRE_PING,
+            'pool_recycle': self.DB_POOL_RECYCLE,
+            'pool_timeout': self.DB_POOL_TIMEOUT,
+        }
+        if self.DB_STATEMENT_TIMEOUT_MS and url.get_backend_name() == 'postgresql':
+            options['connect_args'] = {'options': '-c statement_timeout={}'.format(self.DB_STATEMENT_TIMEOUT_MS)}
+        return options
+
+
+class DevConfig(Config):
+    ENV_NAME = 'dev'
+
+
+class TestConfig(Config):
+    ENV_NAME = 'test'
+    TESTING = True
+    # a scratch file per test run, never the dev store.sqlite3; tests/conftest.py migrates it
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        'TEST_DATABASE_URL',
+        'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyle-test-{}.sqlite3'.format(os.getpid()))
+    )
+
+
+class ProdConfig(Config):
+    ENV_NAME = 'prod'
+    DB_POOL_SIZE = env_int('DB_POOL_SIZE', 10)
+    DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 20)
+    DB_POOL_PRE_PING = env_bool('DB_POOL_PRE_PING', True)
+    DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 1800)
+    DB_STATEMENT_TIMEOUT_MS = env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+
+
+PROFILES = {
+    'dev': DevConfig,
+    'test': TestConfig,
+    'prod': ProdConfig,
+}
+
+
+def get_config(env_name=None):
+    """Profile named by `env_name` or the APP_ENV environment variable, dev by default"""
+    env_name = env_name or os.environ.get('APP_ENV', 'dev')
+    if env_name not in PROFILES:
+        raise ValueError('Unknown APP_ENV {!r}, expected one of {}'.format(env_name, ', '.join(PROFILES)))
+    return PROFILES[env_name]()
@@ -23,3 +23,8 @@ def assert_valid(cond, msg='BAD_REQUEST'):
 def assert_found(_obj, msg='NOT_FOUND'):
     if _obj is None:
         base_assert(404, msg)
+
+
+def assert_no_conflict(cond, msg='CONFLICT'):
+    if cond is False:
+        base_assert(409, msg)
@@ -0,0 +1,158 @@
+import abc
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from sqlalchemy import event
+from werkzeug.utils import import_string
+
+# session.info key holding the scopes written by the current transaction
+WRITTEN_SCOPES = 'response_cache_scopes'
+
+
+def scope(role, scope_id=None):
+    """Name of the listing a role sees, e.g. scope('teacher', 1) -> 'teacher:1'"""
+    return role if scope_id is None else '{}:{}'.format(role, scope_id)
+
+
+class CacheBackend(abc.ABC):
+    """
+    Storage behind ResponseCache. Entries may be evicted at any time, version counters must not:
+    a counter that went back to an earlier value would make entries written before a commit
+    reachable again. With more than one worker process every worker has to see the same
+    counters, so deployments with several workers need a shared implementation (redis INCR,
+    memcached incr) that sets `shared`.
+    """
+
+    # True when every process using the backend sees the same entries and version counters
+    shared = False
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Entry stored under `key`, or None"""
+
+    @abc.abstractmethod
+    def set(self, key, value):
+        """Stores `value` under `key`, possibly evicting other entries"""
+
+    @abc.abstractmethod
+    def get_version(self, scope_name):
+        """Current version counter of a scope, 0 if it was never bumped"""
+
+    @abc.abstractmethod
+    def bump_version(self, scope_name):
+        """Increments the version counter of a scope"""
+
+    @abc.abstractmethod
+    def clear(self):
+        """Drops every entry and version counter"""
+
+
+class LRUBackend(CacheBackend):
+    """In-process backend keeping the `max_entries` most recently used entries"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(max_entries=config['RESPONSE_CACHE_SIZE'])
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self, scope_name):
+        return self._versions.get(scope_name, 0)
+
+    def bump_version(self, scope_name):
+        with self._lock:
+            self._versions[scope_name] = self._versions.get(scope_name, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResponseCache:
+    """
+    Rendered responses keyed by path, scope, scope version and query args. Writes record the
+    scopes they touch on the session, and the versions of exactly those scopes are bumped once
+    the transaction commits, so entries rendered before the commit are never served again.
+    """
+
+    def __init__(self, backend, enabled=False, max_entry_bytes=1024 * 1024):
+        self.backend = backend
+        self.enabled = enabled
+        self.max_entry_bytes = max_entry_bytes
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Cache set up from the RESPONSE_CACHE_* settings. Refuses a per-process backend when
+        several workers serve the app, since each would keep serving pages the others changed.
+        """
+        backend = import_string(config['RESPONSE_CACHE_BACKEND']).from_config(config)
+        enabled = config['RESPONSE_CACHE_ENABLED']
+        if enabled and config['WORKERS'] > 1 and not backend.shared:
+            raise ValueError(
+                'RESPONSE_CACHE_BACKEND {} is per process and cannot be shared by {} workers; use a shared '
+                'backend or set RESPONSE_CACHE_ENABLED=false'.format(config['RESPONSE_CACHE_BACKEND'], config['WORKERS'])
+            )
+        return cls(backend, enabled=enabled, max_entry_bytes=config['RESPONSE_CACHE_MAX_ENTRY_BYTES'])
+
+    def version(self, scope_name):
+        return self.backend.get_version(scope_name)
+
+    @staticmethod
+    def key(path, scope_name, version, args):
+        return '{}|{}|{}|{}'.format(path, scope_name, version, urlencode(sorted(args.items(multi=True))))
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, entry):
+        self.backend.set(key, entry)
+
+    def invalidate(self, *scope_names):
+        for scope_name in scope_names:
+            self.backend.bump_version(scope_name)
+
+    def clear(self):
+        self.backend.clear()
+
+    @staticmethod
+    def record_write(session, *scope_names):
+        """Marks scopes as changed by the session's current transaction"""
+        session.info.setdefault(WRITTEN_SCOPES, set()).update(scope_names)
+
+    def track(self, session):
+        """Bumps the recorded scopes after each commit of `session` and forgets them on rollback"""
+        @event.listens_for(session, 'after_commit')
+        def _after_commit(committed_session):
+            self.invalidate(*committed_session.info.pop(WRITTEN_SCOPES, ()))
+
+        @event.listens_for(session, 'after_rollback')
+        def _after_rollback(rolled_back_session):
+            rolled_back_session.info.pop(WRITTEN_SCOPES, None)
@@ -0,0 +1,60 @@
+import sys
+import threading
+
+try:
+    from greenlet import getcurrent as _current_greenlet
+except ImportError:  # pragma: no cover - greenlet ships with SQLAlchemy on most platforms
+    _current_greenlet = None
+
+# gunicorn worker classes whose requests are greenlets on one thread
+COOPERATIVE_WORKERS = ('gevent', 'eventlet')
+
+
+def session_scope():
+    """
+    Key of the scoped session for the running request: the current greenlet, which is also
+    unique per thread, or the thread when greenlet is missing. threading.get_ident is looked
+    up on every call so a monkey-patch applied after import still takes effect.
+    """
+    if _current_greenlet is not None:
+        return _current_greenlet()
+    return threading.get_ident()
+
+
+def worker_concurrency(worker_class, threads, worker_connections):
+    """Requests one gunicorn worker serves at once with the given settings"""
+    if worker_class in COOPERATIVE_WORKERS:
+        return worker_connections
+    # gunicorn turns sync workers with several threads into gthread workers
+    if worker_class in ('sync', 'gthread'):
+        return max(threads, 1)
+    return 1
+
+
+def is_monkey_patched():
+    gevent_monkey = sys.modules.get('gevent.monkey')
+    return gevent_monkey is not None and gevent_monkey.is_module_patched('socket')
+
+
+def _gevent_wait_callback(connection, timeout=None):
+    # https://www.psycopg.org/docs/advanced.html#support-for-coroutine-libraries
+    import psycopg2
+    from psycopg2 import extensions
+    from gevent.socket import wait_read, wait_write
+
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(connection.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError('Bad result from poll: %r' % state)
+
+
+def make_psycopg2_cooperative():
+    """Lets other greenlets run while psycopg2 waits on the server, instead of blocking the worker"""
+    from psycopg2 import extensions
+    extensions.set_wait_callback(_gevent_wait_callback)
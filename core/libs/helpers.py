@@ -1,6 +1,7 @@
 import random
 import string
-from datetime import datetime
+from datetime import datetime, timezone
+from itertools import islice
 
 TIMESTAMP_WITH_TIMEZONE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
 
@@ -13,3 +14,23 @@ class GeneralObject:
 
 def get_utc_now():
     return datetime.utcnow()
+
+
+def parse_utc_datetime(value):
+    """ISO 8601 date or datetime as a naive UTC datetime, like the stored timestamps; None if invalid"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def chunked(iterable, size):
+    """Splits an iterable into lists of at most `size` items"""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
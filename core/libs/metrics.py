@@ -0,0 +1,260 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# upper bounds of the histogram buckets, +Inf is implied
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+# name -> (help, buckets)
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Time from the start of a request until its response was fully sent', SECONDS_BUCKETS),
+    'http_request_db_seconds': ('Time spent executing SQL statements per request', SECONDS_BUCKETS),
+    'http_request_serialization_seconds': ('Time spent turning rows into JSON per request', SECONDS_BUCKETS),
+    'http_request_db_queries': ('SQL statements executed per request', COUNT_BUCKETS),
+    'http_request_db_commits': ('Transactions committed per request, each one a WAL write and possibly an fsync', COUNT_BUCKETS),
+}
+
+# histograms of the workers that exited, folded into one file so the totals never go down
+EXITED_FILE = 'exited.json'
+
+
+class Registry:
+    """
+    Per-route histograms of one worker. With a `directory`, the worker's snapshot is written to
+    its own file there at most every `flush_interval` seconds, and render() sums the files of all
+    workers, so any worker can answer a scrape for the whole server. A flush that is not due yet
+    is left to a timer, so a worker that goes idle still writes its last observations.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._series = {}
+        self._lock = threading.Lock()
+        self._flushed_at = 0.0
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._path = None
+        self._pid = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(directory=config['METRICS_DIR'], flush_interval=config['METRICS_FLUSH_INTERVAL'])
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            series[0][bisect_left(buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [[name, list(labels), list(series[0]), series[1], series[2]]
+                    for (name, labels), series in self._series.items()]
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def _worker_path(self):
+        # a forked worker must not keep writing to its parent's file
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, 'worker-{}-{}.json'.format(self._pid, time.time_ns()))
+        return self._path
+
+    def flush(self, force=False):
+        """
+        Writes this worker's snapshot, atomically, if the flush interval has passed. Otherwise
+        a timer writes it once the interval is over.
+        """
+        if not self.directory:
+            return
+        with self._flush_lock:
+            now = time.monotonic()
+            due_in = self.flush_interval - (now - self._flushed_at)
+            if not force and due_in > 0:
+                self._schedule_flush(due_in)
+                return
+            self._flushed_at = now
+
+            path = self._worker_path()
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf8') as fo:
+                json.dump(self.snapshot(), fo, separators=(',', ':'))
+            os.replace(tmp_path, path)
+
+    def _schedule_flush(self, delay):
+        # one pending timer covers every observation made before it fires; a forked worker
+        # inherits its parent's timer object, but not the thread, so is_alive() is False there
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(delay, self.flush, kwargs={'force': True})
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _collect(self):
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush(force=True)
+        entries = _read_entries(os.path.join(self.directory, EXITED_FILE))
+        for path in glob.glob(os.path.join(self.directory, 'worker-*.json')):
+            # an exited worker is either folded into EXITED_FILE already or about to be
+            if _is_alive(_worker_pid(path)):
+                entries.extend(_read_entries(path))
+        return entries
+
+    def render(self):
+        """All histograms in the Prometheus text exposition format"""
+        merged = _merge(self._collect())
+
+        lines = []
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} histogram'.format(name))
+            for (series_name, labels), (bucket_counts, total, count) in sorted(merged.items()):
+                if series_name != name:
+                    continue
+                label_text = ','.join('{}="{}"'.format(key, _escape(value)) for key, value in labels)
+                cumulative = 0
+                for upper_bound, bucket_count in zip(list(buckets) + ['+Inf'], bucket_counts):
+                    cumulative += bucket_count
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, label_text, upper_bound, cumulative))
+                lines.append('{}_sum{{{}}} {}'.format(name, label_text, repr(float(total))))
+                lines.append('{}_count{{{}}} {}'.format(name, label_text, count))
+        return '\n'.join(lines) + '\n'
+
+
+def _worker_pid(path):
+    # worker-<pid>-<time_ns>.json
+    return int(os.path.basename(path).split('-')[1])
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # exists, but belongs to another user
+        return True
+    return True
+
+
+def _read_entries(path):
+    try:
+        with open(path, encoding='utf8') as fo:
+            return json.load(fo)
+    except (OSError, ValueError):
+        # a worker that exited halfway through a write, or a file removed meanwhile
+        return []
+
+
+def _merge(entries):
+    """Snapshot entries summed per (name, labels)"""
+    merged = {}
+    for name, labels, bucket_counts, total, count in entries:
+        key = (name, tuple(tuple(label) for label in labels))
+        series = merged.get(key)
+        if series is None:
+            merged[key] = [list(bucket_counts), total, count]
+        else:
+            series[0] = [a + b for a, b in zip(series[0], bucket_counts)]
+            series[1] += total
+            series[2] += count
+    return merged
+
+
+def mark_process_dead(directory, pid):
+    """
+    Folds the files of an exited worker into EXITED_FILE and deletes them. Called from the
+    gunicorn master's child_exit hook, a single process, so two folds never race.
+    """
+    paths = glob.glob(os.path.join(directory, 'worker-{}-*.json'.format(pid)))
+    if not paths:
+        return
+    exited_path = os.path.join(directory, EXITED_FILE)
+    entries = _read_entries(exited_path)
+    for path in paths:
+        entries.extend(_read_entries(path))
+
+    tmp_path = exited_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf8') as fo:
+        json.dump([[name, list(labels), bucket_counts, total, count]
+                   for (name, labels), (bucket_counts, total, count) in _merge(entries).items()],
+                  fo, separators=(',', ':'))
+    os.replace(tmp_path, exited_path)
+    for path in paths:
+        os.remove(path)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def start_request():
+    g._metrics = {
+        'started_at': time.perf_counter(), 'db_seconds': 0.0, 'db_queries': 0, 'db_commits': 0,
+        'serialization_seconds': 0.0,
+    }
+
+
+def add_query(seconds):
+    """Counts one statement towards the current request, if there is one"""
+    if has_request_context():
+        request_metrics = g.get('_metrics')
+        if request_metrics is not None:
+            request_metrics['db_seconds'] += seconds
+            request_metrics['db_queries'] += 1
+
+
+def add_commit():
+    if has_request_context():
+        request_metrics = g.get('_metrics')
+        if request_metrics is not None:
+            request_metrics['db_commits'] += 1
+
+
+def add_serialization(seconds):
+    if has_request_context():
+        request_metrics = g.get('_metrics')
+        if request_metrics is not None:
+            request_metrics['serialization_seconds'] += seconds
+
+
+@contextmanager
+def serializing():
+    """Counts the time spent in the block as serialization time of the current request"""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_serialization(time.perf_counter() - started_at)
+
+
+def finish_request(registry, route, method):
+    """Records the current request; call once its response has been fully sent"""
+    request_metrics = g.pop('_metrics', None)
+    if request_metrics is None:
+        return
+
+    labels = (('method', method), ('route', route))
+    registry.observe('http_request_duration_seconds', labels, time.perf_counter() - request_metrics['started_at'])
+    registry.observe('http_request_db_seconds', labels, request_metrics['db_seconds'])
+    registry.observe('http_request_serialization_seconds', labels, request_metrics['serialization_seconds'])
+    registry.observe('http_request_db_queries', labels, request_metrics['db_queries'])
+    registry.observe('http_request_db_commits', labels, request_metrics['db_commits'])
+    registry.flush()
@@ -0,0 +1,148 @@
+import base64
+import json
+from core.libs import assertions
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(*values):
+    """Packs keyset values into an opaque url-safe token"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def limit_from_args(args):
+    limit = args.get('limit', str(DEFAULT_PAGE_SIZE))
+    assertions.assert_valid(limit.isdigit() and 0 < int(limit) <= MAX_PAGE_SIZE,
+                            'limit should be between 1 and {}'.format(MAX_PAGE_SIZE))
+    return int(limit)
+
+
+def decode_cursor(cursor, size=1):
+    """Unpacks a token built by encode_cursor, rejecting anything malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        values = None
+
+    assertions.assert_valid(isinstance(values, list) and len(values) == size, 'Invalid cursor')
+    return values
+
+
+class Page:
+    """
+    Keyset page over rows ordered by id, read from the `limit` and `cursor` query args. A request
+    with neither gets the whole list, as listings returned before they were paginated.
+    """
+
+    def __init__(self, limit=None, after_id=None):
+        self.limit = limit
+        self.after_id = after_id
+        self.next_cursor = None
+
+    @classmethod
+    def from_args(cls, args):
+        if 'limit' not in args and 'cursor' not in args:
+            return cls()
+        limit = limit_from_args(args)
+
+        after_id = None
+        cursor = args.get('cursor')
+        if cursor:
+            after_id, = decode_cursor(cursor)
+            assertions.assert_valid(isinstance(after_id, int), 'Invalid cursor')
+
+        return cls(limit=limit, after_id=after_id)
+
+    @property
+    def fetch_limit(self):
+        if self.limit is None:
+            return None
+        # one extra row tells us whether another page exists without a COUNT
+        return self.limit + 1
+
+    def iterate(self, rows):
+        """Yields at most `limit` rows, setting next_cursor once the extra row shows up"""
+        last_row = None
+        for count, row in enumerate(rows):
+            if count == self.limit:
+                self.next_cursor = encode_cursor(last_row.id)
+                break
+            last_row = row
+            yield row
+
+    def take(self, rows):
+        return list(self.iterate(rows))
+
+    def envelope(self):
+        return {'next_cursor': self.next_cursor}
+
+
+class ChangesPage:
+    """
+    Page of a change feed, read from the `since` and `limit` query args. Positions are
+    assignment event ids. Without `since`, a first sync pages through the whole scope by id
+    and then goes on from the position it started at. Later polls get the rows with an event
+    after the token's position, ordered by their latest one. Every page hands back the token
+    to poll with next, whether or not rows came back.
+    """
+
+    def __init__(self, limit=DEFAULT_PAGE_SIZE, position=None, after_id=None):
+        self.limit = limit
+        # event id up to which the client has every change; None before its first sync
+        self.position = position
+        # last assignment id seen by a first sync that is still paging through the scope
+        self.after_id = after_id
+        # settled event id this poll reads up to, set before the rows are read
+        self.until = None
+        self.next_token = None
+        self.has_more = False
+
+    @classmethod
+    def from_args(cls, args):
+        limit = limit_from_args(args)
+
+        token = args.get('since')
+        if not token:
+            return cls(limit=limit)
+        position, after_id = decode_cursor(token, size=2)
+        assertions.assert_valid(isinstance(position, int) and (after_id is None or isinstance(after_id, int)),
+                                'Invalid since token')
+        return cls(limit=limit, position=position, after_id=after_id)
+
+    @property
+    def scanning(self):
+        """True while a first sync pages through the scope by id"""
+        return self.position is None or self.after_id is not None
+
+    @property
+    def since(self):
+        """Event id the changes are read after, None while scanning"""
+        return None if self.scanning else self.position
+
+    @property
+    def fetch_limit(self):
+        return self.limit + 1
+
+    def iterate(self, rows):
+        """Yields at most `limit` rows, then moves next_token past the last one"""
+        last_row = None
+        for count, row in enumerate(rows):
+            if count == self.limit:
+                self.has_more = True
+                break
+            last_row = row
+            yield row
+
+        if self.scanning:
+            # a first sync goes on from where the log was when it began, so writes made while
+            # it pages are returned by the polls after it
+            start = self.until if self.position is None else self.position
+            self.next_token = encode_cursor(start, last_row.id if self.has_more else None)
+        else:
+            self.next_token = encode_cursor(last_row.position if self.has_more else self.until, None)
+
+    def envelope(self):
+        return {'next_token': self.next_token, 'has_more': self.has_more}
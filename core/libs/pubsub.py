@@ -0,0 +1,73 @@
+import threading
+from collections import deque
+
+
+class Subscription:
+    """
+    Messages of one channel for one listener, in a queue of at most `maxsize`: a listener that
+    falls behind loses its oldest messages and sees `lagged` set, instead of growing without bound.
+    """
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.messages = deque(maxlen=maxsize)
+        self.lagged = False
+        self._ready = threading.Event()
+
+    def put(self, message):
+        if len(self.messages) == self.messages.maxlen:
+            self.lagged = True
+        self.messages.append(message)
+        self._ready.set()
+
+    def get(self, timeout=None):
+        """Queued messages, oldest first, waiting up to `timeout` seconds for one; [] on timeout"""
+        if not self.messages:
+            self._ready.wait(timeout)
+        self._ready.clear()
+        messages = []
+        while self.messages:
+            messages.append(self.messages.popleft())
+        return messages
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """
+    In-process publish/subscribe by channel name. Publishing never blocks and never waits on a
+    listener. Under gevent, threading is patched, so waiting listeners are idle greenlets.
+    """
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.maxsize)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._channels.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel, message):
+        """Queues `message` for every current subscriber of `channel`; returns how many there were"""
+        with self._lock:
+            subscriptions = list(self._channels.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+        return len(subscriptions)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._channels.values())
@@ -0,0 +1,88 @@
+import logging
+import re
+from collections import Counter
+
+from flask import g, has_request_context
+
+from core.libs import query_plan
+
+logger = logging.getLogger('core.query_audit')
+
+# literals inlined into a statement (expanded IN lists, literal_execute) do not change its shape
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PARAMETER_LIST = re.compile(r'\(\?(?:,\s*\?)*\)')
+
+
+def statement_shape(statement):
+    """Statement with literals and parameter lists collapsed, so repeats of one query compare equal"""
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PARAMETER_LIST.sub('(?)', shape)
+    return ' '.join(shape.split())
+
+
+class QueryAuditor:
+    """
+    Counts the statements of each request and reports the ones to look at: shapes repeated at
+    least `repeat_threshold` times in one request (usually an N+1 through a lazy relationship),
+    and statements slower than `slow_ms`, logged with their parameters and sqlite query plan.
+    While `recorded` is a list, every finished request is appended to it as
+    (route, statement count, repeated shapes), which is how tests enforce query budgets.
+    """
+
+    def __init__(self, enabled=True, slow_ms=100, repeat_threshold=5):
+        self.enabled = enabled
+        self.slow_seconds = slow_ms / 1000.0
+        self.repeat_threshold = repeat_threshold
+        self.recorded = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            enabled=config['QUERY_AUDIT_ENABLED'],
+            slow_ms=config['QUERY_AUDIT_SLOW_MS'],
+            repeat_threshold=config['QUERY_AUDIT_REPEAT_THRESHOLD']
+        )
+
+    def start_request(self):
+        if self.enabled:
+            g._query_audit = Counter()
+
+    def record(self, connection, statement, parameters, seconds):
+        if not self.enabled:
+            return
+        if has_request_context():
+            statements = g.get('_query_audit')
+            if statements is not None:
+                statements[statement] += 1
+        if seconds >= self.slow_seconds:
+            self._log_slow(connection, statement, parameters, seconds)
+
+    def _log_slow(self, connection, statement, parameters, seconds):
+        plan = None
+        if connection.dialect.name == 'sqlite' and not isinstance(parameters, list):
+            try:
+                # straight on the dbapi connection, so the EXPLAIN is not audited itself
+                plan = query_plan.explain(connection.connection, statement, parameters)
+            except Exception as err:  # the plan is best effort, the slow query still gets logged
+                plan = ['EXPLAIN failed: {}'.format(err)]
+        if isinstance(parameters, list):
+            # an executemany batch can hold thousands of rows, its size is what matters
+            parameters = '<{} parameter sets>'.format(len(parameters))
+        logger.warning('slow query (%.1f ms): %s; parameters=%r; plan=%r', seconds * 1000, statement, parameters, plan)
+
+    def finish_request(self, route):
+        statements = g.pop('_query_audit', None)
+        if statements is None:
+            return
+
+        shapes = Counter()
+        for statement, count in statements.items():
+            shapes[statement_shape(statement)] += count
+        repeated = {shape: count for shape, count in shapes.items() if count >= self.repeat_threshold}
+        for shape, count in repeated.items():
+            logger.warning('possible N+1 on %s: %d x %s', route, count, shape)
+
+        if self.recorded is not None:
+            self.recorded.append((route, sum(statements.values()), repeated))
@@ -0,0 +1,23 @@
+import re
+
+_FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+def explain(connection, statement, parameters=()):
+    """Returns the `detail` column of sqlite's EXPLAIN QUERY PLAN for a statement"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def full_scans(plan, tables):
+    """Names from `tables` that the plan reads row by row without any index"""
+    scanned = []
+    for detail in plan:
+        match = _FULL_SCAN.match(detail)
+        if match and match.group(1) in tables:
+            scanned.append(match.group(1))
+    return scanned
@@ -0,0 +1,78 @@
+import json
+import logging
+import random
+import sys
+import threading
+import time
+
+from flask import g, has_request_context
+
+
+class SampledLogger:
+    """
+    Opt-in structured debug log. A request is sampled once, with probability `sample_rate`,
+    and every record of a sampled request is written as one JSON line, up to `max_per_second`
+    records per process. Disabled, each call is a single attribute check.
+    """
+
+    def __init__(self, name, enabled=False, sample_rate=1.0, max_per_second=10):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self.logger = logging.getLogger(name)
+        self.dropped = 0
+        self._tokens = float(max_per_second)
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        if enabled and not self.logger.handlers:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.DEBUG)
+            self.logger.propagate = False
+
+    @classmethod
+    def from_config(cls, name, config):
+        return cls(
+            name,
+            enabled=config['DEBUG_LOG_ENABLED'],
+            sample_rate=config['DEBUG_LOG_SAMPLE_RATE'],
+            max_per_second=config['DEBUG_LOG_MAX_PER_SECOND']
+        )
+
+    def is_sampled(self):
+        """Whether records of the current request are kept; guard expensive fields with it"""
+        if not self.enabled:
+            return False
+        if not has_request_context():
+            return random.random() < self.sample_rate
+        if '_debug_log_sampled' not in g:
+            g._debug_log_sampled = random.random() < self.sample_rate
+        return g._debug_log_sampled
+
+    def _take_token(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.max_per_second, self._tokens + (now - self._refilled_at) * self.max_per_second)
+            self._refilled_at = now
+            if self._tokens < 1:
+                self.dropped += 1
+                return None
+            self._tokens -= 1
+            dropped, self.dropped = self.dropped, 0
+            return dropped
+
+    def debug(self, event, **fields):
+        if not self.enabled or not self.is_sampled():
+            return
+        dropped = self._take_token()
+        if dropped is None:
+            return
+
+        record = {'event': event, 'ts': time.time()}
+        if dropped:
+            # records skipped by the rate cap since the last one written
+            record['dropped'] = dropped
+        record.update(fields)
+        self.logger.debug(json.dumps(record, default=str, separators=(',', ':')))
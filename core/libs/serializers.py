@@ -0,0 +1,32 @@
+from sqlalchemy import inspect
+from sqlalchemy.types import DateTime, Enum
+
+
+def _column_expression(column, value):
+    """Python expression that renders `value` the way marshmallow would dump this column"""
+    if isinstance(column.type, DateTime):
+        return '{0}.isoformat() if {0} is not None else None'.format(value)
+    if isinstance(column.type, Enum):
+        return '{0}.value if {0} is not None else None'.format(value)
+    return value
+
+
+def compile_serializer(model, field_names):
+    """
+    Builds a row -> dict function for `field_names` of `model` once, from its column metadata.
+    The function works on ORM instances and on plain rows with the same attribute names.
+    """
+    columns = inspect(model).columns
+    lines = ['def serialize(row):']
+    items = []
+    for index, name in enumerate(field_names):
+        value = 'v{}'.format(index)
+        lines.append('    {} = row.{}'.format(value, name))
+        items.append('        {!r}: {},'.format(name, _column_expression(columns[name], value)))
+    lines.append('    return {')
+    lines.extend(items)
+    lines.append('    }')
+
+    namespace = {}
+    exec(compile('\n'.join(lines), '<serializer {}>'.format(model.__name__), 'exec'), namespace)
+    return namespace['serialize']
@@ -7,6 +7,8 @@ from flask import current_app
 
 from alembic import context
 
+from core.models.assignments import LEGACY_SCHEMA
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -71,18 +73,24 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
-    connectable = current_app.extensions['migrate'].db.get_engine()
-
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=target_metadata,
-            process_revision_directives=process_revision_directives,
-            **current_app.extensions['migrate'].configure_args
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+    db = current_app.extensions['migrate'].db
+    connectable = db.get_engine()
+
+    # revisions that write through the models run them against the tables of their own time
+    db.session.info[LEGACY_SCHEMA] = True
+    try:
+        with connectable.connect() as connection:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                process_revision_directives=process_revision_directives,
+                **current_app.extensions['migrate'].configure_args
+            )
+
+            with context.begin_transaction():
+                context.run_migrations()
+    finally:
+        db.session.info.pop(LEGACY_SCHEMA, None)
 
 
 if context.is_offline_mode():
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from core import db
+from core.libs import helpers
+from core.models.assignments import AssignmentEventKindEnum, AssignmentStateEnum, GradeEnum
+from sqlalchemy import func, select
+from sqlalchemy.types import Enum as BaseEnum
+
+
+class AssignmentEvent(db.Model):
+    """
+    Append-only log of assignment writes, inserted in the transaction of the write. Every event
+    holds the assignment's student, teacher, state and grade after the write and, for changes,
+    the values before it, so projections fold events without reading `assignments`.
+    """
+    __tablename__ = 'assignment_events'
+    id = db.Column(db.Integer, db.Sequence('assignment_events_id_seq'), primary_key=True)
+    # no foreign key: the trail outlives deleted assignments
+    assignment_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(BaseEnum(AssignmentEventKindEnum), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    student_id = db.Column(db.Integer, nullable=False)
+    teacher_id = db.Column(db.Integer)
+    state = db.Column(BaseEnum(AssignmentStateEnum), nullable=False)
+    grade = db.Column(BaseEnum(GradeEnum))
+    # None for the event that creates an assignment
+    previous_teacher_id = db.Column(db.Integer)
+    previous_state = db.Column(BaseEnum(AssignmentStateEnum))
+    previous_grade = db.Column(BaseEnum(GradeEnum))
+    # draft text, on CREATED and EDITED only
+    content = db.Column(db.Text)
+    created_at = db.Column(db.TIMESTAMP(timezone=True), default=helpers.get_utc_now, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_assignment_events_assignment_id_id', 'assignment_id', 'id'),
+    )
+
+    def __repr__(self):
+        return '<AssignmentEvent %r>' % self.id
+
+    @classmethod
+    def filter(cls, *criterion):
+        db_query = db.session.query(cls)
+        return db_query.filter(*criterion)
+
+    @classmethod
+    def get_by_assignment(cls, assignment_id):
+        return cls.filter(cls.assignment_id == assignment_id).order_by(cls.id).all()
+
+    @classmethod
+    def get_settled_position(cls, after_id=None, settle_seconds=0):
+        """
+        Highest event id, not below `after_id`, that no event with a lower id can still commit
+        after. Writers take turns on sqlite, so ids commit in order and the last one is settled.
+        Server databases hand out ids before commit. There, an event is settled once it is
+        `settle_seconds` old, since every lower id was inserted before it and has committed by then.
+        """
+        table = cls.__table__
+        criterion = [table.c.id > after_id] if after_id else []
+        if settle_seconds:
+            criterion.append(table.c.created_at <= helpers.get_utc_now() - timedelta(seconds=settle_seconds))
+        return db.session.execute(select(func.max(table.c.id)).where(*criterion)).scalar() or after_id or 0
+
+    @staticmethod
+    def values(kind, assignment, previous=None, content=None):
+        """
+        Column values of one event for `assignment`, any object or row with the assignment's
+        columns, as it is after the write; `previous` is (teacher_id, state, grade) before it.
+        """
+        previous_teacher_id, previous_state, previous_grade = previous or (None, None, None)
+        return {
+            'assignment_id': assignment.id,
+            'kind': kind,
+            'version': assignment.version,
+            'student_id': assignment.student_id,
+            'teacher_id': assignment.teacher_id,
+            'state': assignment.state,
+            'grade': assignment.grade,
+            'previous_teacher_id': previous_teacher_id,
+            'previous_state': previous_state,
+            'previous_grade': previous_grade,
+            'content': content,
+            'created_at': helpers.get_utc_now(),
+        }
+
+    @classmethod
+    def append(cls, connection, events):
+        """Inserts event `values` with one executemany on the caller's connection and transaction"""
+        if events:
+            connection.execute(cls.__table__.insert(), events)
@@ -0,0 +1,117 @@
+from core import db
+from core.models.assignments import Assignment, AssignmentStateEnum
+from core.models.students import Student
+from sqlalchemy import and_, desc, extract, func, select
+
+assignments = Assignment.__table__
+students = Student.__table__
+
+
+def _elapsed_seconds(start, end):
+    """Seconds from `start` to `end`, in the dialect of the bound engine"""
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday(end) - func.julianday(start)) * 86400
+    return extract('epoch', end - start)
+
+
+def _in_range(column, start=None, end=None):
+    """Half-open [start, end) on `column`; either bound may be left out"""
+    criteria = []
+    if start is not None:
+        criteria.append(column >= start)
+    if end is not None:
+        criteria.append(column < end)
+    return criteria
+
+
+class AssignmentReport:
+    """
+    Principal analytics as single set-based statements over `assignments`. `start` and `end`
+    restrict rows by updated_at, which is when an assignment reached its current state.
+    """
+
+    @staticmethod
+    def execute(statement):
+        # read in batches by APIResponse.columnar, so server databases need not buffer the result
+        return db.session.execute(statement, execution_options={'stream_results': True})
+
+    @classmethod
+    def grade_histogram(cls, start=None, end=None, teacher_id=None):
+        criteria = [assignments.c.state == AssignmentStateEnum.GRADED] + _in_range(assignments.c.updated_at, start, end)
+        if teacher_id is not None:
+            criteria.append(assignments.c.teacher_id == teacher_id)
+
+        return cls.execute(
+            select(assignments.c.grade, func.count().label('graded_count'))
+            .where(*criteria)
+            .group_by(assignments.c.grade)
+            .order_by(assignments.c.grade)
+        )
+
+    @classmethod
+    def teacher_leaderboard(cls, grade, start=None, end=None, limit=None):
+        """Teachers by the number of assignments they graded `grade`, most first, lowest id on ties"""
+        graded_count = func.count().label('graded_count')
+        return cls.execute(
+            select(assignments.c.teacher_id, graded_count)
+            .where(
+                assignments.c.state == AssignmentStateEnum.GRADED,
+                assignments.c.grade == grade,
+                *_in_range(assignments.c.updated_at, start, end)
+            )
+            .group_by(assignments.c.teacher_id)
+            .order_by(desc(graded_count), assignments.c.teacher_id)
+            .limit(limit)
+        )
+
+    @classmethod
+    def graded_per_student(cls, start=None, end=None):
+        """Every student with their number of graded assignments, zero included"""
+        graded = and_(
+            assignments.c.student_id == students.c.id,
+            assignments.c.state == AssignmentStateEnum.GRADED,
+            *_in_range(assignments.c.updated_at, start, end)
+        )
+        return cls.execute(
+            select(students.c.id.label('student_id'), students.c.user_id,
+                   func.count(assignments.c.id).label('graded_count'))
+            .select_from(students.outerjoin(assignments, graded))
+            .group_by(students.c.id, students.c.user_id)
+            .order_by(students.c.id)
+        )
+
+    @classmethod
+    def teacher_turnaround(cls, start=None, end=None):
+        """
+        Seconds from creation to grading per teacher. There is no submitted_at or graded_at, so
+        created_at and updated_at of GRADED assignments stand in for them; a re-grade moves updated_at.
+        """
+        elapsed = _elapsed_seconds(assignments.c.created_at, assignments.c.updated_at)
+        return cls.execute(
+            select(assignments.c.teacher_id,
+                   func.count().label('graded_count'),
+                   func.avg(elapsed).label('avg_seconds'),
+                   func.max(elapsed).label('max_seconds'))
+            .where(
+                assignments.c.state == AssignmentStateEnum.GRADED,
+                assignments.c.teacher_id.isnot(None),
+                *_in_range(assignments.c.updated_at, start, end)
+            )
+            .group_by(assignments.c.teacher_id)
+            .order_by(assignments.c.teacher_id)
+        )
+
+    @classmethod
+    def teacher_backlog(cls, start=None, end=None):
+        """SUBMITTED assignments waiting on each teacher and when the oldest of them was submitted"""
+        submitted_count = func.count().label('submitted_count')
+        return cls.execute(
+            select(assignments.c.teacher_id, submitted_count,
+                   func.min(assignments.c.updated_at).label('oldest_submitted_at'))
+            .where(
+                assignments.c.state == AssignmentStateEnum.SUBMITTED,
+                *_in_range(assignments.c.updated_at, start, end)
+            )
+            .group_by(assignments.c.teacher_id)
+            .order_by(desc(submitted_count), assignments.c.teacher_id)
+        )
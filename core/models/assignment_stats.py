@@ -0,0 +1,184 @@
+from collections import Counter, defaultdict
+
+from core import db
+from core.models.assignments import Assignment, AssignmentStateEnum, GradeEnum, LEGACY_SCHEMA, tracked_values
+from sqlalchemy import case, event, func, literal
+from sqlalchemy.dialects import postgresql, sqlite
+
+STUDENT = 'student'
+TEACHER = 'teacher'
+
+STATE_COLUMNS = {
+    AssignmentStateEnum.DRAFT: 'draft_count',
+    AssignmentStateEnum.SUBMITTED: 'submitted_count',
+    AssignmentStateEnum.GRADED: 'graded_count',
+}
+# grades are only counted once an assignment is GRADED
+GRADE_COLUMNS = {grade: 'grade_{}_count'.format(grade.value.lower()) for grade in GradeEnum}
+COUNT_COLUMNS = list(STATE_COLUMNS.values()) + list(GRADE_COLUMNS.values())
+
+# dialects with INSERT ... ON CONFLICT DO UPDATE
+_UPSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+class AssignmentStats(db.Model):
+    """
+    Per-student and per-teacher assignment counts by state and grade, kept in step with
+    `assignments` inside the transaction that changes it, so reports read one row per scope.
+    """
+    __tablename__ = 'assignment_stats'
+    scope = db.Column(db.String(16), primary_key=True)
+    scope_id = db.Column(db.Integer, primary_key=True)
+    draft_count = db.Column(db.Integer, default=0, nullable=False)
+    submitted_count = db.Column(db.Integer, default=0, nullable=False)
+    graded_count = db.Column(db.Integer, default=0, nullable=False)
+    grade_a_count = db.Column(db.Integer, default=0, nullable=False)
+    grade_b_count = db.Column(db.Integer, default=0, nullable=False)
+    grade_c_count = db.Column(db.Integer, default=0, nullable=False)
+    grade_d_count = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return '<AssignmentStats %s:%r>' % (self.scope, self.scope_id)
+
+    @classmethod
+    def filter(cls, *criterion):
+        db_query = db.session.query(cls)
+        return db_query.filter(*criterion)
+
+    @staticmethod
+    def contribution(student_id, teacher_id, state, grade, sign=1):
+        """Deltas, keyed (scope, scope_id, column), that one assignment adds to the summary"""
+        state = AssignmentStateEnum(state) if state is not None else AssignmentStateEnum.DRAFT
+        columns = [STATE_COLUMNS[state]]
+        if state == AssignmentStateEnum.GRADED and grade is not None:
+            columns.append(GRADE_COLUMNS[GradeEnum(grade)])
+
+        deltas = Counter()
+        for scope, scope_id in ((STUDENT, student_id), (TEACHER, teacher_id)):
+            if scope_id is not None:
+                for column in columns:
+                    deltas[(scope, scope_id, column)] += sign
+        return deltas
+
+    @classmethod
+    def apply_deltas(cls, connection, deltas):
+        """Adds `deltas` to the summary rows on `connection`, creating missing rows"""
+        apply_count_deltas(connection, cls.__table__, deltas)
+
+    @classmethod
+    def recount(cls):
+        """Summary rows computed from scratch with one pass over `assignments`"""
+        state = Assignment.state
+        graded = state == AssignmentStateEnum.GRADED
+        counts = [func.sum(case((state == state_value, 1), else_=0)).label(column)
+                  for state_value, column in STATE_COLUMNS.items()]
+        counts += [func.sum(case((graded & (Assignment.grade == grade), 1), else_=0)).label(column)
+                   for grade, column in GRADE_COLUMNS.items()]
+
+        rows = {}
+        for scope, scope_column in ((STUDENT, Assignment.student_id), (TEACHER, Assignment.teacher_id)):
+            db_query = db.session.query(literal(scope), scope_column, *counts) \
+                .filter(scope_column.isnot(None)).group_by(scope_column)
+            for row in db_query:
+                rows[(row[0], row[1])] = dict(zip(COUNT_COLUMNS, (int(count) for count in row[2:])))
+        return rows
+
+    @classmethod
+    def verify(cls):
+        """(scope, scope_id, stored, expected) for every summary row that disagrees with a recount"""
+        expected = cls.recount()
+        stored = {
+            (row.scope, row.scope_id): {column: getattr(row, column) for column in COUNT_COLUMNS}
+            for row in cls.filter()
+        }
+
+        zero = dict.fromkeys(COUNT_COLUMNS, 0)
+        mismatches = []
+        for key in sorted(set(expected) | set(stored)):
+            if stored.get(key, zero) != expected.get(key, zero):
+                mismatches.append((key[0], key[1], stored.get(key), expected.get(key)))
+        return mismatches
+
+    @classmethod
+    def rebuild(cls):
+        """Replaces the summary with a full recount, in the caller's transaction"""
+        # delete first: the write lock it takes keeps other writers out until the recount is in
+        db.session.query(cls).delete(synchronize_session=False)
+        rows = cls.recount()
+        db.session.bulk_insert_mappings(cls, [
+            dict(counts, scope=scope, scope_id=scope_id) for (scope, scope_id), counts in rows.items()
+        ])
+        return len(rows)
+
+    @classmethod
+    def get_teacher_stats(cls):
+        return cls.filter(cls.scope == TEACHER).order_by(cls.scope_id).all()
+
+    @classmethod
+    def get_student_stats(cls):
+        return cls.filter(cls.scope == STUDENT).order_by(cls.scope_id).all()
+
+    @classmethod
+    def get_top_teacher_by_grade(cls, grade):
+        """Teacher with the most assignments graded `grade`, lowest id on ties"""
+        column = getattr(cls, GRADE_COLUMNS[grade])
+        return cls.filter(cls.scope == TEACHER, column > 0).order_by(column.desc(), cls.scope_id).first()
+
+
+def apply_count_deltas(connection, table, deltas):
+    """Adds `deltas`, keyed (scope, scope_id, column), to a table of per-scope counts, creating missing rows"""
+    rows = defaultdict(lambda: dict.fromkeys(COUNT_COLUMNS, 0))
+    for (scope, scope_id, column), delta in deltas.items():
+        if delta:
+            rows[(scope, scope_id)][column] += delta
+    add_count_rows(connection, table, [dict(counts, scope=scope, scope_id=scope_id)
+                                       for (scope, scope_id), counts in rows.items()])
+
+
+def add_count_rows(connection, table, values):
+    """Adds each row of per-column `values`, with its scope and scope_id, to a table of per-scope counts"""
+    if not values:
+        return
+
+    upsert = _UPSERTS.get(connection.dialect.name)
+    if upsert is not None:
+        # one executemany of a single statement: its compiled form is cached, unlike a multi-row VALUES
+        statement = upsert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.scope, table.c.scope_id],
+            set_={column: table.c[column] + statement.excluded[column] for column in COUNT_COLUMNS}
+        )
+        connection.execute(statement, values)
+        return
+
+    for value in values:
+        updated = connection.execute(
+            table.update()
+            .where(table.c.scope == value['scope'], table.c.scope_id == value['scope_id'])
+            .values({column: table.c[column] + value[column] for column in COUNT_COLUMNS})
+        )
+        if updated.rowcount == 0:
+            connection.execute(table.insert().values(value))
+
+
+@event.listens_for(db.session, 'before_flush')
+def _maintain_assignment_stats(session, flush_context, instances):
+    """Folds every change of an assignment's student, teacher, state or grade into the summary"""
+    if session.info.get(LEGACY_SCHEMA):
+        # older than the summary table, whose revision counts every row already written
+        return
+    deltas = Counter()
+    for assignment in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(assignment, Assignment):
+            continue
+
+        before, after = tracked_values(session, assignment)
+        if assignment not in session.new:
+            deltas.update(AssignmentStats.contribution(*before, sign=-1))
+        if assignment not in session.deleted:
+            deltas.update(AssignmentStats.contribution(*after))
+
+    if not any(deltas.values()):
+        return
+
+    AssignmentStats.apply_deltas(session.connection(), deltas)
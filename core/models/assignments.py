@@ -1,12 +1,13 @@
 import enum
-from core import db
+from collections import Counter
+from core import db, response_cache
 from core.apis.decorators import AuthPrincipal
-from core.libs import helpers, assertions
-from core.libs.exceptions import FyleError
+from core.libs import helpers, assertions, cache
 from core.models.teachers import Teacher
 from core.models.students import Student
+from sqlalchemy import bindparam, event, func, inspect, select
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.types import Enum as BaseEnum
-from sqlalchemy.exc import SQLAlchemyError
 
 
 class GradeEnum(str, enum.Enum):
@@ -22,6 +23,29 @@ class AssignmentStateEnum(str, enum.Enum):
     GRADED = 'GRADED'
 
 
+class AssignmentEventKindEnum(str, enum.Enum):
+    CREATED = 'CREATED'
+    EDITED = 'EDITED'
+    SUBMITTED = 'SUBMITTED'
+    GRADED = 'GRADED'
+    # one per assignment that existed before the event log, or was bulk loaded by core.seed
+    IMPORTED = 'IMPORTED'
+
+
+# rows fetched per round trip when a listing is iterated lazily
+YIELD_PER = 500
+
+# ids bound per IN (...) lookup, well under sqlite's host parameter limit
+IN_CHUNK_SIZE = 500
+
+SUBMITTED_OR_GRADED = [AssignmentStateEnum.SUBMITTED, AssignmentStateEnum.GRADED]
+
+# session.info key set by core/migrations/env.py while revisions run: a revision that writes
+# through the models sees the tables as they were then, without the version column, the summary
+# table or the event log, which later revisions add and backfill
+LEGACY_SCHEMA = 'legacy_schema'
+
+
 class Assignment(db.Model):
     __tablename__ = 'assignments'
     id = db.Column(db.Integer, db.Sequence('assignments_id_seq'), primary_key=True)
@@ -32,6 +56,33 @@ class Assignment(db.Model):
     state = db.Column(BaseEnum(AssignmentStateEnum), default=AssignmentStateEnum.DRAFT, nullable=False)
     created_at = db.Column(db.TIMESTAMP(timezone=True), default=helpers.get_utc_now, nullable=False)
     updated_at = db.Column(db.TIMESTAMP(timezone=True), default=helpers.get_utc_now, nullable=False, onupdate=helpers.get_utc_now)
+    # bumped by every write, each one a conditional UPDATE that also matches on the version read
+    # before; left to the server default on insert, so revisions older than the column can add rows
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    # each index matches one access path below; see tests/query_plan_test.py
+    __table_args__ = (
+        db.Index('ix_assignments_student_id_id', 'student_id', 'id'),
+        db.Index('ix_assignments_teacher_id_id', 'teacher_id', 'id'),
+        db.Index(
+            'ix_assignments_submitted_graded_id', 'id',
+            sqlite_where=state.in_(SUBMITTED_OR_GRADED),
+            postgresql_where=state.in_(SUBMITTED_OR_GRADED)
+        ),
+        db.Index('ix_assignments_grade_state_teacher_id', 'grade', 'state', 'teacher_id'),
+        db.Index('ix_assignments_student_id_state', 'student_id', 'state'),
+        db.Index('ix_assignments_student_id_updated_at', 'student_id', 'updated_at', 'id'),
+        db.Index(
+            'ix_assignments_teacher_id_updated_at', 'teacher_id', 'updated_at', 'id', 'state',
+            sqlite_where=state.in_(SUBMITTED_OR_GRADED),
+            postgresql_where=state.in_(SUBMITTED_OR_GRADED)
+        ),
+        db.Index(
+            'ix_assignments_submitted_graded_updated_at', 'updated_at', 'id', 'state',
+            sqlite_where=state.in_(SUBMITTED_OR_GRADED),
+            postgresql_where=state.in_(SUBMITTED_OR_GRADED)
+        ),
+    )
 
     def __repr__(self):
         return '<Assignment %r>' % self.id
@@ -41,105 +92,498 @@ class Assignment(db.Model):
         db_query = db.session.query(cls)
         return db_query.filter(*criterion)
 
+    @classmethod
+    def select_rows(cls, *criterion):
+        """Plain column tuples for read-only listings, without identity map or attribute instrumentation"""
+        db_query = db.session.query(*cls.__table__.columns)
+        return db_query.filter(*criterion)
+
     @classmethod
     def get_by_id(cls, _id):
         return cls.filter(cls.id == _id).first()
 
     @classmethod
     def upsert(cls, assignment_data):
-        try:
-            if assignment_data.id:
-                assignment = cls.query.get(assignment_data.id)
-                if assignment and assignment.state != AssignmentStateEnum.DRAFT:
-                    raise FyleError(error_message="only assignment in draft state can be edited")
+        """Creates a draft or edits the content of one; flushes, the caller commits"""
+        assertions.assert_valid(assignment_data.content is not None, 'assignment with empty content cannot be saved')
+
+        events = assignment_events.AssignmentEvent
+        if assignment_data.id:
+            row = cls._transition(
+                assignment_data.id,
+                (cls.student_id == assignment_data.student_id, cls.state == AssignmentStateEnum.DRAFT),
+                assignment_data.version,
+                content=assignment_data.content
+            )
+            if row is None:
+                assignment = cls.get_by_id(assignment_data.id)
+                assertions.assert_found(assignment, 'No assignment with this id was found')
+                assertions.assert_valid(assignment.student_id == assignment_data.student_id,
+                                        'This assignment belongs to some other student')
+                assertions.assert_valid(assignment.state == AssignmentStateEnum.DRAFT,
+                                        'only assignment in draft state can be edited')
+                assertions.assert_no_conflict(False, 'This assignment was changed by another request')
+
+            # a content edit leaves the summary alone, and Core writes skip the flush hook
+            response_cache.record_write(db.session, cache.scope('student', row.student_id))
+            events.append(db.session.connection(), [events.values(
+                AssignmentEventKindEnum.EDITED, row, (row.teacher_id, row.state, row.grade), content=row.content
+            )])
+            return row
+
+        assignment = cls(student_id=assignment_data.student_id, content=assignment_data.content, version=1)
+        db.session.add(assignment)
+        db.session.flush()
+        events.append(db.session.connection(), [
+            events.values(AssignmentEventKindEnum.CREATED, assignment, content=assignment.content)
+        ])
+        return assignment
+
+    @classmethod
+    def bulk_upsert(cls, assignments_data, student_id):
+        """
+        Creates or edits many drafts of one student in a single flush. Ownership, draft state
+        and the version an item sends are checked with one IN query per chunk; returns one
+        result per item, in payload order, and only writes the items that passed.
+        """
+        edited_ids = {assignment.id for assignment in assignments_data if assignment.id}
+        existing = {}
+        for ids in helpers.chunked(edited_ids, IN_CHUNK_SIZE):
+            for row in db.session.query(cls.id, cls.student_id, cls.state, cls.version).filter(cls.id.in_(ids)):
+                existing[row.id] = {'student_id': row.student_id, 'state': row.state, 'version': row.version}
+
+        results = []
+        updates = []
+        inserts = []
+        edited = []
+        for index, assignment_data in enumerate(assignments_data):
+            result = {'index': index, 'id': assignment_data.id}
+            results.append(result)
+
+            if assignment_data.content is None:
+                result.update(status='error', message='assignment with empty content cannot be saved')
+                continue
+            if not assignment_data.id:
+                inserts.append((result, {'student_id': student_id, 'content': assignment_data.content}))
+                continue
+
+            row = existing.get(assignment_data.id)
+            if row is None:
+                result.update(status='error', message='No assignment with this id was found')
+            elif row['student_id'] != student_id:
+                result.update(status='error', message='This assignment belongs to some other student')
+            elif row['state'] != AssignmentStateEnum.DRAFT:
+                result.update(status='error', message='only assignment in draft state can be edited')
+            elif assignment_data.version not in (None, row['version']):
+                result.update(status='conflict', message='This assignment was changed by another request')
             else:
-                assignment = cls()
-
-            for key, value in assignment_data.__dict__.items():
-                if hasattr(assignment, key):
-                    setattr(assignment, key, value)
-
-            db.session.add(assignment)
-            db.session.commit()
-            return assignment
-        except SQLAlchemyError:
-            db.session.rollback()
-            raise
-
-    @classmethod
-    def submit(cls, _id, teacher_id, auth_principal):
-        try:
-            assignment = cls.query.get(_id)
-            if not assignment:
-                raise FyleError(error_message="Assignment not found")
-            if assignment.student_id != auth_principal.student_id:
-                raise FyleError(error_message="This assignment belongs to some other student")
-            if not assignment.content:
-                raise FyleError(error_message="assignment with empty content cannot be submitted")
-            
-            assignment.teacher_id = teacher_id
-            assignment.state = AssignmentStateEnum.SUBMITTED
-            db.session.commit()
-            return assignment
-        except SQLAlchemyError:
-            db.session.rollback()
-            raise
-
-
-
-    @classmethod
-    def mark_grade(cls, _id, grade, auth_principal):
-        try:
-            assignment = cls.query.get(_id)
-            if not assignment:
-                raise FyleError(error_message="Assignment not found")
-            if not grade:
-                raise FyleError(error_message="assignment with empty grade cannot be graded")
-            
-            assignment.grade = grade
-            assignment.state = AssignmentStateEnum.GRADED
-            db.session.commit()
-            return assignment
-        except SQLAlchemyError:
-            db.session.rollback()
-            raise
-
-
-    @classmethod
-    def get_assignments_by_student(cls, student_id):
-        return cls.filter(cls.student_id == student_id).all()
-
-    @classmethod
-    def get_assignments_by_teacher(cls):
-        return cls.query.all()
-    
+                result['status'] = 'updated'
+                # the UPDATE matches on the version read above, so a concurrent write fails the batch
+                updates.append({'_id': assignment_data.id, '_version': row['version'], 'content': assignment_data.content})
+                row['version'] += 1
+                edited.append(helpers.GeneralObject(
+                    id=assignment_data.id, student_id=student_id, teacher_id=None, state=AssignmentStateEnum.DRAFT,
+                    grade=None, version=row['version'], content=assignment_data.content
+                ))
+
+        # bulk writes skip the flush events, so the written scope is recorded here
+        if updates or inserts:
+            response_cache.record_write(db.session, cache.scope('student', student_id))
+        cls._update_batch(updates, (cls.student_id == student_id, cls.state == AssignmentStateEnum.DRAFT))
+
+        insert_mappings = [dict(mapping, version=1) for _, mapping in inserts]
+        for mapping, _id in zip(insert_mappings, cls._insert_batch(insert_mappings)):
+            mapping['id'] = _id
+        # content-only updates leave the summary alone; every insert is a new draft
+        assignment_stats.AssignmentStats.apply_deltas(db.session.connection(), assignment_stats.AssignmentStats.contribution(
+            student_id, None, AssignmentStateEnum.DRAFT, None, sign=len(inserts)
+        ))
+        for (result, _), mapping in zip(inserts, insert_mappings):
+            result.update(id=mapping['id'], status='created')
+
+        events = assignment_events.AssignmentEvent
+        draft = (None, AssignmentStateEnum.DRAFT, None)
+        created = [helpers.GeneralObject(id=mapping['id'], student_id=student_id, teacher_id=None,
+                                         state=AssignmentStateEnum.DRAFT, grade=None, version=1, content=mapping['content'])
+                   for mapping in insert_mappings]
+        events.append(db.session.connection(), [
+            events.values(AssignmentEventKindEnum.EDITED, assignment, draft, content=assignment.content)
+            for assignment in edited
+        ] + [
+            events.values(AssignmentEventKindEnum.CREATED, assignment, content=assignment.content)
+            for assignment in created
+        ])
+        return results
+
+    @classmethod
+    def _transition(cls, _id, criterion, version, **values):
+        """
+        Writes `values` to assignment `_id` with one conditional UPDATE that only matches while
+        `criterion` (and `version`, when given) hold, and bumps the version. Returns the updated
+        row, or None when nothing matched.
+        """
+        table = cls.__table__
+        criterion = list(criterion)
+        columns = list(table.c)
+        if db.session.info.get(LEGACY_SCHEMA):
+            # the revision adding the version column gives every existing row version 1
+            columns.remove(table.c.version)
+        else:
+            if version is not None:
+                criterion.append(table.c.version == version)
+            values['version'] = table.c.version + 1
+        statement = table.update().where(table.c.id == _id, *criterion) \
+            .values(updated_at=helpers.get_utc_now(), **values)
+
+        # an instance already loaded for this id no longer matches the row
+        instance = db.session.identity_map.get(identity_key(cls, _id))
+        if instance is not None:
+            db.session.expire(instance)
+
+        connection = db.session.connection()
+        if connection.dialect.full_returning:
+            return connection.execute(statement.returning(*columns)).first()
+        # sqlite has RETURNING since 3.35, but not through this SQLAlchemy's dialect
+        if connection.execute(statement).rowcount != 1:
+            return None
+        return connection.execute(select(*columns).where(table.c.id == _id)).first()
+
+    @classmethod
+    def _update_batch(cls, rows, criterion, **values):
+        """
+        Writes many assignments with one executemany UPDATE. Each of `rows` binds `_id`, the
+        `_version` read before and its own column values; `values` are the same for every row.
+        A row only matches while it is still at that version and within `criterion`, and one
+        that no longer does fails the whole batch with 409, for the caller's transaction to
+        roll back.
+        """
+        if not rows:
+            return
+        table = cls.__table__
+        per_row = {name: bindparam(name) for name in rows[0] if not name.startswith('_')}
+        statement = table.update() \
+            .where(table.c.id == bindparam('_id'), table.c.version == bindparam('_version'), *criterion) \
+            .values(version=table.c.version + 1, updated_at=helpers.get_utc_now(), **per_row, **values)
+
+        # instances already loaded for these ids no longer match their rows
+        for row in rows:
+            instance = db.session.identity_map.get(identity_key(cls, row['_id']))
+            if instance is not None:
+                db.session.expire(instance)
+
+        connection = db.session.connection()
+        matched = connection.execute(statement, rows).rowcount
+        if not connection.dialect.supports_sane_multi_rowcount:
+            # the driver does not add up the rowcounts of an executemany: read the versions back
+            expected = {row['_id']: row['_version'] + 1 for row in rows}
+            written = {}
+            for ids in helpers.chunked(expected, IN_CHUNK_SIZE):
+                written.update(connection.execute(select(table.c.id, table.c.version).where(table.c.id.in_(ids))).fetchall())
+            matched = len(rows) if written == expected else 0
+        assertions.assert_no_conflict(matched == len(rows), 'An assignment of this batch was changed by another request')
+
+    @classmethod
+    def _insert_batch(cls, rows):
+        """
+        Inserts many assignments with one statement per chunk, instead of the INSERT per row that
+        reading back generated ids through the ORM takes. Returns the new ids in the order of `rows`.
+        """
+        table = cls.__table__
+        connection = db.session.connection()
+        ids = []
+        for chunk in helpers.chunked(rows, IN_CHUNK_SIZE):
+            if connection.dialect.full_returning:
+                # one multi-row VALUES statement, whose RETURNING rows follow the VALUES order
+                ids.extend(connection.execute(table.insert().values(chunk).returning(table.c.id)).scalars())
+                continue
+            connection.execute(table.insert(), chunk)
+            # writers take turns on sqlite and ids only grow, so the chunk holds the newest ids
+            newest = connection.execute(select(table.c.id).order_by(table.c.id.desc()).limit(len(chunk))).scalars()
+            ids.extend(reversed(newest.all()))
+        return ids
+
+    @classmethod
+    def _record_transition(cls, kind, row, teacher_before, state_before, grade_before):
+        """Summary deltas, response cache scopes and the event of a transition written without the ORM"""
+        if db.session.info.get(LEGACY_SCHEMA):
+            # the revisions adding the summary table and the event log backfill both
+            return
+        stats = assignment_stats.AssignmentStats
+        deltas = stats.contribution(row.student_id, teacher_before, state_before, grade_before, sign=-1)
+        deltas.update(stats.contribution(row.student_id, row.teacher_id, row.state, row.grade))
+        stats.apply_deltas(db.session.connection(), deltas)
+        response_cache.record_write(db.session, *cls.cache_scopes(
+            [row.student_id], [teacher_before, row.teacher_id], [state_before, row.state]
+        ))
+        events = assignment_events.AssignmentEvent
+        events.append(db.session.connection(), [events.values(kind, row, (teacher_before, state_before, grade_before))])
+
+    @classmethod
+    def submit(cls, _id, teacher_id, auth_principal, version=None):
+        """Submits a draft to a teacher with one conditional UPDATE; returns the row, the caller commits"""
+        row = cls._transition(
+            _id,
+            (cls.student_id == auth_principal.student_id, cls.state == AssignmentStateEnum.DRAFT,
+             cls.content.isnot(None), cls.content != '', cls.teacher_id.is_(None)),
+            version,
+            teacher_id=teacher_id, state=AssignmentStateEnum.SUBMITTED
+        )
+        if row is None:
+            assignment = cls.get_by_id(_id)
+            assertions.assert_found(assignment, 'No assignment with this id was found')
+            assertions.assert_valid(assignment.student_id == auth_principal.student_id,
+                                    'This assignment belongs to some other student')
+            assertions.assert_no_conflict(version in (None, assignment.version),
+                                          'This assignment was changed by another request')
+            assertions.assert_valid(bool(assignment.content), 'assignment with empty content cannot be submitted')
+            assertions.assert_valid(assignment.state == AssignmentStateEnum.DRAFT, 'only a draft assignment can be submitted')
+            assertions.assert_valid(assignment.teacher_id is None, 'This assignment is already assigned to a teacher')
+            # every check passes now, so another request changed the row in between
+            assertions.assert_no_conflict(False, 'This assignment was changed by another request')
+
+        cls._record_transition(AssignmentEventKindEnum.SUBMITTED, row, None, AssignmentStateEnum.DRAFT, row.grade)
+        return row
+
+    @classmethod
+    def is_submitted_or_graded(cls):
+        # states are inlined rather than bound so sqlite can match the partial index
+        return cls.state.in_(bindparam('submitted_or_graded', SUBMITTED_OR_GRADED, expanding=True, literal_execute=True))
+
+    @classmethod
+    def student_scope(cls, student_id):
+        """Criteria for the assignments a student sees"""
+        return (cls.student_id == student_id,)
+
+    @classmethod
+    def teacher_scope(cls, teacher_id):
+        """Criteria for the assignments a teacher sees"""
+        return (cls.teacher_id == teacher_id, cls.is_submitted_or_graded())
+
+    @classmethod
+    def principal_scope(cls):
+        """Criteria for the assignments a principal sees"""
+        return (cls.is_submitted_or_graded(),)
+
+    @classmethod
+    def cache_scopes(cls, student_ids, teacher_ids, states):
+        """Response cache scopes whose listings can contain assignments with any of these values"""
+        scopes = {cache.scope('student', student_id) for student_id in student_ids}
+        if any(state in SUBMITTED_OR_GRADED for state in states):
+            scopes.update(cache.scope('teacher', teacher_id) for teacher_id in teacher_ids if teacher_id is not None)
+            scopes.add(cache.scope('principal'))
+        return scopes
+
+    @classmethod
+    def get_watermark(cls, *criterion):
+        """(MAX(updated_at), COUNT(*)) of a scope, answered from its covering index without loading rows"""
+        return tuple(db.session.query(func.max(cls.updated_at), func.count(cls.id)).filter(*criterion).one())
+
+    @classmethod
+    def paginate(cls, db_query, after_id=None, limit=None):
+        """Keyset page ordered by id, so the cost of a page does not grow with its depth"""
+        if after_id is not None:
+            db_query = db_query.filter(cls.id > after_id)
+        return db_query.order_by(cls.id).limit(limit)
+
+    @classmethod
+    def get_changes(cls, scope, since=None, until=None, after_id=None, limit=None):
+        """
+        Change feed rows of `scope`. With `since`, the rows with an event id in (since, until],
+        once each, ordered by the latest of those events, whose id each row carries as
+        `position`. The event log's primary key serves the range, so the cost follows the number
+        of changes rather than the size of the scope. Without `since`, the whole scope by id
+        after `after_id`, for a first sync.
+        """
+        if since is None:
+            return cls.paginate(cls.select_rows(*scope), after_id, limit).yield_per(YIELD_PER)
+
+        events = assignment_events.AssignmentEvent.__table__
+        latest = select(events.c.assignment_id, func.max(events.c.id).label('position')) \
+            .where(events.c.id > since, events.c.id <= until) \
+            .group_by(events.c.assignment_id).subquery()
+        return db.session.query(*cls.__table__.columns, latest.c.position) \
+            .join(latest, latest.c.assignment_id == cls.id).filter(*scope) \
+            .order_by(latest.c.position).limit(limit).yield_per(YIELD_PER)
+
+    @classmethod
+    def bulk_mark_grade(cls, grades_data, auth_principal: AuthPrincipal):
+        """
+        Grades many assignments with one IN lookup per chunk and one executemany UPDATE.
+        Teachers follow mark_grade (own and SUBMITTED only); principals may grade or re-grade
+        anything that is not a draft. Returns one result per item, in payload order.
+        """
+        is_principal = auth_principal.principal_id is not None
+        table = cls.__table__
+        rows = {}
+        for ids in helpers.chunked({grade_data.id for grade_data in grades_data}, IN_CHUNK_SIZE):
+            for row in db.session.query(cls.id, cls.student_id, cls.teacher_id, cls.state, cls.grade, cls.version) \
+                    .filter(cls.id.in_(ids)):
+                rows[row.id] = {'student_id': row.student_id, 'teacher_id': row.teacher_id, 'state': row.state,
+                                'grade': row.grade, 'version': row.version}
+
+        results = []
+        updates = []
+        graded = []
+        stats_deltas = Counter()
+        for index, grade_data in enumerate(grades_data):
+            result = {'index': index, 'id': grade_data.id}
+            results.append(result)
+
+            row = rows.get(grade_data.id)
+            if row is None:
+                result.update(status='error', message='No assignment with this id was found')
+            elif is_principal and row['state'] == AssignmentStateEnum.DRAFT:
+                result.update(status='error', message='Draft assignments cannot be graded')
+            elif not is_principal and row['teacher_id'] != auth_principal.teacher_id:
+                result.update(status='error', message='This assignment belongs to another teacher')
+            elif not is_principal and row['state'] != AssignmentStateEnum.SUBMITTED:
+                result.update(status='error', message='Only submitted assignments can be graded')
+            elif grade_data.version not in (None, row['version']):
+                result.update(status='conflict', message='This assignment was changed by another request')
+            else:
+                stats = assignment_stats.AssignmentStats
+                stats_deltas.update(stats.contribution(row['student_id'], row['teacher_id'], row['state'], row['grade'], sign=-1))
+                stats_deltas.update(stats.contribution(row['student_id'], row['teacher_id'], AssignmentStateEnum.GRADED, grade_data.grade))
+                previous = (row['teacher_id'], row['state'], row['grade'])
+                # later items in the same batch see this one as already graded
+                row['state'] = AssignmentStateEnum.GRADED
+                row['grade'] = grade_data.grade
+                result.update(status='graded', grade=grade_data.grade.value)
+                updates.append({'_id': grade_data.id, '_version': row['version'], 'grade': grade_data.grade})
+                row['version'] += 1
+                graded.append((helpers.GeneralObject(id=grade_data.id, **row), previous))
+                response_cache.record_write(db.session, *cls.cache_scopes(
+                    [row['student_id']], [row['teacher_id']], [AssignmentStateEnum.GRADED]
+                ))
+
+        # the same checks as above, on the rows as they are when the UPDATE runs
+        if is_principal:
+            criterion = (table.c.state != AssignmentStateEnum.DRAFT,)
+        else:
+            criterion = (table.c.teacher_id == auth_principal.teacher_id, table.c.state == AssignmentStateEnum.SUBMITTED)
+        cls._update_batch(updates, criterion, state=AssignmentStateEnum.GRADED)
+        assignment_stats.AssignmentStats.apply_deltas(db.session.connection(), stats_deltas)
+        events = assignment_events.AssignmentEvent
+        events.append(db.session.connection(), [
+            events.values(AssignmentEventKindEnum.GRADED, assignment, previous) for assignment, previous in graded
+        ])
+        return results
+
     @classmethod
-    def get_submitted_and_graded_assignments(cls):
-        return cls.filter(
-            cls.state.in_([AssignmentStateEnum.SUBMITTED, AssignmentStateEnum.GRADED])
-        ).all()
+    def get_assignments_by_student(cls, student_id, after_id=None, limit=None):
+        return cls.paginate(cls.filter(*cls.student_scope(student_id)), after_id, limit).all()
+
+    @classmethod
+    def get_submitted_and_graded_assignments(cls, after_id=None, limit=None):
+        return cls.paginate(cls.filter(*cls.principal_scope()), after_id, limit).yield_per(YIELD_PER)
+
+    @classmethod
+    def get_assignment_rows_by_student(cls, student_id, after_id=None, limit=None):
+        return cls.paginate(cls.select_rows(*cls.student_scope(student_id)), after_id, limit).yield_per(YIELD_PER)
+
+    @classmethod
+    def get_assignment_rows_by_teacher(cls, teacher_id, after_id=None, limit=None):
+        return cls.paginate(cls.select_rows(*cls.teacher_scope(teacher_id)), after_id, limit).yield_per(YIELD_PER)
+
+    @classmethod
+    def get_submitted_and_graded_assignment_rows(cls, after_id=None, limit=None):
+        return cls.paginate(cls.select_rows(*cls.principal_scope()), after_id, limit).yield_per(YIELD_PER)
 
     @classmethod
     def get_all_assignments(cls):
         return cls.query.all()
 
     @classmethod
-    def get_assignments_by_teacher(cls, teacher_id):
-        return cls.filter(
-            cls.teacher_id == teacher_id,
-            cls.state.in_([AssignmentStateEnum.SUBMITTED, AssignmentStateEnum.GRADED])
-        ).all()
+    def get_assignments_by_teacher(cls, teacher_id, after_id=None, limit=None):
+        return cls.paginate(cls.filter(*cls.teacher_scope(teacher_id)), after_id, limit).yield_per(YIELD_PER)
 
     @classmethod
-    def mark_grade(cls, _id, grade, auth_principal: AuthPrincipal):
-        assignment = Assignment.get_by_id(_id)
-        assertions.assert_found(assignment, 'No assignment with this id was found')
-        assertions.assert_valid(assignment.teacher_id == auth_principal.teacher_id, 'This assignment belongs to another teacher')
-        assertions.assert_valid(assignment.state == AssignmentStateEnum.SUBMITTED, 'Only submitted assignments can be graded')
+    def mark_grade(cls, _id, grade, auth_principal: AuthPrincipal, version=None):
+        """Grades a submitted assignment of the teacher with one conditional UPDATE; the caller commits"""
         assertions.assert_valid(grade is not None, 'Assignment with empty grade cannot be graded')
+        row = cls._transition(
+            _id,
+            (cls.teacher_id == auth_principal.teacher_id, cls.state == AssignmentStateEnum.SUBMITTED),
+            version,
+            grade=grade, state=AssignmentStateEnum.GRADED
+        )
+        if row is None:
+            assignment = cls.get_by_id(_id)
+            assertions.assert_found(assignment, 'No assignment with this id was found')
+            assertions.assert_valid(assignment.teacher_id == auth_principal.teacher_id,
+                                    'This assignment belongs to another teacher')
+            assertions.assert_no_conflict(version in (None, assignment.version),
+                                          'This assignment was changed by another request')
+            assertions.assert_valid(assignment.state == AssignmentStateEnum.SUBMITTED,
+                                    'Only submitted assignments can be graded')
+            assertions.assert_no_conflict(False, 'This assignment was changed by another request')
 
-        assignment.grade = grade
-        assignment.state = AssignmentStateEnum.GRADED
-        db.session.flush()
+        cls._record_transition(AssignmentEventKindEnum.GRADED, row, row.teacher_id, AssignmentStateEnum.SUBMITTED, None)
+        return row
 
-        return assignment
+    @classmethod
+    def regrade(cls, _id, grade, version=None):
+        """
+        Grades or re-grades any assignment that is not a draft, for principals. The current row is
+        read first, for the summary, and the UPDATE only applies while its version is unchanged.
+        """
+        current = cls.select_rows(cls.id == _id).first()
+        assertions.assert_found(current, 'No assignment with this id was found')
+        assertions.assert_no_conflict(version in (None, current.version),
+                                      'This assignment was changed by another request')
+        assertions.assert_valid(current.state != AssignmentStateEnum.DRAFT, 'Draft assignments cannot be graded')
+
+        row = cls._transition(_id, (), current.version, grade=grade, state=AssignmentStateEnum.GRADED)
+        assertions.assert_no_conflict(row is not None, 'This assignment was changed by another request')
+
+        cls._record_transition(AssignmentEventKindEnum.GRADED, row, current.teacher_id, current.state, current.grade)
+        return row
+
+
+TRACKED_ATTRIBUTES = ('student_id', 'teacher_id', 'state', 'grade')
+
+
+def tracked_values(session, assignment):
+    """(student_id, teacher_id, state, grade) of an assignment as committed and as about to be flushed"""
+    instance_state = inspect(assignment)
+    unloaded = instance_state.unloaded
+    before, after = [], []
+    old_value_unknown = False
+    for name in TRACKED_ATTRIBUTES:
+        history = instance_state.attrs[name].history
+        unchanged = history.unchanged[0] if history.unchanged else None
+        before.append(history.deleted[0] if history.deleted else unchanged)
+        after.append(history.added[0] if history.added else unchanged)
+        # set while expired, or never loaded: the committed value is only in the database
+        old_value_unknown |= name in unloaded or bool(history.added and not history.deleted)
+
+    if instance_state.persistent and old_value_unknown:
+        # by identity, since reading assignment.id would refresh the expired attributes
+        _id, = instance_state.identity
+        with session.no_autoflush:
+            before = list(session.query(*(getattr(Assignment, name) for name in TRACKED_ATTRIBUTES))
+                          .filter(Assignment.id == _id).one())
+        for index, name in enumerate(TRACKED_ATTRIBUTES):
+            if name in unloaded:
+                after[index] = before[index]
+    return before, after
+
+
+@event.listens_for(db.session, 'before_flush')
+def _record_written_scopes(session, flush_context, instances):
+    """Records the listings touched by every ORM write to an assignment, before and after the change"""
+    modified = [instance for instance in session.dirty if session.is_modified(instance)]
+    for assignment in list(session.new) + modified + list(session.deleted):
+        if not isinstance(assignment, Assignment):
+            continue
+        (student_before, teacher_before, state_before, _), (student_after, teacher_after, state_after, _) = \
+            tracked_values(session, assignment)
+        response_cache.record_write(session, *Assignment.cache_scopes(
+            [student_before, student_after], [teacher_before, teacher_after],
+            [AssignmentStateEnum(state) for state in (state_before, state_after) if state is not None]
+        ))
+
+
+# the summary table keeps itself in step with every flush of an assignment
+from core.models import assignment_stats  # noqa: E402,F401
+from core.models import assignment_events  # noqa: E402
@@ -0,0 +1,175 @@
+"""
+Projections fold `assignment_events` into read models in batches. Each one keeps the id of
+the last event it applied in `projection_offsets`, and every batch commits together with its
+new offset, so a run resumes where the previous one stopped and never applies an event twice.
+Batches are aggregated in SQL, so Python only handles one row per scope a batch touches.
+"""
+from datetime import timedelta
+
+from core import db
+from core.libs import assertions, helpers
+from core.models.assignment_events import AssignmentEvent
+from core.models.assignment_stats import COUNT_COLUMNS, GRADE_COLUMNS, STATE_COLUMNS, STUDENT, TEACHER, add_count_rows
+from core.models.assignments import AssignmentStateEnum
+from sqlalchemy import case, func, literal, select, union_all
+
+BATCH_SIZE = 50000
+
+# events younger than this are left for the next run: on server databases a transaction can
+# commit a lower event id after a higher one, and the offset must not skip past it
+SETTLE_SECONDS = 2
+
+
+class ProjectionOffset(db.Model):
+    __tablename__ = 'projection_offsets'
+    name = db.Column(db.String(64), primary_key=True)
+    # id of the last event folded into the projection
+    position = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.TIMESTAMP(timezone=True), default=helpers.get_utc_now, nullable=False,
+                           onupdate=helpers.get_utc_now)
+
+    def __repr__(self):
+        return '<ProjectionOffset %s:%r>' % (self.name, self.position)
+
+    @classmethod
+    def get_position(cls, connection, name):
+        """Stored offset of projection `name`, creating it at 0 on first use"""
+        table = cls.__table__
+        position = connection.execute(select(table.c.position).where(table.c.name == name)).scalar()
+        if position is None:
+            connection.execute(table.insert().values(name=name, position=0, updated_at=helpers.get_utc_now()))
+            position = 0
+        return position
+
+    @classmethod
+    def move(cls, connection, name, position, new_position):
+        """Moves the offset only if it is still at `position`, so two runs cannot apply one batch"""
+        table = cls.__table__
+        moved = connection.execute(
+            table.update().where(table.c.name == name, table.c.position == position)
+            .values(position=new_position, updated_at=helpers.get_utc_now())
+        ).rowcount
+        assertions.assert_no_conflict(moved == 1, 'projection {} was advanced by another run'.format(name))
+
+
+class AssignmentCounts(db.Model):
+    """Per-student and per-teacher counts by state and grade, projected from assignment_events"""
+    __tablename__ = 'assignment_counts'
+    scope = db.Column(db.String(16), primary_key=True)
+    scope_id = db.Column(db.Integer, primary_key=True)
+    draft_count = db.Column(db.Integer, default=0, nullable=False)
+    submitted_count = db.Column(db.Integer, default=0, nullable=False)
+    graded_count = db.Column(db.Integer, default=0, nullable=False)
+    grade_a_count = db.Column(db.Integer, default=0, nullable=False)
+    grade_b_count = db.Column(db.Integer, default=0, nullable=False)
+    grade_c_count = db.Column(db.Integer, default=0, nullable=False)
+    grade_d_count = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return '<AssignmentCounts %s:%r>' % (self.scope, self.scope_id)
+
+    @classmethod
+    def filter(cls, *criterion):
+        db_query = db.session.query(cls)
+        return db_query.filter(*criterion)
+
+
+class AssignmentCountsProjection:
+    """Folds every event's move from its previous to its new (teacher, state, grade) into AssignmentCounts"""
+    name = 'assignment_counts'
+    table = AssignmentCounts.__table__
+
+    def reset(self, connection):
+        connection.execute(self.table.delete())
+
+    @staticmethod
+    def _net_counts(scope_column, previous_scope_column, after_id, until_id):
+        """Per scope id, what the events in (after_id, until_id] added to each count minus what they took away"""
+        events = AssignmentEvent.__table__
+        in_batch = (events.c.id > after_id, events.c.id <= until_id)
+        moves = union_all(
+            select(scope_column.label('scope_id'), events.c.state, events.c.grade, literal(1).label('sign'))
+            .where(*in_batch),
+            select(previous_scope_column, events.c.previous_state, events.c.previous_grade, literal(-1))
+            .where(*in_batch, events.c.previous_state.isnot(None)),
+        ).subquery()
+
+        graded = moves.c.state == AssignmentStateEnum.GRADED
+        counts = [func.sum(case((moves.c.state == state, moves.c.sign), else_=0)).label(column)
+                  for state, column in STATE_COLUMNS.items()]
+        counts += [func.sum(case((graded & (moves.c.grade == grade), moves.c.sign), else_=0)).label(column)
+                   for grade, column in GRADE_COLUMNS.items()]
+        return select(moves.c.scope_id, *counts).where(moves.c.scope_id.isnot(None)).group_by(moves.c.scope_id)
+
+    def apply(self, connection, after_id, until_id):
+        """Applies the events with ids in (after_id, until_id]; returns how many there were"""
+        events = AssignmentEvent.__table__
+        values = []
+        for scope, scope_column, previous_scope_column in (
+                (STUDENT, events.c.student_id, events.c.student_id),
+                (TEACHER, events.c.teacher_id, events.c.previous_teacher_id)):
+            for row in connection.execute(self._net_counts(scope_column, previous_scope_column, after_id, until_id)):
+                counts = dict(zip(COUNT_COLUMNS, row[1:]))
+                # edits and no-op moves cancel out
+                if any(counts.values()):
+                    values.append(dict(counts, scope=scope, scope_id=row[0]))
+
+        add_count_rows(connection, self.table, values)
+        return connection.execute(
+            select(func.count()).where(events.c.id > after_id, events.c.id <= until_id)
+        ).scalar()
+
+
+PROJECTIONS = {projection.name: projection for projection in (AssignmentCountsProjection(),)}
+
+
+def _batch_end(connection, after_id, batch_size, settled_before):
+    """Last event id of the next batch, stopping short of the first unsettled event; None if there is none"""
+    events = AssignmentEvent.__table__
+    next_ids = select(events.c.id).where(events.c.id > after_id).order_by(events.c.id).limit(batch_size).subquery()
+    until_id = connection.execute(select(func.max(next_ids.c.id))).scalar()
+    if until_id is None:
+        return None
+
+    first_unsettled = connection.execute(
+        select(func.min(events.c.id))
+        .where(events.c.id > after_id, events.c.id <= until_id, events.c.created_at > settled_before)
+    ).scalar()
+    if first_unsettled is not None:
+        until_id = first_unsettled - 1
+    return until_id if until_id > after_id else None
+
+
+def catch_up(projection, batch_size=BATCH_SIZE, settle_seconds=SETTLE_SECONDS):
+    """
+    Applies the events after the projection's offset, committing each batch with its offset.
+    Returns the number of events applied.
+    """
+    settled_before = helpers.get_utc_now() - timedelta(seconds=settle_seconds)
+    applied = 0
+    while True:
+        connection = db.session.connection()
+        after_id = ProjectionOffset.get_position(connection, projection.name)
+        until_id = _batch_end(connection, after_id, batch_size, settled_before)
+        if until_id is None:
+            break
+
+        applied += projection.apply(connection, after_id, until_id)
+        ProjectionOffset.move(connection, projection.name, after_id, until_id)
+        db.session.commit()
+
+    db.session.commit()
+    return applied
+
+
+def rebuild(projection, batch_size=BATCH_SIZE, settle_seconds=SETTLE_SECONDS):
+    """
+    Empties the projection and replays the whole log into it. Only the projection and the
+    event log are read, so writers to `assignments` are never blocked. Readers see the
+    projection fill up batch by batch.
+    """
+    connection = db.session.connection()
+    position = ProjectionOffset.get_position(connection, projection.name)
+    projection.reset(connection)
+    ProjectionOffset.move(connection, projection.name, position, 0)
+    return catch_up(projection, batch_size, settle_seconds)
@@ -0,0 +1,195 @@
+"""
+Server-sent events for submissions and grades. Each worker runs one EventTailer. It polls
+`assignment_events` for rows written since its last poll, by any worker, and publishes them
+to the worker's in-process broker. The database sees one indexed range query per worker per
+poll interval, however many listeners are connected. Listeners are idle until a message or a
+heartbeat is due, which under the gevent worker makes each one a parked greenlet.
+"""
+import json
+import logging
+import threading
+import time
+
+from flask import Response, current_app
+from sqlalchemy import select
+
+from core import app, db
+from core.libs import assertions
+from core.libs.pubsub import Broker
+from core.models.assignment_events import AssignmentEvent
+from core.models.assignments import AssignmentEventKindEnum
+
+logger = logging.getLogger('core.notifications')
+
+NOTIFIED_KINDS = (AssignmentEventKindEnum.SUBMITTED, AssignmentEventKindEnum.GRADED)
+
+# events read per poll; a backlog larger than this drains over the next polls
+TAIL_BATCH_SIZE = 1000
+
+# how long a disconnected EventSource waits before reconnecting with Last-Event-ID
+RETRY_MS = 3000
+
+
+def channel(role, _id):
+    return '{}:{}'.format(role, _id)
+
+
+def message(event):
+    """What listeners receive for one event row: its id, a name and a JSON-ready payload"""
+    return {
+        'id': event.id,
+        'event': event.kind.value.lower(),
+        'data': {
+            'assignment_id': event.assignment_id,
+            'student_id': event.student_id,
+            'teacher_id': event.teacher_id,
+            'state': event.state.value,
+            'grade': event.grade.value if event.grade is not None else None,
+            'version': event.version,
+            'created_at': event.created_at.isoformat(),
+        },
+    }
+
+
+class EventTailer:
+    """Publishes every SUBMITTED and GRADED event to the channels of its student and teacher"""
+
+    def __init__(self, broker, interval, batch_size=TAIL_BATCH_SIZE):
+        self.broker = broker
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_id = None
+        self._poll_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    @staticmethod
+    def _newest_id(connection):
+        table = AssignmentEvent.__table__
+        return connection.execute(select(db.func.max(table.c.id))).scalar() or 0
+
+    def seek_to_end(self):
+        """
+        Starts the tail at the newest event, unless it has a position already. Called before a
+        listener subscribes, so the events written after it are all published.
+        """
+        with self._poll_lock:
+            if self.last_id is None:
+                self.last_id = self._newest_id(db.session.connection())
+
+    def start(self):
+        """Starts polling in a daemon thread, a greenlet under gevent, once per process"""
+        with self._start_lock:
+            # threads do not survive a fork, so a worker forked from a preloaded app starts its own
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='assignment-event-tailer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('tailing assignment_events failed')
+            time.sleep(self.interval)
+
+    def poll(self):
+        """Publishes the notified events written since the last poll; returns how many were published"""
+        with self._poll_lock, app.app_context():
+            table = AssignmentEvent.__table__
+            connection = db.session.connection()
+            if self.last_id is None:
+                # nobody has subscribed yet; anything older is replayed on request
+                self.last_id = self._newest_id(connection)
+                return 0
+
+            events = connection.execute(
+                select(table).where(table.c.id > self.last_id).order_by(table.c.id).limit(self.batch_size)
+            ).fetchall()
+            if events:
+                self.last_id = events[-1].id
+
+        published = 0
+        for event in events:
+            if event.kind not in NOTIFIED_KINDS:
+                continue
+            published += 1
+            self.broker.publish(channel('student', event.student_id), message(event))
+            if event.teacher_id is not None:
+                self.broker.publish(channel('teacher', event.teacher_id), message(event))
+        return published
+
+
+broker = Broker(maxsize=app.config['SSE_QUEUE_SIZE'])
+tailer = EventTailer(broker, interval=app.config['SSE_POLL_INTERVAL'])
+
+
+def replay(role, _id, after_id, limit):
+    """Notified events of a student or teacher after `after_id`, for a client that reconnects"""
+    table = AssignmentEvent.__table__
+    scope_column = table.c.teacher_id if role == 'teacher' else table.c.student_id
+    events = db.session.execute(
+        select(table)
+        .where(table.c.id > after_id, scope_column == _id, table.c.kind.in_(NOTIFIED_KINDS))
+        .order_by(table.c.id).limit(limit)
+    )
+    return [message(event) for event in events]
+
+
+def _format(message):
+    return 'id: {}\nevent: {}\ndata: {}\n\n'.format(
+        message['id'], message['event'], json.dumps(message['data'], separators=(',', ':'))
+    )
+
+
+def _event_stream(subscription, replayed, heartbeat_seconds):
+    yield 'retry: {}\n\n'.format(RETRY_MS)
+    last_id = 0
+    for replayed_message in replayed:
+        yield _format(replayed_message)
+        last_id = replayed_message['id']
+
+    while True:
+        messages = subscription.get(timeout=heartbeat_seconds)
+        if subscription.lagged:
+            # the queue overflowed and dropped messages; the client should resync from the change feed
+            subscription.lagged = False
+            yield 'event: lagged\ndata: {}\n\n'
+        # a message published while the replay was read is already sent
+        messages = [pending for pending in messages if pending['id'] > last_id]
+        for pending in messages:
+            yield _format(pending)
+        if not messages:
+            # comments keep idle proxies from closing the connection and surface disconnects
+            yield ': keepalive\n\n'
+
+
+def stream(role, _id, last_event_id=None):
+    """
+    text/event-stream response with the submissions and grades of one student or teacher.
+    A reconnecting client sends Last-Event-ID and first gets what it missed since then.
+    """
+    after_id = None
+    if last_event_id:
+        assertions.assert_valid(last_event_id.isdigit(), 'Invalid Last-Event-ID')
+        after_id = int(last_event_id)
+
+    # the tail's starting id is read before subscribing and the replay after it, so no event
+    # written meanwhile falls between them
+    tailer.seek_to_end()
+    subscription = broker.subscribe(channel(role, _id))
+    tailer.start()
+    try:
+        replayed = replay(role, _id, after_id, current_app.config['SSE_REPLAY_LIMIT']) if after_id is not None else []
+    except Exception:
+        subscription.close()
+        raise
+
+    # not wrapped in stream_with_context: the request, and its session, end before the stream idles
+    response = Response(_event_stream(subscription, replayed, current_app.config['SSE_HEARTBEAT_SECONDS']),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # the server closes the response when the client goes away, even before its first chunk
+    response.call_on_close(subscription.close)
+    return response
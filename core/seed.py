@@ -0,0 +1,155 @@
+"""
+Bulk generator for large development and benchmark databases. Rows are built in chunks and
+written with Core executemany inserts inside the session's transaction, so a failed run leaves
+nothing behind. Every assignment gets an IMPORTED event, as the event log migration gives the
+rows that existed before it. The same seed against the same starting database gives the same rows.
+"""
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import func, select
+
+from core import db, response_cache
+from core.libs import helpers
+from core.models.assignment_events import AssignmentEvent
+from core.models.assignment_stats import AssignmentStats
+from core.models.assignments import Assignment, AssignmentEventKindEnum, AssignmentStateEnum, GradeEnum
+from core.models.principals import Principal
+from core.models.students import Student
+from core.models.teachers import Teacher
+from core.models.users import User
+
+CHUNK_SIZE = 20000
+
+# timestamps are spread over the year before this instant, so reruns give identical rows
+DEFAULT_UNTIL = datetime(2026, 1, 1)
+DEFAULT_DAYS = 365
+
+STATE_WEIGHTS = {
+    AssignmentStateEnum.DRAFT: 0.2,
+    AssignmentStateEnum.SUBMITTED: 0.3,
+    AssignmentStateEnum.GRADED: 0.5,
+}
+GRADE_WEIGHTS = {GradeEnum.A: 0.25, GradeEnum.B: 0.35, GradeEnum.C: 0.25, GradeEnum.D: 0.15}
+
+# mean time from creating an assignment to its last submit or grade
+MEAN_TURNAROUND_SECONDS = 3 * 24 * 3600
+
+
+def _next_id(connection, model):
+    return (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _advance_sequence(connection, model):
+    # explicit ids leave postgres sequences behind the table; sqlite needs nothing
+    if connection.dialect.name == 'postgresql':
+        sequence = model.__table__.c.id.default
+        connection.execute(select(func.setval(sequence.name, select(func.max(model.id)).scalar_subquery())))
+
+
+def _insert(connection, model, rows, chunk_size):
+    count = 0
+    for chunk in helpers.chunked(rows, chunk_size):
+        connection.execute(model.__table__.insert(), chunk)
+        count += len(chunk)
+    return count
+
+
+def _add_people(connection, model, role, count, first_user_id, now, chunk_size):
+    """Inserts `count` users and their `model` rows; returns the ids of the new `model` rows"""
+    first_id = _next_id(connection, model)
+    _insert(connection, User, (
+        {'id': first_user_id + index, 'username': '{}{}'.format(role, first_id + index),
+         'email': '{}{}@fylebe.com'.format(role, first_id + index), 'created_at': now, 'updated_at': now}
+        for index in range(count)
+    ), chunk_size)
+    _insert(connection, model, (
+        {'id': first_id + index, 'user_id': first_user_id + index, 'created_at': now, 'updated_at': now}
+        for index in range(count)
+    ), chunk_size)
+    _advance_sequence(connection, model)
+    return list(range(first_id, first_id + count))
+
+
+def _activity(rng, ids, sigma):
+    """Cumulative weights giving each id a lognormal share of the work, so some are far busier"""
+    return list(accumulate(rng.lognormvariate(0, sigma) for _ in ids))
+
+
+def _assignment_chunk(rng, first_id, size, students, student_weights, teachers, teacher_weights, until, days):
+    states = rng.choices(list(STATE_WEIGHTS), list(STATE_WEIGHTS.values()), k=size)
+    student_ids = rng.choices(students, cum_weights=student_weights, k=size)
+    teacher_ids = rng.choices(teachers, cum_weights=teacher_weights, k=size)
+    grades = rng.choices(list(GRADE_WEIGHTS), list(GRADE_WEIGHTS.values()), k=size)
+    span = days * 24 * 3600
+    turnaround = 1.0 / MEAN_TURNAROUND_SECONDS
+
+    rows = []
+    for _id, state, student_id, teacher_id, grade in zip(range(first_id, first_id + size), states, student_ids,
+                                                         teacher_ids, grades):
+        created_at = until - timedelta(seconds=rng.randrange(span))
+        draft = state is AssignmentStateEnum.DRAFT
+        if draft:
+            updated_at = created_at
+        else:
+            updated_at = min(until, created_at + timedelta(seconds=int(rng.expovariate(turnaround))))
+        rows.append({
+            'id': _id,
+            'student_id': student_id,
+            'teacher_id': None if draft else teacher_id,
+            'content': 'Seeded assignment',
+            'grade': grade if state is AssignmentStateEnum.GRADED else None,
+            'state': state,
+            'created_at': created_at,
+            'updated_at': updated_at,
+            'version': 1,
+        })
+    return rows
+
+
+def _imported_events(rows):
+    return [{
+        'assignment_id': row['id'], 'kind': AssignmentEventKindEnum.IMPORTED, 'version': row['version'],
+        'student_id': row['student_id'], 'teacher_id': row['teacher_id'], 'state': row['state'], 'grade': row['grade'],
+        'previous_teacher_id': None, 'previous_state': None, 'previous_grade': None, 'content': None,
+        'created_at': row['updated_at'],
+    } for row in rows]
+
+
+def seed(teachers=100, students=1000, principals=1, assignments=100000, seed_value=0,
+         chunk_size=CHUNK_SIZE, until=DEFAULT_UNTIL, days=DEFAULT_DAYS):
+    """
+    Adds the given numbers of teachers, students, principals (each with a user) and assignments
+    spread over them, then rebuilds assignment_stats. Nothing is committed; returns the counts.
+    """
+    rng = random.Random(seed_value)
+    connection = db.session.connection()
+    now = helpers.get_utc_now()
+
+    first_user_id = _next_id(connection, User)
+    teacher_ids = _add_people(connection, Teacher, 'teacher', teachers, first_user_id, now, chunk_size)
+    student_ids = _add_people(connection, Student, 'student', students, first_user_id + teachers, now, chunk_size)
+    _add_people(connection, Principal, 'principal', principals, first_user_id + teachers + students, now, chunk_size)
+    _advance_sequence(connection, User)
+
+    counts = {'teachers': teachers, 'students': students, 'principals': principals, 'assignments': 0}
+    if assignments and student_ids and teacher_ids:
+        student_weights = _activity(rng, student_ids, 0.75)
+        teacher_weights = _activity(rng, teacher_ids, 0.5)
+        first_id = _next_id(connection, Assignment)
+        for offset in range(0, assignments, chunk_size):
+            rows = _assignment_chunk(rng, first_id + offset, min(chunk_size, assignments - offset), student_ids,
+                                     student_weights, teacher_ids, teacher_weights, until, days)
+            connection.execute(Assignment.__table__.insert(), rows)
+            connection.execute(AssignmentEvent.__table__.insert(), _imported_events(rows))
+            # Core inserts skip the flush hook that records the listings a write touches
+            response_cache.record_write(db.session, *Assignment.cache_scopes(
+                {row['student_id'] for row in rows}, {row['teacher_id'] for row in rows}, {row['state'] for row in rows}
+            ))
+            counts['assignments'] += len(rows)
+        _advance_sequence(connection, Assignment)
+
+    # Core inserts skip the flush hooks that keep the summary current
+    counts['stats_rows'] = AssignmentStats.rebuild()
+    return counts
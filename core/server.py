@@ -1,19 +1,71 @@
-from flask import jsonify
+import time
+
+from flask import Response, jsonify, request
 from marshmallow.exceptions import ValidationError
-from core import app
+from core import app, commands
+from core.apis import decorators
 from core.apis.assignments import student_assignments_resources, teacher_assignments_resources, principal_assignments_resources
-from core.libs import helpers
+from core.libs import helpers, metrics, query_audit
 from core.libs.exceptions import FyleError
 from werkzeug.exceptions import HTTPException
 
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.exc import IntegrityError
 
 from core.apis.teachers import principal_teachers_resources
+from core.apis.reports import principal_reports_resources
 
 app.register_blueprint(student_assignments_resources, url_prefix='/student')
 app.register_blueprint(teacher_assignments_resources, url_prefix='/teacher')
 app.register_blueprint(principal_assignments_resources, url_prefix='/principal')
 app.register_blueprint(principal_teachers_resources, url_prefix='/principal')
+app.register_blueprint(principal_reports_resources, url_prefix='/principal/reports')
+decorators.register_roles(app)
+app.cli.add_command(commands.stats_cli)
+app.cli.add_command(commands.seed_command)
+app.cli.add_command(commands.projections_cli)
+
+
+metrics_registry = metrics.Registry.from_config(app.config)
+query_auditor = query_audit.QueryAuditor.from_config(app.config)
+
+
+@app.before_request
+def start_request_instrumentation():
+    if app.config['METRICS_ENABLED']:
+        metrics.start_request()
+    query_auditor.start_request()
+
+
+# teardown runs after a streamed body has been written out, so the latency covers it
+@app.teardown_request
+def finish_request_instrumentation(exc):
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    metrics.finish_request(metrics_registry, route, request.method)
+    query_auditor.finish_request(route)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._query_started_at
+    metrics.add_query(seconds)
+    query_auditor.record(conn, statement, parameters, seconds)
+
+
+@event.listens_for(Engine, 'commit')
+def _count_commit(conn):
+    metrics.add_commit()
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/')
@@ -1,4 +1,11 @@
 import os
+import sys
+
+# gevent has to patch socket, ssl and threading before anything else imports them; gunicorn's
+# gevent worker only patches after fork, which is too late for an app the master preloaded
+if os.environ.get('GUNICORN_WORKER_CLASS') == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
 
 # https://docs.gunicorn.org/en/stable/settings.html
 
@@ -19,7 +26,8 @@ max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
 max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 20))
 graceful_timeout = int(os.environ.get('GUNICORN_WORKER_GRACEFUL_TIMEOUT', 5))
 
-reload = True
+preload_app = os.environ.get('GUNICORN_PRELOAD_APP', 'false').lower() in ('1', 'true', 'yes', 'on')
+reload = os.environ.get('GUNICORN_RELOAD', 'true').lower() in ('1', 'true', 'yes', 'on')
 
 limit_request_line = 0
 
@@ -41,6 +49,12 @@ access_log_format = '%({X-Real-IP}i)s - - - %(t)s.%(T)s "%(r)s" "%(f)s" "%(a)s"
 def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
 
+    # with preload_app the master may already hold pooled sqlite connections, which must not
+    # be shared across processes; each worker opens its own
+    if 'core' in sys.modules:
+        from core import db
+        db.engine.dispose()
+
 
 def pre_fork(server, worker):
     pass
@@ -53,6 +67,14 @@ def pre_exec(server):
 def when_ready(server):
     server.log.info("Server is ready. Spawning workers")
 
+    # histograms restart from zero with the server; workers of a previous run must not be summed in
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.startswith('worker-') or name.startswith('exited.json'):
+                os.remove(os.path.join(metrics_dir, name))
+
 
 def worker_int(worker):
     worker.log.info("worker received INT or QUIT signal")
@@ -82,6 +104,12 @@ def child_exit(server, worker):
     server.log.info("server: child_exit is called")
     worker.log.info("worker: child_exit is called")
 
+    # the exited worker's histograms move into the shared total, and its own file goes away
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        from core.libs import metrics
+        metrics.mark_process_dead(metrics_dir, worker.pid)
+
 
 def worker_exit(server, worker):
     server.log.info("server: worker_exit is called")
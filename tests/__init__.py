@@ -1,2 +1,7 @@
-from core.server import app
+import os
+
+# the test profile runs against a scratch database, never the dev store.sqlite3
+os.environ['APP_ENV'] = 'test'
+
+from core.server import app  # noqa: E402
 app.testing = True
@@ -0,0 +1,92 @@
+import pytest
+from core import db
+from core.libs.exceptions import FyleError
+from core.models import projections
+from core.models.assignment_events import AssignmentEvent
+from core.models.projections import AssignmentCounts, ProjectionOffset
+
+pytestmark = pytest.mark.query_budget(6)
+
+COUNTS = projections.AssignmentCountsProjection()
+
+
+def counts_of(scope, scope_id):
+    row = AssignmentCounts.filter(AssignmentCounts.scope == scope, AssignmentCounts.scope_id == scope_id).first()
+    return (row.draft_count, row.submitted_count, row.graded_count, row.grade_a_count) if row else (0, 0, 0, 0)
+
+
+def all_counts():
+    return {(row.scope, row.scope_id): counts_of(row.scope, row.scope_id) for row in AssignmentCounts.filter()}
+
+
+def test_writes_append_events(client, h_student_1, h_teacher_1, h_principal):
+    draft = client.post('/student/assignments', headers=h_student_1, json={'content': 'LOGGED'}).json['data']
+    client.post('/student/assignments', headers=h_student_1, json={'id': draft['id'], 'content': 'LOGGED AGAIN'})
+    client.post('/student/assignments/submit', headers=h_student_1, json={'id': draft['id'], 'teacher_id': 1})
+    client.post('/teacher/assignments/grade', headers=h_teacher_1, json={'id': draft['id'], 'grade': 'B'})
+    client.post('/principal/assignments/grade', headers=h_principal, json={'id': draft['id'], 'grade': 'A'})
+
+    events = AssignmentEvent.get_by_assignment(draft['id'])
+    assert [(event.kind.value, event.version) for event in events] == [
+        ('CREATED', 1), ('EDITED', 2), ('SUBMITTED', 3), ('GRADED', 4), ('GRADED', 5)
+    ]
+    assert [event.content for event in events[:2]] == ['LOGGED', 'LOGGED AGAIN']
+    assert (events[2].previous_state.value, events[2].teacher_id) == ('DRAFT', 1)
+    assert (events[4].previous_grade.value, events[4].grade.value) == ('B', 'A')
+
+
+def test_rejected_write_appends_no_event(client, h_student_2):
+    before = AssignmentEvent.filter().count()
+
+    response = client.post('/student/assignments/submit', headers=h_student_2, json={'id': 1, 'teacher_id': 2})
+
+    assert response.status_code == 400
+    assert AssignmentEvent.filter().count() == before
+
+
+def test_projection_applies_new_events_once(client, h_student_2, h_teacher_2):
+    projections.catch_up(COUNTS, settle_seconds=0)
+    student_before, teacher_before = counts_of('student', 2), counts_of('teacher', 2)
+
+    draft = client.post('/student/assignments', headers=h_student_2, json={'content': 'PROJECTED'}).json['data']
+    client.post('/student/assignments/submit', headers=h_student_2, json={'id': draft['id'], 'teacher_id': 2})
+    client.post('/teacher/assignments/grade', headers=h_teacher_2, json={'id': draft['id'], 'grade': 'A'})
+
+    assert projections.catch_up(COUNTS, settle_seconds=0) == 3
+    assert projections.catch_up(COUNTS, settle_seconds=0) == 0
+
+    draft_count, submitted_count, graded_count, grade_a_count = student_before
+    assert counts_of('student', 2) == (draft_count, submitted_count, graded_count + 1, grade_a_count + 1)
+    draft_count, submitted_count, graded_count, grade_a_count = teacher_before
+    assert counts_of('teacher', 2) == (draft_count, submitted_count, graded_count + 1, grade_a_count + 1)
+
+
+def test_rebuild_in_small_batches_matches_incremental():
+    projections.catch_up(COUNTS, settle_seconds=0)
+    incremental = all_counts()
+
+    applied = projections.rebuild(COUNTS, batch_size=3, settle_seconds=0)
+
+    assert applied == AssignmentEvent.filter().count()
+    assert all_counts() == incremental
+    last_id = db.session.query(db.func.max(AssignmentEvent.id)).scalar()
+    assert ProjectionOffset.get_position(db.session.connection(), COUNTS.name) == last_id
+
+
+def test_unsettled_events_wait_for_the_next_run(client, h_student_1):
+    projections.catch_up(COUNTS, settle_seconds=0)
+    client.post('/student/assignments', headers=h_student_1, json={'content': 'NOT SETTLED'})
+
+    assert projections.catch_up(COUNTS, settle_seconds=3600) == 0
+    assert projections.catch_up(COUNTS, settle_seconds=0) == 1
+
+
+def test_offset_moves_only_from_the_position_read():
+    connection = db.session.connection()
+    position = ProjectionOffset.get_position(connection, COUNTS.name)
+
+    with pytest.raises(FyleError) as error:
+        ProjectionOffset.move(connection, COUNTS.name, position + 1, position + 2)
+
+    assert error.value.status_code == 409
+    db.session.rollback()
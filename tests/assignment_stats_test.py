@@ -0,0 +1,77 @@
+import pytest
+from core import db
+from core.models.assignment_stats import AssignmentStats, TEACHER
+from core.models.assignments import Assignment, AssignmentStateEnum, GradeEnum
+
+pytestmark = pytest.mark.query_budget(5)
+
+
+def stats_of(scope, scope_id):
+    row = AssignmentStats.filter(AssignmentStats.scope == scope, AssignmentStats.scope_id == scope_id).first()
+    return {'graded': row.graded_count, 'a': row.grade_a_count} if row else {'graded': 0, 'a': 0}
+
+
+def test_summary_follows_every_write_path(client, h_student_1, h_teacher_1, h_principal):
+    created = client.post('/student/assignments/bulk', headers=h_student_1,
+                          json=[{'content': 'STATS 1'}, {'content': 'STATS 2'}, {'content': 'STATS 3'}]).json['data']
+    first_id, second_id, third_id = [item['id'] for item in created]
+    for assignment_id in (first_id, second_id, third_id):
+        client.post('/student/assignments/submit', headers=h_student_1, json={'id': assignment_id, 'teacher_id': 1})
+
+    client.post('/teacher/assignments/grade', headers=h_teacher_1, json={'id': first_id, 'grade': 'A'})
+    client.post('/teacher/assignments/grade/bulk', headers=h_teacher_1, json=[{'id': second_id, 'grade': 'B'}])
+    client.post('/principal/assignments/grade', headers=h_principal, json={'id': second_id, 'grade': 'A'})
+
+    assert AssignmentStats.verify() == []
+
+
+def test_summary_with_expired_instances():
+    before = stats_of(TEACHER, 2)
+    assignment = Assignment(student_id=2, teacher_id=2, content='EXPIRED', state=AssignmentStateEnum.SUBMITTED)
+    db.session.add(assignment)
+    db.session.commit()
+
+    # committed instances are expired, so the old state is never loaded before it is replaced
+    assignment.state = AssignmentStateEnum.GRADED
+    assignment.grade = GradeEnum.A
+    db.session.commit()
+
+    assert stats_of(TEACHER, 2) == {'graded': before['graded'] + 1, 'a': before['a'] + 1}
+
+    db.session.delete(assignment)
+    db.session.commit()
+
+    assert stats_of(TEACHER, 2) == before
+    assert AssignmentStats.verify() == []
+
+
+def test_rebuild_repairs_drift():
+    AssignmentStats.filter(AssignmentStats.scope == TEACHER).update({'graded_count': 999})
+    assert AssignmentStats.verify()
+
+    AssignmentStats.rebuild()
+    db.session.commit()
+
+    assert AssignmentStats.verify() == []
+
+
+def test_reports_read_summary(client, h_principal):
+    teachers = client.get('/principal/reports/teachers', headers=h_principal).json['data']
+    expected = AssignmentStats.recount()
+
+    assert [row['scope_id'] for row in teachers] == sorted(scope_id for scope, scope_id in expected if scope == TEACHER)
+    for row in teachers:
+        assert row['graded_count'] == expected[(TEACHER, row['scope_id'])]['graded_count']
+
+    top = client.get('/principal/reports/teachers/top', headers=h_principal, query_string={'grade': 'A'}).json['data']
+    if top is not None:
+        assert top['grade_a_count'] == max(counts['grade_a_count'] for (scope, _), counts in expected.items()
+                                           if scope == TEACHER)
+
+
+def test_reports_reject_bad_grade(client, h_principal, h_teacher_1):
+    response = client.get('/principal/reports/teachers/top', headers=h_principal, query_string={'grade': 'Z'})
+    assert response.status_code == 400
+
+    response = client.get('/principal/reports/teachers', headers=h_teacher_1)
+    assert response.status_code == 403
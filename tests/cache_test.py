@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import event
+
+from core import app, db, response_cache, seed
+from core.libs import cache
+from core.models.assignments import Assignment, AssignmentStateEnum
+
+pytestmark = pytest.mark.query_budget(5)
+
+
+@pytest.fixture(autouse=True)
+def cache_enabled(monkeypatch):
+    # off by default, see RESPONSE_CACHE_ENABLED
+    monkeypatch.setattr(response_cache, 'enabled', True)
+
+
+def count_statements(func):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return result, len(statements)
+
+
+def test_lru_backend_evicts_least_recently_used():
+    backend = cache.LRUBackend(max_entries=2)
+    backend.set('a', 1)
+    backend.set('b', 2)
+    backend.get('a')
+    backend.set('c', 3)
+
+    assert backend.get('a') == 1
+    assert backend.get('b') is None
+    assert backend.get('c') == 3
+
+
+def test_per_process_backend_is_refused_for_several_workers():
+    settings = dict(app.config, RESPONSE_CACHE_ENABLED=True, WORKERS=4)
+
+    with pytest.raises(ValueError, match='per process'):
+        cache.ResponseCache.from_config(settings)
+
+    assert cache.ResponseCache.from_config(dict(settings, WORKERS=1)).enabled is True
+    assert cache.ResponseCache.from_config(dict(settings, RESPONSE_CACHE_ENABLED=False)).enabled is False
+
+
+def test_versions_bump_on_commit_only():
+    scope = cache.scope('student', 12345)
+    version = response_cache.version(scope)
+
+    response_cache.record_write(db.session, scope)
+    db.session.rollback()
+    assert response_cache.version(scope) == version
+
+    response_cache.record_write(db.session, scope)
+    db.session.commit()
+    assert response_cache.version(scope) == version + 1
+
+
+def test_cache_scopes_of_a_write():
+    assert Assignment.cache_scopes([1], [2], [AssignmentStateEnum.DRAFT]) == {'student:1'}
+    assert Assignment.cache_scopes([1], [None, 2], [AssignmentStateEnum.DRAFT, AssignmentStateEnum.SUBMITTED]) == {
+        'student:1', 'teacher:2', 'principal'
+    }
+
+
+def test_cached_listing_skips_database(client, h_teacher_1):
+    first, _ = count_statements(lambda: client.get('/teacher/assignments', headers=h_teacher_1).get_data())
+    response, statements = count_statements(lambda: client.get('/teacher/assignments', headers=h_teacher_1))
+
+    assert statements == 0
+    assert response.status_code == 200
+    assert response.get_data() == first
+
+
+def test_write_invalidates_only_affected_scopes(client, h_student_1, h_student_2, h_teacher_1):
+    client.get('/student/assignments', headers=h_student_2).get_data()
+    client.get('/teacher/assignments', headers=h_teacher_1, query_string={'limit': 1000}).get_data()
+    student_2_version = response_cache.version(cache.scope('student', 2))
+
+    created = client.post('/student/assignments/bulk', headers=h_student_1, json=[{'content': 'CACHED'}]).json['data']
+    client.post('/student/assignments/submit', headers=h_student_1, json={'id': created[0]['id'], 'teacher_id': 1})
+
+    assert response_cache.version(cache.scope('student', 2)) == student_2_version
+    listed = client.get('/teacher/assignments', headers=h_teacher_1, query_string={'limit': 1000}).json['data']
+    assert created[0]['id'] in [assignment['id'] for assignment in listed]
+
+
+def test_seed_records_the_listings_it_adds_to():
+    try:
+        seed.seed(teachers=1, students=2, principals=0, assignments=20, chunk_size=8)
+        written = db.session.info[cache.WRITTEN_SCOPES]
+    finally:
+        db.session.rollback()
+
+    assert 'principal' in written
+    assert any(scope_name.startswith('student:') for scope_name in written)
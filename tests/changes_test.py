@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+import pytest
+from tests import app
+from core.libs import helpers
+
+pytestmark = pytest.mark.query_budget(5)
+
+
+@pytest.fixture(autouse=True)
+def settled_immediately(monkeypatch):
+    monkeypatch.setitem(app.config, 'CHANGE_FEED_SETTLE_SECONDS', 0)
+
+
+def poll(client, path, headers, since=None, limit=100):
+    params = {'limit': limit}
+    if since:
+        params['since'] = since
+    response = client.get(path, headers=headers, query_string=params)
+    assert response.status_code == 200
+    return response.json
+
+
+def drain(client, path, headers, since=None, limit=100):
+    """Follows next_token until has_more is false; returns every id seen and the last token"""
+    ids = []
+    while True:
+        page = poll(client, path, headers, since, limit)
+        ids.extend(item['id'] for item in page['data'])
+        since = page['next_token']
+        if not page['has_more']:
+            return ids, since
+
+
+def test_first_poll_pages_through_the_whole_scope(client, h_teacher_1):
+    ids, token = drain(client, '/teacher/assignments/changes', h_teacher_1, limit=2)
+
+    listed = client.get('/teacher/assignments', headers=h_teacher_1, query_string={'limit': 1000}).json['data']
+    assert len(ids) == len(set(ids))
+    assert set(ids) == {item['id'] for item in listed}
+    assert token is not None
+
+
+def test_poll_returns_only_new_changes(client, h_student_1, h_teacher_1):
+    _, token = drain(client, '/teacher/assignments/changes', h_teacher_1)
+
+    draft = client.post('/student/assignments', headers=h_student_1, json={'content': 'CHANGED'}).json['data']
+    client.post('/student/assignments/submit', headers=h_student_1, json={'id': draft['id'], 'teacher_id': 1})
+
+    page = poll(client, '/teacher/assignments/changes', h_teacher_1, token)
+    assert [(item['id'], item['state']) for item in page['data']] == [(draft['id'], 'SUBMITTED')]
+    assert page['has_more'] is False
+
+    again = poll(client, '/teacher/assignments/changes', h_teacher_1, page['next_token'])
+    assert again['data'] == []
+    assert again['next_token'] == page['next_token']
+
+
+def test_rows_changed_twice_are_returned_once_in_order_of_their_last_change(client, h_student_1):
+    _, token = drain(client, '/student/assignments/changes', h_student_1)
+    created = [client.post('/student/assignments', headers=h_student_1, json={'content': 'TICK {}'.format(index)})
+               .json['data']['id'] for index in range(3)]
+    client.post('/student/assignments', headers=h_student_1, json={'id': created[0], 'content': 'TICK AGAIN'})
+
+    ids, _ = drain(client, '/student/assignments/changes', h_student_1, token, limit=1)
+    assert ids == created[1:] + created[:1]
+
+
+def test_late_committing_row_is_not_skipped(client, h_student_1, monkeypatch):
+    draft = client.post('/student/assignments', headers=h_student_1, json={'content': 'LATE'}).json['data']
+    _, token = drain(client, '/student/assignments/changes', h_student_1)
+
+    # a write that waited on a lock commits after newer ones with an older updated_at
+    stamped = helpers.get_utc_now() - timedelta(hours=1)
+    monkeypatch.setattr(helpers, 'get_utc_now', lambda: stamped)
+    client.post('/student/assignments', headers=h_student_1, json={'id': draft['id'], 'content': 'COMMITTED LATE'})
+
+    page = poll(client, '/student/assignments/changes', h_student_1, token)
+    assert [(item['id'], item['content']) for item in page['data']] == [(draft['id'], 'COMMITTED LATE')]
+
+
+def test_unsettled_changes_wait_for_a_later_poll(client, h_principal, h_student_1, monkeypatch):
+    _, token = drain(client, '/principal/assignments/changes', h_principal)
+    draft = client.post('/student/assignments', headers=h_student_1, json={'content': 'UNSETTLED'}).json['data']
+    client.post('/student/assignments/submit', headers=h_student_1, json={'id': draft['id'], 'teacher_id': 2})
+
+    monkeypatch.setitem(app.config, 'CHANGE_FEED_SETTLE_SECONDS', 3600)
+    page = poll(client, '/principal/assignments/changes', h_principal, token)
+    assert page['data'] == []
+    assert page['next_token'] == token
+
+    monkeypatch.setitem(app.config, 'CHANGE_FEED_SETTLE_SECONDS', 0)
+    page = poll(client, '/principal/assignments/changes', h_principal, token)
+    assert [item['id'] for item in page['data']] == [draft['id']]
+
+
+def test_invalid_since_token(client, h_student_1):
+    response = client.get('/student/assignments/changes', headers=h_student_1, query_string={'since': 'bogus'})
+
+    assert response.status_code == 400
@@ -0,0 +1,167 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from tests import app
+from core import db
+from core.models.assignment_stats import AssignmentStats
+from core.models.assignments import Assignment
+
+pytestmark = pytest.mark.query_budget(8)
+
+THREADS = 8
+
+
+def post_concurrently(requests):
+    """Sends (path, headers, json) requests from THREADS threads, each with its own client"""
+    def send(request):
+        path, headers, payload = request
+        response = app.test_client().post(path, headers=headers, json=payload)
+        return response.status_code, response.json
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        return list(executor.map(send, requests))
+
+
+def create_draft(client, headers, content):
+    response = client.post('/student/assignments', headers=headers, json={'content': content})
+    assert response.status_code == 200
+    return response.json['data']
+
+
+def submit(client, headers, assignment_id, teacher_id):
+    response = client.post('/student/assignments/submit', headers=headers,
+                           json={'id': assignment_id, 'teacher_id': teacher_id})
+    assert response.status_code == 200
+    return response.json['data']
+
+
+def current_version(assignment_id):
+    with app.app_context():
+        version = Assignment.get_by_id(assignment_id).version
+        db.session.remove()
+    return version
+
+
+def assert_stats_consistent():
+    with app.app_context():
+        assert AssignmentStats.verify() == []
+        db.session.remove()
+
+
+def test_concurrent_submits_apply_once(client, h_student_1):
+    draft = create_draft(client, h_student_1, 'RACE TO SUBMIT')
+    assert draft['version'] == 1
+
+    outcomes = post_concurrently([
+        ('/student/assignments/submit', h_student_1, {'id': draft['id'], 'teacher_id': 1 + index % 2})
+        for index in range(THREADS)
+    ])
+
+    statuses = sorted(status for status, _ in outcomes)
+    assert statuses.count(200) == 1
+    assert set(statuses) <= {200, 400, 409}
+    assert current_version(draft['id']) == 2
+    assert_stats_consistent()
+
+
+def test_concurrent_grades_apply_once(client, h_student_1, h_teacher_1):
+    assignment = submit(client, h_student_1, create_draft(client, h_student_1, 'RACE TO GRADE')['id'], 1)
+
+    outcomes = post_concurrently([
+        ('/teacher/assignments/grade', h_teacher_1, {'id': assignment['id'], 'grade': grade})
+        for grade in 'ABCD' * (THREADS // 4)
+    ])
+
+    graded = [body['data'] for status, body in outcomes if status == 200]
+    assert len(graded) == 1
+    assert graded[0]['version'] == assignment['version'] + 1
+    assert current_version(assignment['id']) == assignment['version'] + 1
+    assert_stats_consistent()
+
+
+def test_concurrent_regrades_lose_no_updates(client, h_student_1, h_principal):
+    assignment = submit(client, h_student_1, create_draft(client, h_student_1, 'REGRADED OFTEN')['id'], 1)
+    rounds = 5
+
+    def regrade_until_applied(index):
+        client = app.test_client()
+        applied = 0
+        while applied < rounds:
+            response = client.post('/principal/assignments/grade', headers=h_principal,
+                                   json={'id': assignment['id'], 'grade': 'ABCD'[(index + applied) % 4]})
+            assert response.status_code in (200, 409)
+            applied += response.status_code == 200
+        return applied
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        applied = sum(executor.map(regrade_until_applied, range(THREADS)))
+
+    # every update that answered 200 is counted in the version exactly once
+    assert applied == THREADS * rounds
+    assert current_version(assignment['id']) == assignment['version'] + applied
+    assert_stats_consistent()
+
+
+def test_stale_version_is_a_conflict(client, h_student_1, h_teacher_1):
+    draft = create_draft(client, h_student_1, 'STALE')
+
+    response = client.post('/student/assignments', headers=h_student_1,
+                           json={'id': draft['id'], 'content': 'STALE EDIT', 'version': draft['version'] + 1})
+    assert response.status_code == 409
+
+    response = client.post('/student/assignments/submit', headers=h_student_1,
+                           json={'id': draft['id'], 'teacher_id': 1, 'version': draft['version'] + 1})
+    assert response.status_code == 409
+    assert response.json['message'] == 'This assignment was changed by another request'
+
+    assignment = submit(client, h_student_1, draft['id'], 1)
+    response = client.post('/teacher/assignments/grade', headers=h_teacher_1,
+                           json={'id': draft['id'], 'grade': 'A', 'version': draft['version']})
+    assert response.status_code == 409
+
+    response = client.post('/teacher/assignments/grade', headers=h_teacher_1,
+                           json={'id': draft['id'], 'grade': 'A', 'version': assignment['version']})
+    assert response.status_code == 200
+
+
+def test_bulk_upsert_reports_a_stale_version_as_a_conflict(client, h_student_1):
+    draft = create_draft(client, h_student_1, 'BULK STALE')
+    edited = client.post('/student/assignments', headers=h_student_1,
+                         json={'id': draft['id'], 'content': 'NEWER', 'version': draft['version']}).json['data']
+
+    response = client.post('/student/assignments/bulk', headers=h_student_1, json=[
+        {'id': draft['id'], 'content': 'STALE BULK EDIT', 'version': draft['version']},
+        {'content': 'BULK NEW'},
+    ])
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json['data']] == ['conflict', 'created']
+    with app.app_context():
+        assert Assignment.get_by_id(draft['id']).content == 'NEWER'
+        db.session.remove()
+
+    response = client.post('/student/assignments/bulk', headers=h_student_1,
+                           json=[{'id': draft['id'], 'content': 'CURRENT BULK EDIT', 'version': edited['version']}])
+    assert [result['status'] for result in response.json['data']] == ['updated']
+
+
+def test_bulk_grade_reports_a_stale_version_as_a_conflict(client, h_student_1, h_teacher_1):
+    assignment = submit(client, h_student_1, create_draft(client, h_student_1, 'BULK GRADE STALE')['id'], 1)
+
+    response = client.post('/teacher/assignments/grade/bulk', headers=h_teacher_1,
+                           json=[{'id': assignment['id'], 'grade': 'A', 'version': assignment['version'] - 1}])
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json['data']] == ['conflict']
+    assert current_version(assignment['id']) == assignment['version']
+
+    response = client.post('/teacher/assignments/grade/bulk', headers=h_teacher_1,
+                           json=[{'id': assignment['id'], 'grade': 'A', 'version': assignment['version']}])
+    assert [result['status'] for result in response.json['data']] == ['graded']
+
+
+def test_bulk_grade_bumps_version_per_write(client, h_student_1, h_principal):
+    assignment = submit(client, h_student_1, create_draft(client, h_student_1, 'BULK VERSION')['id'], 1)
+
+    response = client.post('/principal/assignments/grade/bulk', headers=h_principal,
+                           json=[{'id': assignment['id'], 'grade': 'A'}, {'id': assignment['id'], 'grade': 'B'}])
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json['data']] == ['graded', 'graded']
+    assert current_version(assignment['id']) == assignment['version'] + 2
@@ -0,0 +1,84 @@
+import pytest
+from core import app, config, db
+
+
+def test_sqlite_connection_pragmas():
+    expected = app.config['SQLITE_PRAGMAS']
+
+    with db.engine.connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar().upper() == expected['journal_mode'].upper()
+        assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() == expected['busy_timeout']
+        assert connection.exec_driver_sql('PRAGMA foreign_keys').scalar() == 1
+        # NORMAL
+        assert connection.exec_driver_sql('PRAGMA synchronous').scalar() == 1
+
+
+def test_sqlite_connections_are_pooled():
+    # start from an empty pool: earlier threaded tests leave several connections in it
+    db.engine.dispose()
+    with db.engine.connect() as connection:
+        first = connection.connection.connection
+    with db.engine.connect() as connection:
+        second = connection.connection.connection
+
+    assert first is second
+
+
+def test_get_config_profiles():
+    assert isinstance(config.get_config('dev'), config.DevConfig)
+    assert config.get_config('test').TESTING is True
+    assert isinstance(config.get_config('prod'), config.ProdConfig)
+
+    with pytest.raises(ValueError):
+        config.get_config('staging')
+
+
+def test_server_database_engine_options():
+    prod = config.get_config('prod')
+    prod.SQLALCHEMY_DATABASE_URI = 'postgresql://fyle:fyle@db/fyle'
+
+    options = prod.SQLALCHEMY_ENGINE_OPTIONS
+    assert options['pool_size'] == prod.DB_POOL_SIZE
+    assert options['max_overflow'] == prod.DB_MAX_OVERFLOW
+    assert options['pool_pre_ping'] is True
+    assert options['pool_recycle'] == prod.DB_POOL_RECYCLE
+    assert options['connect_args'] == {'options': '-c statement_timeout={}'.format(prod.DB_STATEMENT_TIMEOUT_MS)}
+
+
+def test_sqlite_engine_options():
+    dev = config.get_config('dev')
+    assert dev.SQLALCHEMY_ENGINE_OPTIONS['pool_size'] == dev.SQLITE_POOL_SIZE
+
+    dev.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    assert dev.SQLALCHEMY_ENGINE_OPTIONS == {}
+
+
+def test_pools_cover_worker_concurrency():
+    dev = config.get_config('dev')
+    dev.WORKER_CLASS, dev.WORKER_THREADS = 'gthread', 32
+    options = dev.SQLALCHEMY_ENGINE_OPTIONS
+    assert options['pool_size'] + options['max_overflow'] == 32
+
+    prod = config.get_config('prod')
+    prod.SQLALCHEMY_DATABASE_URI = 'postgresql://fyle:fyle@db/fyle'
+    prod.WORKER_CLASS, prod.WORKER_CONNECTIONS = 'gevent', 100
+    options = prod.SQLALCHEMY_ENGINE_OPTIONS
+    assert options['pool_size'] + options['max_overflow'] == 100
+
+
+def test_gevent_workers_share_one_sqlite_connection():
+    dev = config.get_config('dev')
+    dev.WORKER_CLASS = 'gevent'
+    options = dev.SQLALCHEMY_ENGINE_OPTIONS
+    assert (options['pool_size'], options['max_overflow']) == (1, 0)
+
+
+def test_sessions_are_scoped_per_greenlet():
+    greenlet = pytest.importorskip('greenlet')
+
+    def other_session():
+        session = db.session()
+        db.session.remove()
+        return session
+
+    assert greenlet.greenlet(other_session).switch() is not db.session()
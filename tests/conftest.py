@@ -1,6 +1,94 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
 import pytest
 import json
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from tests import app
+from core import db, response_cache
+from core.server import query_auditor
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _remove_sqlite_files(path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+@pytest.fixture(scope='session')
+def migrated_database(tmp_path_factory):
+    """A database migrated to head once per run, in a separate process like `flask db upgrade`"""
+    path = str(tmp_path_factory.mktemp('db') / 'migrated.sqlite3')
+    env = dict(os.environ, FLASK_APP='core/server.py', APP_ENV='test', TEST_DATABASE_URL='sqlite:///' + path)
+    subprocess.run([sys.executable, '-m', 'flask', 'db', 'upgrade', '-d', 'core/migrations'],
+                   cwd=REPO_DIR, env=env, check=True, capture_output=True)
+    return path
+
+
+@pytest.fixture(scope='module', autouse=True)
+def fresh_database(migrated_database):
+    """Every test module starts from the freshly migrated database, whatever earlier modules wrote"""
+    path = db.engine.url.database
+    assert path and path != ':memory:', 'tests need a sqlite file for TEST_DATABASE_URL'
+
+    db.session.remove()
+    db.engine.dispose()
+    _remove_sqlite_files(path)
+    source, target = sqlite3.connect(migrated_database), sqlite3.connect(path)
+    with target:
+        source.backup(target)
+    source.close()
+    target.close()
+    yield
+    db.session.remove()
+    db.engine.dispose()
+
+
+def pytest_sessionfinish(session):
+    _remove_sqlite_files(db.engine.url.database)
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    # tests mock models and write through raw SQL, neither of which invalidates cached listings
+    response_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def query_budget(request):
+    """
+    Fails a test when any request it makes runs more statements than its
+    query_budget marker allows; tests that make requests have to declare one.
+    """
+    query_auditor.recorded = []
+    yield
+    recorded, query_auditor.recorded = query_auditor.recorded, None
+    if not recorded:
+        return
+
+    marker = request.node.get_closest_marker('query_budget')
+    assert marker is not None, 'tests that call the api need a query_budget marker'
+    budget = marker.args[0]
+    over_budget = [(route, count) for route, count, _ in recorded if count > budget]
+    assert not over_budget, 'over the query budget of {}: {}'.format(budget, over_budget)
+
+
+@pytest.fixture
+def executed_statements():
+    """SQL of every statement run while the test runs; an executemany batch counts once"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(Engine, 'before_cursor_execute', record)
 
 
 @pytest.fixture
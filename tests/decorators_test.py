@@ -1,6 +1,11 @@
 import pytest
 from flask import Flask, request, jsonify
-from core.apis.decorators import AuthPrincipal, accept_payload, authenticate_principal
+from core import db
+from core.apis.decorators import (
+    AuthPrincipal, accept_payload, authenticate_principal, load_principal, principal_cache_info, register_roles,
+    transactional
+)
+from core.models.assignments import Assignment
 from core.libs.exceptions import FyleError
 import json
 
@@ -96,4 +101,61 @@ def test_authenticate_principal_decorator_wrong_role(app):
         headers = {'X-Principal': json.dumps({'user_id': 1, 'teacher_id': 3})}
         with pytest.raises(FyleError) as exc_info:
             client.get('/student/test', headers=headers)
-        assert 'requester should be a student' in str(exc_info.value)
\ No newline at end of file
+        assert 'requester should be a student' in str(exc_info.value)
+
+
+def test_auth_principal_is_immutable():
+    auth = AuthPrincipal(user_id=1, student_id=2)
+    with pytest.raises(AttributeError):
+        auth.student_id = 3
+    with pytest.raises(AttributeError):
+        auth.extra = 'value'
+
+
+def test_load_principal_caches_parsed_header():
+    header = json.dumps({'user_id': 77, 'teacher_id': 77})
+    before = principal_cache_info()
+
+    first = load_principal(header, 'teacher')
+    second = load_principal(header, 'teacher')
+
+    after = principal_cache_info()
+    assert first is second
+    assert after.misses == before.misses + 1
+    assert after.hits == before.hits + 1
+
+
+def test_load_principal_does_not_cache_role_failures():
+    header = json.dumps({'user_id': 78, 'teacher_id': 78})
+    for _ in range(2):
+        with pytest.raises(FyleError) as exc_info:
+            load_principal(header, 'student')
+        assert exc_info.value.message == 'requester should be a student'
+    assert load_principal(header, 'teacher').teacher_id == 78
+
+
+def test_register_roles(app):
+    @app.route('/teacher/roles')
+    @authenticate_principal
+    def test_func(p):
+        return jsonify({'teacher_id': p.teacher_id})
+
+    register_roles(app)
+
+    with app.test_client() as client:
+        headers = {'X-Principal': json.dumps({'user_id': 1, 'teacher_id': 3})}
+        response = client.get('/teacher/roles', headers=headers)
+        assert response.json == {'teacher_id': 3}
+
+
+def test_transactional_rolls_back_flushed_writes():
+    @transactional
+    def failing_view():
+        db.session.add(Assignment(student_id=1, content='ROLLED BACK'))
+        db.session.flush()
+        raise FyleError(status_code=400, message='failed after flush')
+
+    with pytest.raises(FyleError):
+        failing_view()
+
+    assert Assignment.filter(Assignment.content == 'ROLLED BACK').count() == 0
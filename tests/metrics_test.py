@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from core.libs import metrics
+
+pytestmark = pytest.mark.query_budget(3)
+
+
+LABELS = (('method', 'GET'), ('route', '/student/assignments'))
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Registry()
+    for value in (0.0005, 0.003, 0.003, 20.0):
+        registry.observe('http_request_duration_seconds', LABELS, value)
+
+    text = registry.render()
+
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/student/assignments",le="0.001"} 1' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/student/assignments",le="0.005"} 3' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/student/assignments",le="+Inf"} 4' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/student/assignments"} 4' in text
+
+
+def test_workers_are_aggregated_through_directory(tmp_path):
+    first = metrics.Registry(directory=str(tmp_path))
+    second = metrics.Registry(directory=str(tmp_path))
+    first.observe('http_request_db_queries', LABELS, 2)
+    second.observe('http_request_db_queries', LABELS, 3)
+    second.flush(force=True)
+
+    text = first.render()
+
+    assert 'http_request_db_queries_sum{method="GET",route="/student/assignments"} 5.0' in text
+    assert 'http_request_db_queries_count{method="GET",route="/student/assignments"} 2' in text
+
+
+def test_observations_of_an_idle_worker_are_flushed(tmp_path):
+    scraper = metrics.Registry(directory=str(tmp_path))
+    idle = metrics.Registry(directory=str(tmp_path), flush_interval=0.5)
+    idle.observe('http_request_db_queries', LABELS, 1)
+    idle.flush()
+    # the last request of a burst, within the flush interval of the one before
+    idle.observe('http_request_db_queries', LABELS, 2)
+    idle.flush()
+
+    assert 'http_request_db_queries_count{method="GET",route="/student/assignments"} 1' in scraper.render()
+    for _ in range(200):
+        time.sleep(0.01)
+        if 'http_request_db_queries_count{method="GET",route="/student/assignments"} 2' in scraper.render():
+            break
+    else:
+        raise AssertionError('the idle worker never flushed its last observation')
+
+
+def test_exited_workers_are_folded_and_their_files_removed(tmp_path):
+    scraper = metrics.Registry(directory=str(tmp_path))
+    exited = metrics.Registry(directory=str(tmp_path))
+    exited.observe('http_request_db_queries', LABELS, 4)
+    exited.flush(force=True)
+    # as if it had been written by a worker that is gone now
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+    dead_pid = int(finished.stdout)
+    os.rename(exited._worker_path(), str(tmp_path / 'worker-{}-1.json'.format(dead_pid)))
+
+    assert 'http_request_db_queries_count{method="GET",route="/student/assignments"}' not in scraper.render()
+
+    metrics.mark_process_dead(str(tmp_path), dead_pid)
+    metrics.mark_process_dead(str(tmp_path), dead_pid)
+
+    assert sorted(name for name in os.listdir(str(tmp_path)) if not name.startswith('worker-{}-'.format(os.getpid()))) \
+        == [metrics.EXITED_FILE]
+    assert 'http_request_db_queries_sum{method="GET",route="/student/assignments"} 4.0' in scraper.render()
+
+
+def test_metrics_endpoint_reports_requests(client, h_teacher_1):
+    client.get('/teacher/assignments', headers=h_teacher_1).get_data()
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'http_request_db_queries_count{method="GET",route="/teacher/assignments"}' in response.get_data(as_text=True)
@@ -0,0 +1,143 @@
+import json
+
+import pytest
+from tests import app
+from core import notifications
+from core.libs.pubsub import Broker
+
+pytestmark = pytest.mark.query_budget(5)
+
+
+@pytest.fixture(autouse=True)
+def polled_by_the_test(monkeypatch):
+    # the test polls the event log itself instead of racing a background tailer; every module
+    # has its own copy of the database, so the tail starts over from its newest event
+    monkeypatch.setattr(notifications.tailer, 'start', lambda: None)
+    monkeypatch.setattr(notifications.tailer, 'last_id', None)
+    monkeypatch.setitem(app.config, 'SSE_HEARTBEAT_SECONDS', 0.05)
+
+
+def open_stream(client, path, headers, last_event_id=None):
+    if last_event_id is not None:
+        headers = dict(headers, **{'Last-Event-ID': str(last_event_id)})
+    response = client.get(path, headers=headers, buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    return response, response.iter_encoded()
+
+
+def next_event(chunks, attempts=20):
+    """Next event of the stream as (id, name, data), skipping the retry hint and keepalives"""
+    for _ in range(attempts):
+        chunk = next(chunks).decode()
+        if chunk.startswith(('retry:', ':')):
+            continue
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+        return int(fields['id']), fields['event'], json.loads(fields['data'])
+    raise AssertionError('no event was streamed')
+
+
+def submit_and_grade(client, h_student, h_teacher, teacher_id, content):
+    draft = client.post('/student/assignments', headers=h_student, json={'content': content}).json['data']
+    client.post('/student/assignments/submit', headers=h_student, json={'id': draft['id'], 'teacher_id': teacher_id})
+    client.post('/teacher/assignments/grade', headers=h_teacher, json={'id': draft['id'], 'grade': 'A'})
+    return draft['id']
+
+
+def test_submit_and_grade_reach_the_student_and_the_teacher(client, h_student_1, h_teacher_1):
+    student_stream, student_chunks = open_stream(client, '/student/assignments/events', h_student_1)
+    teacher_stream, teacher_chunks = open_stream(client, '/teacher/assignments/events', h_teacher_1)
+
+    assignment_id = submit_and_grade(client, h_student_1, h_teacher_1, 1, 'STREAMED')
+    assert notifications.tailer.poll() == 2
+
+    for chunks in (student_chunks, teacher_chunks):
+        submitted, graded = next_event(chunks), next_event(chunks)
+        assert (submitted[1], submitted[2]['assignment_id'], submitted[2]['state']) == (
+            'submitted', assignment_id, 'SUBMITTED')
+        assert (graded[1], graded[2]['grade'], graded[2]['teacher_id']) == ('graded', 'A', 1)
+        assert graded[0] > submitted[0]
+
+    student_stream.close()
+    teacher_stream.close()
+
+
+def test_events_before_the_first_poll_reach_the_first_stream(client, h_student_1, h_teacher_1):
+    assert notifications.tailer.last_id is None
+    response, chunks = open_stream(client, '/student/assignments/events', h_student_1)
+
+    assignment_id = submit_and_grade(client, h_student_1, h_teacher_1, 1, 'BEFORE THE FIRST POLL')
+    assert notifications.tailer.poll() == 2
+
+    assert next_event(chunks)[2]['assignment_id'] == assignment_id
+    response.close()
+
+
+def test_other_scopes_are_not_notified(client, h_student_1, h_student_2, h_teacher_1, h_teacher_2):
+    response, chunks = open_stream(client, '/teacher/assignments/events', h_teacher_1)
+
+    submit_and_grade(client, h_student_2, h_teacher_2, 2, 'SOMEONE ELSE')
+    assignment_id = submit_and_grade(client, h_student_1, h_teacher_1, 1, 'MINE')
+    notifications.tailer.poll()
+
+    assert next_event(chunks)[2]['assignment_id'] == assignment_id
+    response.close()
+
+
+def test_reconnect_replays_missed_events(client, h_student_1, h_teacher_1):
+    response, chunks = open_stream(client, '/student/assignments/events', h_student_1)
+    first_id = submit_and_grade(client, h_student_1, h_teacher_1, 1, 'BEFORE DISCONNECT')
+    notifications.tailer.poll()
+    seen = next_event(chunks)[0]
+    response.close()
+
+    second_id = submit_and_grade(client, h_student_1, h_teacher_1, 1, 'WHILE DISCONNECTED')
+    response, chunks = open_stream(client, '/student/assignments/events', h_student_1, last_event_id=seen)
+    notifications.tailer.poll()
+
+    replayed = [next_event(chunks) for _ in range(3)]
+    assert [(data['assignment_id'], name) for _, name, data in replayed] == [
+        (first_id, 'graded'), (second_id, 'submitted'), (second_id, 'graded')
+    ]
+    # the live copies of the replayed events are not sent twice
+    assert next(chunks) == b': keepalive\n\n'
+    response.close()
+
+
+def test_closed_stream_unsubscribes(client, h_student_1):
+    before = notifications.broker.subscriber_count()
+    response, chunks = open_stream(client, '/student/assignments/events', h_student_1)
+    next(chunks)
+    assert notifications.broker.subscriber_count() == before + 1
+
+    response.close()
+
+    assert notifications.broker.subscriber_count() == before
+
+
+def test_invalid_last_event_id(client, h_student_1):
+    response = client.get('/student/assignments/events', headers=dict(h_student_1, **{'Last-Event-ID': 'x'}))
+
+    assert response.status_code == 400
+
+
+def test_slow_subscriber_keeps_only_the_newest_messages():
+    broker = Broker(maxsize=3)
+    subscription = broker.subscribe('teacher:1')
+
+    assert [broker.publish('teacher:1', index) for index in range(5)] == [1] * 5
+
+    assert subscription.get(timeout=0) == [2, 3, 4]
+    assert subscription.lagged is True
+    assert subscription.get(timeout=0) == []
+
+
+def test_unsubscribe_drops_empty_channels():
+    broker = Broker()
+    subscriptions = [broker.subscribe('student:1') for _ in range(2)]
+
+    for subscription in subscriptions:
+        subscription.close()
+
+    assert broker.subscriber_count() == 0
+    assert broker.publish('student:1', 'nobody listens') == 0
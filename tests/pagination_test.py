@@ -0,0 +1,63 @@
+import pytest
+from core.libs import pagination
+from core.libs.pagination import encode_cursor, decode_cursor
+from core.libs.exceptions import FyleError
+
+pytestmark = pytest.mark.query_budget(3)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(42)
+    assert decode_cursor(cursor) == [42]
+
+
+def test_cursor_rejects_garbage():
+    with pytest.raises(FyleError):
+        decode_cursor('not-a-cursor')
+
+
+def test_student_assignments_pages_cover_full_list(client, h_student_1):
+    full = client.get('/student/assignments', headers=h_student_1).json
+    assert full['next_cursor'] is None
+    expected_ids = [assignment['id'] for assignment in full['data']]
+
+    seen_ids = []
+    cursor = None
+    while True:
+        query = {'limit': 1}
+        if cursor:
+            query['cursor'] = cursor
+        response = client.get('/student/assignments', headers=h_student_1, query_string=query)
+        assert response.status_code == 200
+        assert len(response.json['data']) <= 1
+        seen_ids.extend(assignment['id'] for assignment in response.json['data'])
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen_ids == sorted(expected_ids)
+
+
+def test_listing_without_page_args_is_not_capped(client, h_student_1, monkeypatch):
+    total = len(client.get('/student/assignments', headers=h_student_1).json['data'])
+    monkeypatch.setattr(pagination, 'DEFAULT_PAGE_SIZE', 1)
+
+    unpaged = client.get('/student/assignments', headers=h_student_1).json
+    first_page = client.get('/student/assignments', headers=h_student_1,
+                            query_string={'cursor': encode_cursor(0)}).json
+
+    assert (len(unpaged['data']), unpaged['next_cursor']) == (total, None)
+    assert len(first_page['data']) == 1 and first_page['next_cursor'] is not None
+
+
+@pytest.mark.parametrize('query', [
+    {'limit': 0},
+    {'limit': 'abc'},
+    {'limit': 100000},
+    {'cursor': 'garbage'},
+])
+def test_assignments_invalid_page_args(client, h_teacher_1, query):
+    response = client.get('/teacher/assignments', headers=h_teacher_1, query_string=query)
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'FyleError'
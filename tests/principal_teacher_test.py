@@ -3,6 +3,9 @@ from unittest.mock import patch, MagicMock
 from core.models.teachers import Teacher
 from core.apis.responses import APIResponse
 
+pytestmark = pytest.mark.query_budget(2)
+
+
 def test_list_teachers_success(client, h_principal):
     with patch('core.models.teachers.Teacher.query') as mock_query:
         mock_teachers = [Teacher(id=1, name='Teacher 1'), Teacher(id=2, name='Teacher 2')]
@@ -1,6 +1,7 @@
 from core.models.assignments import AssignmentStateEnum, GradeEnum
 import pytest
 
+pytestmark = pytest.mark.query_budget(5)
 
 
 def test_get_assignments(client, h_principal):
@@ -148,3 +149,35 @@ def test_grade_assignment_all_grades(client, h_principal, grade):
     assert response.status_code == 200
     assert response.json['data']['state'] == AssignmentStateEnum.GRADED.value
     assert response.json['data']['grade'] == grade.value
+
+
+def test_bulk_grade_assignments(client, h_principal, h_student_1):
+    draft_id = client.post('/student/assignments/bulk', headers=h_student_1, json=[{'content': 'DRAFT'}]).json['data'][0]['id']
+
+    response = client.post(
+        '/principal/assignments/grade/bulk',
+        json=[
+            {'id': 3, 'grade': GradeEnum.A.value},
+            {'id': 4, 'grade': GradeEnum.B.value},
+            {'id': draft_id, 'grade': GradeEnum.C.value},
+        ],
+        headers=h_principal
+    )
+
+    assert response.status_code == 200
+    results = response.json['data']
+    assert [result['status'] for result in results] == ['graded', 'graded', 'error']
+    assert results[1]['grade'] == GradeEnum.B.value
+    assert results[2]['message'] == 'Draft assignments cannot be graded'
+
+
+def test_regrade_is_visible_in_cached_listings(client, h_principal):
+    def grade_of_4(path, headers):
+        listed = client.get(path, headers=headers, query_string={'limit': 1000}).json['data']
+        return {assignment['id']: assignment['grade'] for assignment in listed}.get(4)
+
+    grade_of_4('/principal/assignments', h_principal)
+
+    client.post('/principal/assignments/grade', json={'id': 4, 'grade': GradeEnum.D.value}, headers=h_principal)
+
+    assert grade_of_4('/principal/assignments', h_principal) == GradeEnum.D.value
@@ -0,0 +1,49 @@
+import logging
+
+from core import app, db, server
+from core.libs.query_audit import QueryAuditor, statement_shape
+from core.models.teachers import Teacher
+
+
+def test_statement_shape_ignores_literals():
+    assert statement_shape("SELECT * FROM assignments WHERE id IN (1, 2, 3) AND state IN ('SUBMITTED', 'GRADED')") == \
+        statement_shape("SELECT * FROM assignments WHERE id IN (7) AND state IN ('DRAFT')")
+
+
+def test_lazy_relationship_is_reported_as_n_plus_one(caplog, monkeypatch):
+    auditor = QueryAuditor(repeat_threshold=2)
+    auditor.recorded = []
+    monkeypatch.setattr(server, 'query_auditor', auditor)
+
+    with app.test_request_context('/n-plus-one'):
+        auditor.start_request()
+        teachers = Teacher.query.all()
+        for teacher in teachers:
+            # lazy='dynamic' runs one COUNT per teacher
+            teacher.assignments.count()
+        with caplog.at_level(logging.WARNING, logger='core.query_audit'):
+            auditor.finish_request('/n-plus-one')
+
+    route, count, repeated = auditor.recorded[0]
+    assert count == 1 + len(teachers)
+    assert list(repeated.values()) == [len(teachers)]
+    assert 'possible N+1 on /n-plus-one' in caplog.text
+
+
+def test_slow_query_is_logged_with_plan(caplog):
+    auditor = QueryAuditor(slow_ms=0)
+
+    with db.engine.connect() as connection, caplog.at_level(logging.WARNING, logger='core.query_audit'):
+        auditor.record(connection, 'SELECT * FROM assignments WHERE id = ?', (1,), 0.5)
+
+    assert 'slow query (500.0 ms)' in caplog.text
+    assert 'SEARCH assignments USING INTEGER PRIMARY KEY' in caplog.text
+
+
+def test_slow_executemany_logs_batch_size(caplog):
+    auditor = QueryAuditor(slow_ms=0)
+
+    with db.engine.connect() as connection, caplog.at_level(logging.WARNING, logger='core.query_audit'):
+        auditor.record(connection, 'INSERT INTO users (username) VALUES (?)', [('a',), ('b',)], 0.5)
+
+    assert '<2 parameter sets>' in caplog.text
@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import event
+
+from core import db
+from core.libs import query_plan
+from core.models.assignment_events import AssignmentEvent
+from core.models.assignments import Assignment
+from core.models.users import User
+
+MODEL_TABLES = {table.name for table in db.metadata.sorted_tables}
+
+# a change feed poll: the event ids after the last one seen, up to the settled one
+SINCE, UNTIL = 1, 10 ** 9
+
+# get_all_assignments is deliberately a full read and has no index to use
+MODEL_QUERIES = {
+    'Assignment.get_by_id': lambda: Assignment.get_by_id(1),
+    'Assignment.get_assignments_by_student': lambda: Assignment.get_assignments_by_student(1, limit=10),
+    'Assignment.get_assignments_by_student:cursor': lambda: Assignment.get_assignments_by_student(1, after_id=1, limit=10),
+    'Assignment.get_assignments_by_teacher': lambda: list(Assignment.get_assignments_by_teacher(1, limit=10)),
+    'Assignment.get_assignments_by_teacher:cursor': lambda: list(Assignment.get_assignments_by_teacher(1, after_id=1, limit=10)),
+    'Assignment.get_submitted_and_graded_assignments': lambda: list(Assignment.get_submitted_and_graded_assignments(limit=10)),
+    'Assignment.get_submitted_and_graded_assignments:cursor': lambda: list(Assignment.get_submitted_and_graded_assignments(after_id=1, limit=10)),
+    'Assignment.get_assignment_rows_by_student': lambda: list(Assignment.get_assignment_rows_by_student(1, limit=10)),
+    'Assignment.get_assignment_rows_by_teacher': lambda: list(Assignment.get_assignment_rows_by_teacher(1, limit=10)),
+    'Assignment.get_submitted_and_graded_assignment_rows': lambda: list(Assignment.get_submitted_and_graded_assignment_rows(limit=10)),
+    'Assignment.get_watermark:student': lambda: Assignment.get_watermark(*Assignment.student_scope(1)),
+    'Assignment.get_watermark:teacher': lambda: Assignment.get_watermark(*Assignment.teacher_scope(1)),
+    'Assignment.get_watermark:principal': lambda: Assignment.get_watermark(*Assignment.principal_scope()),
+    'Assignment.get_changes:student': lambda: list(Assignment.get_changes(Assignment.student_scope(1), since=SINCE, until=UNTIL, limit=10)),
+    'Assignment.get_changes:teacher': lambda: list(Assignment.get_changes(Assignment.teacher_scope(1), since=SINCE, until=UNTIL, limit=10)),
+    'Assignment.get_changes:principal': lambda: list(Assignment.get_changes(Assignment.principal_scope(), since=SINCE, until=UNTIL, limit=10)),
+    'Assignment.get_changes:first_sync': lambda: list(Assignment.get_changes(Assignment.student_scope(1), after_id=1, limit=10)),
+    'AssignmentEvent.get_settled_position': lambda: AssignmentEvent.get_settled_position(1, settle_seconds=2),
+    'User.get_by_id': lambda: User.get_by_id(1),
+    'User.get_by_email': lambda: User.get_by_email('student1@fylebe.com'),
+}
+
+# report queries legitimately visit every student, but never every assignment
+REPORT_QUERIES = {
+    'count_grade_A_assignments_by_teacher_with_max_grading': {'assignments'},
+    'number_of_graded_assignments_for_each_student': {'assignments', 'a'},
+}
+
+
+def capture_statements(func):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return statements
+
+
+@pytest.mark.parametrize('name', MODEL_QUERIES)
+def test_model_query_uses_index(name):
+    statements = capture_statements(MODEL_QUERIES[name])
+    assert statements
+
+    connection = db.session.connection().connection
+    for statement, parameters in statements:
+        plan = query_plan.explain(connection, statement, parameters)
+        assert query_plan.full_scans(plan, MODEL_TABLES) == [], '{} scans a table: {}'.format(name, plan)
+
+
+@pytest.mark.parametrize('name', REPORT_QUERIES)
+def test_report_query_uses_index(name):
+    with open('tests/SQL/{}.sql'.format(name), encoding='utf8') as fo:
+        sql = fo.read()
+
+    connection = db.session.connection().connection
+    plan = query_plan.explain(connection, sql)
+    assert query_plan.full_scans(plan, REPORT_QUERIES[name]) == [], '{} scans assignments: {}'.format(name, plan)
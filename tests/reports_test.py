@@ -0,0 +1,84 @@
+import json
+
+import pytest
+from sqlalchemy import text
+
+from core import db
+from core.apis import responses
+from core.models.assignment_stats import AssignmentStats, STUDENT, TEACHER
+
+pytestmark = pytest.mark.query_budget(2)
+
+
+def run_sql_file(name):
+    with open('tests/SQL/{}.sql'.format(name), encoding='utf8') as fo:
+        return db.session.execute(text(fo.read())).fetchall()
+
+
+def get_columns(client, headers, path, **args):
+    response = client.get('/principal/reports' + path, headers=headers, query_string=args)
+    assert response.status_code == 200
+    return response.json['data']
+
+
+def test_leaderboard_matches_sql(client, h_principal):
+    columns = get_columns(client, h_principal, '/teachers/leaderboard', grade='A')
+    expected = run_sql_file('count_grade_A_assignments_by_teacher_with_max_grading')
+
+    assert set(columns) == {'teacher_id', 'graded_count'}
+    if expected:
+        assert (columns['teacher_id'][0], columns['graded_count'][0]) == tuple(expected[0])
+    assert columns['graded_count'] == sorted(columns['graded_count'], reverse=True)
+
+
+def test_graded_per_student_matches_sql(client, h_principal):
+    columns = get_columns(client, h_principal, '/students/graded')
+    expected = run_sql_file('number_of_graded_assignments_for_each_student')
+
+    assert list(zip(columns['student_id'], columns['user_id'], columns['graded_count'])) == [tuple(row) for row in expected]
+
+
+def test_columns_are_written_in_batches(client, h_principal, monkeypatch):
+    whole = get_columns(client, h_principal, '/students/graded')
+
+    # batches of one row, each column spilling to disk and written out a few bytes at a time
+    monkeypatch.setattr(responses, 'COLUMNAR_FETCH_SIZE', 1)
+    monkeypatch.setattr(responses, 'COLUMN_SPOOL_BYTES', 4)
+    monkeypatch.setattr(responses, 'STREAM_CHUNK_SIZE', 3)
+    response = client.get('/principal/reports/students/graded', headers=h_principal, buffered=False)
+    chunks = list(response.iter_encoded())
+
+    assert len(chunks) > len(whole['student_id'])
+    assert json.loads(b''.join(chunks))['data'] == whole
+
+
+def test_histogram_and_backlog_agree_with_stats(client, h_principal):
+    histogram = get_columns(client, h_principal, '/grades/histogram')
+    backlog = get_columns(client, h_principal, '/teachers/backlog')
+    stats = {row.scope_id: row for row in AssignmentStats.filter(AssignmentStats.scope == TEACHER)}
+    # every assignment has a student, not every graded one has a teacher
+    graded_count = sum(row.graded_count for row in AssignmentStats.filter(AssignmentStats.scope == STUDENT))
+
+    assert sum(histogram['graded_count']) == graded_count
+    for teacher_id, submitted_count in zip(backlog['teacher_id'], backlog['submitted_count']):
+        assert stats[teacher_id].submitted_count == submitted_count
+
+
+def test_turnaround_and_date_range(client, h_principal):
+    turnaround = get_columns(client, h_principal, '/teachers/turnaround')
+    assert all(seconds >= 0 for seconds in turnaround['avg_seconds'])
+    assert all(maximum >= average for maximum, average in zip(turnaround['max_seconds'], turnaround['avg_seconds']))
+
+    future = get_columns(client, h_principal, '/teachers/turnaround', **{'from': '2999-01-01'})
+    assert future == {'teacher_id': [], 'graded_count': [], 'avg_seconds': [], 'max_seconds': []}
+
+
+def test_reports_reject_bad_args(client, h_principal):
+    for path, args in [
+        ('/teachers/turnaround', {'from': 'yesterday'}),
+        ('/teachers/backlog', {'from': '2024-02-01', 'to': '2024-01-01'}),
+        ('/teachers/leaderboard', {'limit': 0}),
+        ('/grades/histogram', {'teacher_id': 'x'}),
+    ]:
+        response = client.get('/principal/reports' + path, headers=h_principal, query_string=args)
+        assert response.status_code == 400, path
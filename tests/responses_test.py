@@ -0,0 +1,49 @@
+import pytest
+from core import app
+from core.apis.responses import APIResponse
+from core.libs import pagination
+from core.libs.helpers import GeneralObject
+
+pytestmark = pytest.mark.query_budget(3)
+
+
+def serialize(row):
+    return {'id': row.id, 'content': row.content}
+
+
+def make_rows(count):
+    return [GeneralObject(id=_id, content='row {}'.format(_id)) for _id in range(1, count + 1)]
+
+
+def test_stream_matches_respond():
+    rows = make_rows(2000)
+
+    with app.test_request_context():
+        page = pagination.Page(limit=1500)
+        streamed = APIResponse.stream(rows, serialize=serialize, page=page)
+        assert streamed.is_streamed
+        streamed_body = streamed.get_data()
+
+        expected = APIResponse.respond(
+            data=[serialize(row) for row in rows[:1500]],
+            next_cursor=pagination.encode_cursor(1500)
+        ).get_data()
+
+    assert streamed_body == expected
+
+
+def test_stream_empty_rows():
+    with app.test_request_context():
+        streamed_body = APIResponse.stream([], serialize=serialize, page=pagination.Page()).get_data()
+        expected = APIResponse.respond(data=[], next_cursor=None).get_data()
+
+    assert streamed_body == expected
+
+
+def test_principal_assignments_stream_pages(client, h_principal):
+    response = client.get('/principal/assignments', headers=h_principal, query_string={'limit': 1})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert len(response.json['data']) == 1
+    assert response.json['next_cursor'] is not None
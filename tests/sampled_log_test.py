@@ -0,0 +1,46 @@
+import pytest
+import json
+
+from core.libs.sampled_log import SampledLogger
+
+pytestmark = pytest.mark.query_budget(3)
+
+
+def test_disabled_logger_writes_nothing(mocker):
+    log = SampledLogger('tests.sampled_log.disabled')
+    write = mocker.patch.object(log.logger, 'debug')
+
+    log.debug('event', value=1)
+
+    assert log.is_sampled() is False
+    write.assert_not_called()
+
+
+def test_rate_cap_counts_dropped_records(mocker):
+    log = SampledLogger('tests.sampled_log.capped', enabled=True, sample_rate=1.0, max_per_second=2)
+    write = mocker.patch.object(log.logger, 'debug')
+    mocker.patch('core.libs.sampled_log.time.monotonic', return_value=log._refilled_at)
+
+    for index in range(5):
+        log.debug('event', index=index)
+
+    assert [json.loads(call.args[0])['index'] for call in write.call_args_list] == [0, 1]
+    assert log.dropped == 3
+
+
+def test_unsampled_logger_writes_nothing(mocker):
+    log = SampledLogger('tests.sampled_log.unsampled', enabled=True, sample_rate=0.0)
+    write = mocker.patch.object(log.logger, 'debug')
+
+    log.debug('event')
+
+    write.assert_not_called()
+
+
+def test_principal_listing_does_not_dump_every_assignment(client, h_principal, mocker):
+    get_all_assignments = mocker.patch('core.models.assignments.Assignment.get_all_assignments')
+
+    response = client.get('/principal/assignments', headers=h_principal)
+
+    assert response.status_code == 200
+    get_all_assignments.assert_not_called()
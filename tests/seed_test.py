@@ -0,0 +1,43 @@
+from core import db, seed
+from core.models.assignment_events import AssignmentEvent
+from core.models.assignment_stats import AssignmentStats
+from core.models.assignments import Assignment
+from core.models.teachers import Teacher
+
+
+def seeded_rows():
+    first_id = db.session.query(db.func.max(Assignment.id)).scalar() or 0
+    counts = seed.seed(teachers=3, students=10, principals=1, assignments=500, seed_value=7, chunk_size=64)
+    rows = db.session.query(Assignment.student_id, Assignment.teacher_id, Assignment.grade, Assignment.state,
+                            Assignment.created_at, Assignment.updated_at) \
+        .filter(Assignment.id > first_id).order_by(Assignment.id).all()
+    return counts, rows
+
+
+def test_seed_adds_rows_and_keeps_stats_current():
+    teachers = Teacher.query.count()
+    events = AssignmentEvent.filter().count()
+    try:
+        counts, rows = seeded_rows()
+        assert counts['assignments'] == len(rows) == 500
+        assert Teacher.query.count() == teachers + 3
+        assert {state.value for _, _, _, state, _, _ in rows} == {'DRAFT', 'SUBMITTED', 'GRADED'}
+        assert all((grade is None) == (state.value != 'GRADED') for _, _, grade, state, _, _ in rows)
+        assert all(updated_at >= created_at for *_, created_at, updated_at in rows)
+        assert AssignmentStats.verify() == []
+        assert AssignmentEvent.filter().count() == events + 500
+    finally:
+        db.session.rollback()
+
+
+def test_seed_is_deterministic():
+    try:
+        _, first = seeded_rows()
+    finally:
+        db.session.rollback()
+    try:
+        _, second = seeded_rows()
+    finally:
+        db.session.rollback()
+
+    assert first == second
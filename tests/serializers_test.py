@@ -0,0 +1,33 @@
+from flask import json
+
+from core import app
+from core.apis.assignments.schema import AssignmentSchema, assignment_serializer
+from core.models.assignments import Assignment
+
+
+def test_compiled_serializer_matches_schema():
+    assignments = Assignment.get_all_assignments()
+    assert assignments
+
+    with app.app_context():
+        expected = json.dumps(AssignmentSchema().dump(assignments, many=True))
+        compiled = json.dumps([assignment_serializer(assignment) for assignment in assignments])
+
+    assert compiled == expected
+
+
+def test_compiled_serializer_emits_plain_values():
+    assignment = Assignment.get_by_id(1)
+    dumped = assignment_serializer(assignment)
+
+    assert set(dumped) == set(AssignmentSchema().dump_fields)
+    assert type(dumped['state']) is str
+    assert type(dumped['created_at']) is str
+
+
+def test_compiled_serializer_on_column_rows():
+    assignments = Assignment.get_all_assignments()
+    rows = list(Assignment.select_rows().order_by(Assignment.id))
+
+    assert [assignment_serializer(row) for row in rows] == \
+        [assignment_serializer(assignment) for assignment in sorted(assignments, key=lambda a: a.id)]
@@ -6,6 +6,9 @@ from marshmallow.exceptions import ValidationError
 from sqlalchemy.exc import IntegrityError
 from werkzeug.exceptions import NotFound
 
+pytestmark = pytest.mark.query_budget(1)
+
+
 @pytest.fixture
 def client():
     with app.test_client() as client:
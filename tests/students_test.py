@@ -1,3 +1,11 @@
+import pytest
+from sqlalchemy import event
+
+from core import db
+
+pytestmark = pytest.mark.query_budget(5)
+
+
 def test_get_assignments_student_1(client, h_student_1):
     response = client.get(
         '/student/assignments',
@@ -58,11 +66,13 @@ def test_post_assignment_student_1(client, h_student_1):
 
 
 def test_submit_assignment_student_1(client, h_student_1):
+    draft = client.post('/student/assignments', headers=h_student_1, json={'content': 'TO SUBMIT'}).json['data']
+
     response = client.post(
         '/student/assignments/submit',
         headers=h_student_1,
         json={
-            'id': 2,
+            'id': draft['id'],
             'teacher_id': 2
         })
 
@@ -74,15 +84,169 @@ def test_submit_assignment_student_1(client, h_student_1):
     assert data['teacher_id'] == 2
 
 
+def test_submit_empty_content_error(client, h_student_1):
+    draft = client.post('/student/assignments', headers=h_student_1, json={'content': ''}).json['data']
+
+    response = client.post('/student/assignments/submit', headers=h_student_1,
+                           json={'id': draft['id'], 'teacher_id': 1})
+
+    assert response.status_code == 400
+    assert response.json['message'] == 'assignment with empty content cannot be submitted'
+
+
 def test_assignment_resubmit_error(client, h_student_1):
+    draft = client.post('/student/assignments', headers=h_student_1, json={'content': 'SUBMITTED TWICE'}).json['data']
+    client.post('/student/assignments/submit', headers=h_student_1, json={'id': draft['id'], 'teacher_id': 2})
+
     response = client.post(
         '/student/assignments/submit',
         headers=h_student_1,
         json={
-            'id': 2,
+            'id': draft['id'],
             'teacher_id': 2
         })
     error_response = response.json
     assert response.status_code == 400
     assert error_response['error'] == 'FyleError'
     assert error_response["message"] == 'only a draft assignment can be submitted'
+
+
+def test_bulk_upsert_assignments(client, h_student_1):
+    response = client.post(
+        '/student/assignments/bulk',
+        headers=h_student_1,
+        json=[{'content': 'BULK 1'}, {'content': 'BULK 2'}])
+
+    assert response.status_code == 200
+    created = response.json['data']
+    assert [item['status'] for item in created] == ['created', 'created']
+    assert [item['index'] for item in created] == [0, 1]
+
+    response = client.post(
+        '/student/assignments/bulk',
+        headers=h_student_1,
+        json=[
+            {'id': created[0]['id'], 'content': 'BULK 1 EDITED'},
+            {'id': 3, 'content': 'NOT MINE'},
+            {'id': 100000, 'content': 'MISSING'},
+        ])
+
+    assert response.status_code == 200
+    results = response.json['data']
+    assert results[0] == {'index': 0, 'id': created[0]['id'], 'status': 'updated'}
+    assert results[1]['status'] == 'error'
+    assert results[1]['message'] == 'This assignment belongs to some other student'
+    assert results[2]['status'] == 'error'
+    assert results[2]['message'] == 'No assignment with this id was found'
+
+    listed = client.get('/student/assignments', headers=h_student_1, query_string={'limit': 1000}).json['data']
+    contents = {assignment['id']: assignment['content'] for assignment in listed}
+    assert contents[created[0]['id']] == 'BULK 1 EDITED'
+    assert contents[created[1]['id']] == 'BULK 2'
+
+
+def test_bulk_upsert_edits_with_one_update(client, h_student_1, executed_statements):
+    created = client.post('/student/assignments/bulk', headers=h_student_1,
+                          json=[{'content': 'EDIT ME {}'.format(index)} for index in range(3)]).json['data']
+    del executed_statements[:]
+
+    response = client.post('/student/assignments/bulk', headers=h_student_1,
+                           json=[{'id': item['id'], 'content': 'EDITED'} for item in created])
+
+    assert [item['status'] for item in response.json['data']] == ['updated'] * 3
+    updates = [statement for statement in executed_statements if statement.startswith('UPDATE assignments ')]
+    assert len(updates) == 1
+
+
+def test_bulk_upsert_creates_with_one_insert(client, h_student_1, executed_statements):
+    response = client.post('/student/assignments/bulk', headers=h_student_1,
+                           json=[{'content': 'BULK NEW {}'.format(index)} for index in range(200)])
+
+    created = response.json['data']
+    assert [item['status'] for item in created] == ['created'] * 200
+    assert len({item['id'] for item in created}) == 200
+    inserts = [statement for statement in executed_statements if statement.startswith('INSERT INTO assignments ')]
+    assert len(inserts) == 1
+
+    listed = client.get('/student/assignments', headers=h_student_1).json['data']
+    contents = {item['id']: item['content'] for item in listed}
+    assert [contents[item['id']] for item in created] == ['BULK NEW {}'.format(index) for index in range(200)]
+
+
+def test_bulk_upsert_rejects_non_draft(client, h_student_1):
+    created = client.post('/student/assignments/bulk', headers=h_student_1, json=[{'content': 'TO SUBMIT'}]).json['data']
+    client.post('/student/assignments/submit', headers=h_student_1, json={'id': created[0]['id'], 'teacher_id': 1})
+
+    response = client.post(
+        '/student/assignments/bulk',
+        headers=h_student_1,
+        json=[{'id': created[0]['id'], 'content': 'TOO LATE'}])
+
+    assert response.json['data'][0]['message'] == 'only assignment in draft state can be edited'
+
+
+def test_bulk_upsert_rejects_empty_content(client, h_student_1):
+    created = client.post('/student/assignments/bulk', headers=h_student_1, json=[{'content': 'KEEP ME'}]).json['data']
+
+    response = client.post(
+        '/student/assignments/bulk',
+        headers=h_student_1,
+        json=[{'content': None}, {'id': created[0]['id'], 'content': None}, {'content': 'SAVED'}])
+
+    results = response.json['data']
+    assert [item['status'] for item in results] == ['error', 'error', 'created']
+    assert results[0]['message'] == results[1]['message'] == 'assignment with empty content cannot be saved'
+    listed = client.get('/student/assignments', headers=h_student_1).json['data']
+    assert {item['id']: item['content'] for item in listed}[created[0]['id']] == 'KEEP ME'
+
+
+def test_bulk_upsert_requires_list(client, h_student_1):
+    response = client.post('/student/assignments/bulk', headers=h_student_1, json={'content': 'ABCD'})
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'FyleError'
+
+
+def test_get_assignments_not_modified(client, h_student_1):
+    response = client.get('/student/assignments', headers=h_student_1)
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+    assert response.headers['Last-Modified']
+
+    response = client.get('/student/assignments', headers={**h_student_1, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+    # another page is another representation
+    response = client.get('/student/assignments', headers={**h_student_1, 'If-None-Match': etag},
+                          query_string={'limit': 1})
+    assert response.status_code == 200
+
+
+def test_get_assignments_etag_changes_after_write(client, h_student_1):
+    etag = client.get('/student/assignments', headers=h_student_1, query_string={'limit': 1000}).headers['ETag']
+
+    client.post('/student/assignments/bulk', headers=h_student_1, json=[{'content': 'NEW WATERMARK'}])
+
+    response = client.get('/student/assignments', headers={**h_student_1, 'If-None-Match': etag},
+                          query_string={'limit': 1000})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'NEW WATERMARK' in [assignment['content'] for assignment in response.json['data']]
+
+
+def test_write_request_commits_once(client, h_student_1):
+    commits = []
+
+    def count_commit(conn):
+        commits.append(conn)
+
+    event.listen(db.engine, 'commit', count_commit)
+    try:
+        response = client.post('/student/assignments', headers=h_student_1, json={'content': 'ONE COMMIT'})
+    finally:
+        event.remove(db.engine, 'commit', count_commit)
+
+    assert response.status_code == 200
+    assert len(commits) == 1
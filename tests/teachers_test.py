@@ -1,7 +1,12 @@
 import pytest
-from core.models.assignments import Assignment
+from sqlalchemy import text
+from core import db
+from core.models.assignments import Assignment, AssignmentStateEnum
 from core.apis.responses import APIResponse
 
+pytestmark = pytest.mark.query_budget(5)
+
+
 def test_get_assignments_teacher_1(client, h_teacher_1):
     response = client.get(
         '/teacher/assignments',
@@ -128,7 +133,7 @@ def test_get_assignments_no_assignments(client, h_teacher_1, mocker):
     """
     Test case when a teacher has no assignments
     """
-    mocker.patch('core.models.assignments.Assignment.get_assignments_by_teacher', return_value=[])
+    mocker.patch('core.models.assignments.Assignment.get_assignment_rows_by_teacher', return_value=[])
     
     response = client.get(
         '/teacher/assignments',
@@ -157,4 +162,98 @@ def test_grade_assignment_invalid_payload(client, h_teacher_1, invalid_payload):
     )
 
     assert response.status_code == 400
-    assert response.json['error'] == 'ValidationError'
\ No newline at end of file
+    assert response.json['error'] == 'ValidationError'
+
+
+def submit_new_assignments(client, headers, teacher_id, count):
+    created = client.post(
+        '/student/assignments/bulk',
+        headers=headers,
+        json=[{'content': 'BULK GRADE {}'.format(index)} for index in range(count)]
+    ).json['data']
+    for item in created:
+        client.post('/student/assignments/submit', headers=headers, json={'id': item['id'], 'teacher_id': teacher_id})
+    return [item['id'] for item in created]
+
+
+def test_bulk_grade_assignments(client, h_teacher_1, h_student_1):
+    first_id, second_id = submit_new_assignments(client, h_student_1, teacher_id=1, count=2)
+    other_teachers_id, = submit_new_assignments(client, h_student_1, teacher_id=2, count=1)
+
+    response = client.post(
+        '/teacher/assignments/grade/bulk',
+        headers=h_teacher_1,
+        json=[
+            {'id': first_id, 'grade': 'A'},
+            {'id': second_id, 'grade': 'B'},
+            {'id': other_teachers_id, 'grade': 'C'},
+            {'id': 100000, 'grade': 'A'},
+            {'id': first_id, 'grade': 'D'},
+        ]
+    )
+
+    assert response.status_code == 200
+    results = response.json['data']
+    assert [result['status'] for result in results] == ['graded', 'graded', 'error', 'error', 'error']
+    assert results[2]['message'] == 'This assignment belongs to another teacher'
+    assert results[3]['message'] == 'No assignment with this id was found'
+    assert results[4]['message'] == 'Only submitted assignments can be graded'
+
+    grades = {
+        assignment['id']: assignment['grade']
+        for assignment in client.get('/teacher/assignments', headers=h_teacher_1, query_string={'limit': 1000}).json['data']
+    }
+    assert grades[first_id] == 'A'
+    assert grades[second_id] == 'B'
+
+
+def test_bulk_grade_writes_with_one_update(client, h_teacher_1, h_student_1, executed_statements):
+    assignment_ids = submit_new_assignments(client, h_student_1, teacher_id=1, count=3)
+    del executed_statements[:]
+
+    response = client.post('/teacher/assignments/grade/bulk', headers=h_teacher_1,
+                           json=[{'id': assignment_id, 'grade': 'C'} for assignment_id in assignment_ids])
+
+    assert [result['status'] for result in response.json['data']] == ['graded'] * 3
+    updates = [statement for statement in executed_statements if statement.startswith('UPDATE assignments ')]
+    assert len(updates) == 1
+
+
+def test_bulk_grade_conflict_fails_the_whole_batch(client, h_teacher_1, h_student_1, monkeypatch):
+    first_id, second_id = submit_new_assignments(client, h_student_1, teacher_id=1, count=2)
+    update_batch = Assignment._update_batch.__func__
+
+    def changed_in_between(cls, rows, criterion, **values):
+        # another request writes the second assignment after it was read, before the batch UPDATE
+        db.session.execute(text('UPDATE assignments SET version = version + 1 WHERE id = :id'), {'id': second_id})
+        return update_batch(cls, rows, criterion, **values)
+
+    monkeypatch.setattr(Assignment, '_update_batch', classmethod(changed_in_between))
+    response = client.post('/teacher/assignments/grade/bulk', headers=h_teacher_1,
+                           json=[{'id': first_id, 'grade': 'B'}, {'id': second_id, 'grade': 'B'}])
+
+    assert response.status_code == 409
+    assert {Assignment.get_by_id(first_id).state, Assignment.get_by_id(second_id).state} == {AssignmentStateEnum.SUBMITTED}
+
+
+def test_bulk_grade_assignments_invalid_grade(client, h_teacher_1):
+    response = client.post(
+        '/teacher/assignments/grade/bulk',
+        headers=h_teacher_1,
+        json=[{'id': 1, 'grade': 'A'}, {'id': 2, 'grade': 'AB'}]
+    )
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'ValidationError'
+
+
+def test_get_assignments_etag_changes_after_bulk_grade(client, h_teacher_1, h_student_1):
+    assignment_id, = submit_new_assignments(client, h_student_1, teacher_id=1, count=1)
+    etag = client.get('/teacher/assignments', headers=h_teacher_1).headers['ETag']
+    assert client.get('/teacher/assignments', headers={**h_teacher_1, 'If-None-Match': etag}).status_code == 304
+
+    client.post('/teacher/assignments/grade/bulk', headers=h_teacher_1, json=[{'id': assignment_id, 'grade': 'B'}])
+
+    response = client.get('/teacher/assignments', headers={**h_teacher_1, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag